@@ -8,7 +8,7 @@ project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..'
 sys.path.append(project_root_path)
 from listing_checker import BinanceListingChecker
 from sniping_events import SNIPING_EVENTS
-from utils import logger, telegram
+from utils import logger, telegram, runtime
 
 BINANCE_URL = "https://www.binance.com/en/support/announcement/new-cryptocurrency-listing?c=48&navId=48"
 CRWALING_INTERVAL = 10
@@ -24,4 +24,4 @@ async def capture_signal():
             print(f"Open Signal: \n {new_symbol.upper()} will be listed on Binance Futures.")
         await asyncio.sleep(CRWALING_INTERVAL)
 
-asyncio.run(capture_signal())
+runtime.run(capture_signal())
@@ -0,0 +1,280 @@
+import os
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from pydantic import BaseModel
+
+from base.OrderBook import ASK, BID, PRICE, QTY
+from backtest.recorder import TickFile
+
+
+class BookSeries:
+    """
+    Columnar order book history of one symbol on one exchange.
+    """
+
+    def __init__(self, time: np.ndarray, levels: np.ndarray):
+        """
+        :param time: Local receive time of each tick, ascending.
+        :param levels: Array of shape (ticks, side, depth, {price, qty}), laid out like OrderBook.levels.
+        """
+        self.time = time
+        self.levels = levels
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+class AlignedBooks:
+    """
+    Two BookSeries sampled on their merged timeline: at every tick of either exchange,
+    the latest known book of both.
+    """
+
+    def __init__(self, upbit: BookSeries, binance: BookSeries):
+        """
+        Align Upbit and Binance histories with an as-of join.
+
+        :param upbit: Upbit KRW book history.
+        :param binance: Binance USDM book history.
+        """
+        time = np.union1d(upbit.time, binance.time)
+        upbit_index = np.searchsorted(upbit.time, time, side='right') - 1
+        binance_index = np.searchsorted(binance.time, time, side='right') - 1
+        valid = (upbit_index >= 0) & (binance_index >= 0)
+        self.time = time[valid]
+        self.upbit = upbit.levels[upbit_index[valid]]
+        self.binance = binance.levels[binance_index[valid]]
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+def load_book_series(paths: list[str], exchange: str, symbol: str) -> BookSeries:
+    """
+    Load one symbol's history on one exchange from tick files written by TickRecorder.
+
+    :param paths: Tick file paths, oldest first.
+    :param exchange: Exchange name (e.g. 'UpbitKrw').
+    :param symbol: The symbol.
+    :return: The book history.
+    """
+    times, levels = [], []
+    for path in paths:
+        tick_file = TickFile(path)
+        if exchange not in tick_file.exchanges or symbol not in tick_file.symbols:
+            continue
+        records = tick_file.select(exchange, symbol)
+        times.append(records['recv_time'])
+        levels.append(records['levels'])
+    if not times:
+        raise ValueError(f"No ticks for {symbol} on {exchange}")
+    time = np.concatenate(times)
+    order = np.argsort(time, kind='stable')
+    return BookSeries(time[order], np.concatenate(levels)[order])
+
+
+def load_aligned_books(paths: list[str], symbol: str) -> AlignedBooks:
+    """
+    Load and align the Upbit KRW and Binance USDM histories of a symbol.
+
+    :param paths: Tick file paths, oldest first.
+    :param symbol: The symbol.
+    :return: The aligned books.
+    """
+    return AlignedBooks(load_book_series(paths, 'UpbitKrw', symbol), load_book_series(paths, 'BinanceUsdm', symbol))
+
+
+class SpreadParams(BaseModel):
+    """
+    Kimchi premium round trip: buy on Upbit and short on Binance when the ask premium is low enough,
+    then unwind both legs when the bid premium is high enough.
+    """
+    entry_premium : float
+    exit_premium : float
+    qty : float
+    usd_krw_rate : float = 1320
+    upbit_fee_rate : float = 0.0005
+    binance_fee_rate : float = 0.0004
+    latency_ticks : int = 0
+
+
+class BacktestResult:
+    """
+    PnL, fill and slippage statistics of a backtest run. PnL is in KRW.
+    """
+
+    def __init__(self, params: SpreadParams, trades: dict):
+        """
+        :param params: The parameters that were tested.
+        :param trades: Per round trip arrays (entry_time, exit_time, pnl, fees, slippage_bps, fill_ratio).
+        """
+        self.params = params
+        self.trades = trades
+        pnl = trades['pnl']
+        self.trade_count = len(pnl)
+        self.total_pnl = float(pnl.sum())
+        self.total_fees = float(trades['fees'].sum())
+        self.win_rate = float((pnl > 0).mean()) if len(pnl) else 0.0
+        self.max_drawdown = float((np.maximum.accumulate(np.cumsum(pnl)) - np.cumsum(pnl)).max()) if len(pnl) else 0.0
+        self.avg_slippage_bps = float(trades['slippage_bps'].mean()) if len(pnl) else 0.0
+        self.avg_fill_ratio = float(trades['fill_ratio'].mean()) if len(pnl) else 0.0
+
+    def summary(self) -> dict:
+        """
+        Get the statistics as a dictionary.
+
+        :return: The statistics and the tested parameters.
+        """
+        return {
+            **self.params.model_dump(),
+            'trade_count': self.trade_count,
+            'total_pnl': self.total_pnl,
+            'total_fees': self.total_fees,
+            'win_rate': self.win_rate,
+            'max_drawdown': self.max_drawdown,
+            'avg_slippage_bps': self.avg_slippage_bps,
+            'avg_fill_ratio': self.avg_fill_ratio,
+        }
+
+    def __str__(self):
+        return (f"trades: {self.trade_count}\n"
+                f"total_pnl: {self.total_pnl:,.0f} KRW\n"
+                f"total_fees: {self.total_fees:,.0f} KRW\n"
+                f"win_rate: {self.win_rate:.2%}\n"
+                f"max_drawdown: {self.max_drawdown:,.0f} KRW\n"
+                f"avg_slippage: {self.avg_slippage_bps:.2f} bps\n"
+                f"avg_fill_ratio: {self.avg_fill_ratio:.2%}\n")
+
+
+def walk_book(side_levels: np.ndarray, qty: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectorized depth walk: fill qty against many book sides at once.
+
+    :param side_levels: Array of shape (n, depth, {price, qty}), best level first.
+    :param qty: Quantity to fill on each book.
+    :return: Tuple of (average fill price, filled quantity), one per book.
+    """
+    prices = side_levels[:, :, PRICE]
+    sizes = np.nan_to_num(side_levels[:, :, QTY])
+    before = np.cumsum(sizes, axis=1) - sizes
+    taken = np.clip(qty - before, 0, sizes)
+    filled = taken.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vwap = np.nansum(taken * prices, axis=1) / filled
+    return vwap, filled
+
+
+def _forward_fill_state(enter: np.ndarray, leave: np.ndarray) -> np.ndarray:
+    """
+    Turn entry/exit signals into a position state (1 in position, 0 flat) without a Python loop.
+    An exit signal wins when both fire on the same tick.
+
+    :param enter: Boolean entry signal per tick.
+    :param leave: Boolean exit signal per tick.
+    :return: Position state per tick.
+    """
+    events = enter | leave
+    last_event = np.maximum.accumulate(np.where(events, np.arange(len(events)), -1))
+    state = np.where(last_event >= 0, enter[np.maximum(last_event, 0)] & ~leave[np.maximum(last_event, 0)], False)
+    return state.astype(np.int8)
+
+
+def run_backtest(books: AlignedBooks, params: SpreadParams) -> BacktestResult:
+    """
+    Evaluate the spread round trip over aligned books with array operations only.
+
+    :param books: The aligned Upbit and Binance books.
+    :param params: The strategy parameters.
+    :return: The backtest result.
+    """
+    upbit, binance, rate = books.upbit, books.binance, params.usd_krw_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ask_premium = upbit[:, ASK, 0, PRICE] / (binance[:, BID, 0, PRICE] * rate) - 1
+        bid_premium = upbit[:, BID, 0, PRICE] / (binance[:, ASK, 0, PRICE] * rate) - 1
+    state = _forward_fill_state(ask_premium <= params.entry_premium, bid_premium >= params.exit_premium)
+    changes = np.diff(state, prepend=0)
+    entries = np.flatnonzero(changes == 1)
+    exits = np.flatnonzero(changes == -1)
+    entries = entries[:len(exits)]  # drop a round trip still open at the end of the data
+    last = len(books) - 1
+    entry_fill = np.minimum(entries + params.latency_ticks, last)
+    exit_fill = np.minimum(exits + params.latency_ticks, last)
+
+    qty = params.qty
+    upbit_entry, upbit_entry_qty = walk_book(upbit[entry_fill, ASK], qty)
+    binance_entry, binance_entry_qty = walk_book(binance[entry_fill, BID], qty)
+    upbit_exit, upbit_exit_qty = walk_book(upbit[exit_fill, BID], qty)
+    binance_exit, binance_exit_qty = walk_book(binance[exit_fill, ASK], qty)
+    filled = np.minimum.reduce([upbit_entry_qty, binance_entry_qty, upbit_exit_qty, binance_exit_qty])
+
+    upbit_pnl = (upbit_exit - upbit_entry) * filled
+    binance_pnl = (binance_entry - binance_exit) * filled * rate
+    upbit_notional = (upbit_entry + upbit_exit) * filled
+    binance_notional = (binance_entry + binance_exit) * filled * rate
+    fees = upbit_notional * params.upbit_fee_rate + binance_notional * params.binance_fee_rate
+    pnl = np.nan_to_num(upbit_pnl + binance_pnl - fees)
+
+    # Slippage of the depth walk against the top of book, averaged over the four legs.
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slippage = np.nan_to_num(np.array([
+            upbit_entry / upbit[entry_fill, ASK, 0, PRICE] - 1,
+            1 - binance_entry / binance[entry_fill, BID, 0, PRICE],
+            1 - upbit_exit / upbit[exit_fill, BID, 0, PRICE],
+            binance_exit / binance[exit_fill, ASK, 0, PRICE] - 1,
+        ])).mean(axis=0) * 10000
+
+    trades = {
+        'entry_time': books.time[entry_fill],
+        'exit_time': books.time[exit_fill],
+        'pnl': pnl,
+        'fees': np.nan_to_num(fees),
+        'slippage_bps': slippage,
+        'fill_ratio': filled / qty,
+    }
+    return BacktestResult(params, trades)
+
+
+_worker_books = None
+
+
+def _init_worker(paths: list[str], symbol: str):
+    """
+    Process pool initializer: load the aligned books once per worker.
+
+    :param paths: Tick file paths, oldest first.
+    :param symbol: The symbol to load.
+    """
+    global _worker_books
+    _worker_books = load_aligned_books(paths, symbol)
+
+
+def _run_in_worker(params: SpreadParams) -> dict:
+    """
+    Process pool task: run one backtest over the worker's books.
+
+    :param params: The strategy parameters.
+    :return: The result summary.
+    """
+    return run_backtest(_worker_books, params).summary()
+
+
+def sweep(paths: list[str], symbol: str, grid: dict, processes: int = None, **fixed) -> list[dict]:
+    """
+    Run a parameter sweep in parallel across cores.
+
+    Each worker memory-maps and aligns the tick files once, then evaluates its share of the grid.
+
+    :param paths: Tick file paths, oldest first.
+    :param symbol: The symbol to backtest.
+    :param grid: Dictionary of parameter name -> list of values. Every combination is tested.
+    :param processes: Number of worker processes. Defaults to the number of cores.
+    :param fixed: Parameters shared by every run.
+    :return: One result summary per combination, sorted by total PnL, best first.
+    """
+    names = list(grid)
+    combinations = [SpreadParams(**fixed, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+    processes = processes or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(paths, symbol)) as pool:
+        results = list(pool.map(_run_in_worker, combinations, chunksize=max(1, len(combinations) // (processes * 4))))
+    return sorted(results, key=lambda result: result['total_pnl'], reverse=True)
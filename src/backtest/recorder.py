@@ -0,0 +1,282 @@
+import os
+import json
+import time
+import queue
+import threading
+from functools import partial
+import numpy as np
+
+from utils.logger import market_logger
+
+MAGIC = b'TICK'
+VERSION = 1
+# Headers are padded to a multiple of this size so records start page-aligned for memory-mapping.
+HEADER_ALIGNMENT = 4096
+
+
+def tick_dtype(depth: int) -> np.dtype:
+    """
+    Get the fixed-size record layout of a tick file.
+
+    levels has the same (side, depth, {price, qty}) layout as one row of OrderBook.levels.
+
+    :param depth: Number of levels stored per side.
+    :return: The structured NumPy dtype of one record.
+    """
+    return np.dtype([
+        ('timestamp', 'f8'),
+        ('recv_time', 'f8'),
+        ('exchange', 'u1'),
+        ('symbol_id', 'u2'),
+        ('levels', 'f8', (2, depth, 2)),
+    ])
+
+
+class TickRecorder:
+    """
+    Append-only recorder of normalized order book ticks.
+
+    Ticks are copied into a preallocated record buffer on the receive loop. Full buffers are handed
+    to a writer thread, which appends them to fixed-record binary files and rotates the files
+    every rotate_interval seconds. The event loop never touches the disk.
+    """
+
+    def __init__(self, markets: list, directory: str = './ticks', prefix: str = 'ticks', batch_size: int = 4096,
+                 flush_interval: float = 1, rotate_interval: float = 3600):
+        """
+        Initialize a recorder for the given markets.
+
+        :param markets: Market instances whose order books are recorded.
+        :param directory: Directory where tick files are written.
+        :param prefix: File name prefix.
+        :param batch_size: Number of records buffered before a write.
+        :param flush_interval: Seconds after which a partially filled buffer is written anyway.
+        :param rotate_interval: Seconds after which a new file is started.
+        """
+        self.markets = list(markets)
+        self.directory = directory
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate_interval = rotate_interval
+        self.depth = max(market.order_book.depth for market in self.markets)
+        self.dtype = tick_dtype(self.depth)
+        self.exchanges = [market.exchange for market in self.markets]
+        self.symbols = []
+        self._listeners = {}
+        symbol_ids = {}
+        for market in self.markets:
+            for symbol in market.order_book.symbols:
+                if symbol not in symbol_ids:
+                    symbol_ids[symbol] = len(self.symbols)
+                    self.symbols.append(symbol)
+        self._row_to_symbol_id = [[symbol_ids[symbol] for symbol in market.order_book.symbols] for market in self.markets]
+        self._free_buffers = queue.SimpleQueue()
+        self._full_buffers = queue.SimpleQueue()
+        self._writer = None
+        self._set_buffer(np.zeros(self.batch_size, dtype=self.dtype))
+        self.records_written = 0
+
+    def start(self):
+        """
+        Start the writer thread and subscribe to every market.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        self._writer = threading.Thread(target=self._write_loop, name='tick-recorder', daemon=True)
+        self._writer.start()
+        for exchange_id, market in enumerate(self.markets):
+            listener = partial(self._record, exchange_id, self._row_to_symbol_id[exchange_id])
+            self._listeners[market] = listener
+            market.add_listener(listener)
+
+    def close(self):
+        """
+        Unsubscribe from the markets, write every buffered record and stop the writer thread.
+        """
+        for market, listener in self._listeners.items():
+            market.remove_listener(listener)
+        self._listeners = {}
+        self.flush()
+        if self._writer is not None:
+            self._full_buffers.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def flush(self):
+        """
+        Hand the current buffer to the writer thread, even if it is not full.
+        """
+        if self._count:
+            self._full_buffers.put((self._buffer, self._count))
+            try:
+                buffer = self._free_buffers.get_nowait()
+            except queue.Empty:
+                buffer = np.zeros(self.batch_size, dtype=self.dtype)
+            self._set_buffer(buffer)
+
+    def _set_buffer(self, buffer: np.ndarray):
+        """
+        Make buffer the current record buffer and cache its field views.
+
+        :param buffer: An empty record buffer.
+        """
+        self._buffer = buffer
+        self._timestamp = buffer['timestamp']
+        self._recv_time = buffer['recv_time']
+        self._exchange = buffer['exchange']
+        self._symbol_id = buffer['symbol_id']
+        self._levels = buffer['levels']
+        self._count = 0
+        self._flush_at = time.time() + self.flush_interval
+
+    def _record(self, exchange_id: int, row_to_symbol_id: list, market, symbol: str):
+        """
+        Market listener: copy the symbol's book into the current buffer.
+
+        :param exchange_id: Index of the market in self.markets.
+        :param row_to_symbol_id: Maps the market's order book rows to symbol ids.
+        :param market: The updated market.
+        :param symbol: The updated symbol.
+        """
+        order_book = market.order_book
+        row = order_book.index[symbol]
+        i = self._count
+        now = time.time()
+        self._timestamp[i] = order_book.update_time[row]
+        self._recv_time[i] = now
+        self._exchange[i] = exchange_id
+        self._symbol_id[i] = row_to_symbol_id[row]
+        if order_book.depth == self.depth:
+            self._levels[i] = order_book.levels[row]
+        else:
+            self._levels[i] = np.nan
+            self._levels[i, :, :order_book.depth] = order_book.levels[row]
+        self._count = i + 1
+        if self._count == self.batch_size or now >= self._flush_at:
+            self.flush()
+
+    def _header(self) -> bytes:
+        """
+        Build the file header: magic, header size, metadata length and JSON metadata, zero-padded.
+
+        :return: The header bytes.
+        """
+        meta = json.dumps({
+            'version': VERSION,
+            'depth': self.depth,
+            'exchanges': self.exchanges,
+            'symbols': self.symbols,
+            'created_at': time.time(),
+        }).encode()
+        header_size = -(-(12 + len(meta)) // HEADER_ALIGNMENT) * HEADER_ALIGNMENT
+        header = MAGIC + header_size.to_bytes(4, 'little') + len(meta).to_bytes(4, 'little') + meta
+        return header.ljust(header_size, b'\0')
+
+    def _write_loop(self):
+        """
+        Writer thread: append full buffers to the current file and rotate files.
+        """
+        file, rotate_at, sequence = None, 0, 0
+        while True:
+            item = self._full_buffers.get()
+            if item is None:
+                break
+            buffer, count = item
+            try:
+                if file is None or time.time() >= rotate_at:
+                    if file is not None:
+                        file.close()
+                    path = os.path.join(self.directory, f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S')}_{sequence:04d}.tick")
+                    sequence += 1
+                    file = open(path, 'wb')
+                    file.write(self._header())
+                    rotate_at = time.time() + self.rotate_interval
+                file.write(buffer[:count].tobytes())
+                file.flush()
+                self.records_written += count
+            except Exception as e:
+                message = f"Error while writing ticks: {e}"
+                market_logger.error(message)
+            self._free_buffers.put(buffer)
+        if file is not None:
+            file.close()
+
+
+class TickFile:
+    """
+    Zero-copy reader of a tick file written by TickRecorder.
+    """
+
+    def __init__(self, path: str):
+        """
+        Memory-map a tick file.
+
+        :param path: Path of the tick file.
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            prefix = f.read(12)
+            if prefix[:4] != MAGIC:
+                raise ValueError(f"{path} is not a tick file")
+            header_size = int.from_bytes(prefix[4:8], 'little')
+            meta = json.loads(f.read(int.from_bytes(prefix[8:12], 'little')))
+        self.depth = meta['depth']
+        self.exchanges = meta['exchanges']
+        self.symbols = meta['symbols']
+        self.created_at = meta['created_at']
+        self.dtype = tick_dtype(self.depth)
+        # Ignore a trailing partial record left by an interrupted write.
+        count = (os.path.getsize(path) - header_size) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=header_size, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def exchange_id(self, exchange: str) -> int:
+        """
+        Get the id used in the exchange column for an exchange name.
+
+        :param exchange: The exchange name (e.g. 'UpbitKrw').
+        :return: The exchange id.
+        """
+        return self.exchanges.index(exchange)
+
+    def symbol_id(self, symbol: str) -> int:
+        """
+        Get the id used in the symbol_id column for a symbol.
+
+        :param symbol: The symbol name.
+        :return: The symbol id.
+        """
+        return self.symbols.index(symbol)
+
+    def select(self, exchange: str = None, symbol: str = None) -> np.ndarray:
+        """
+        Get the records of one exchange and/or symbol.
+
+        :param exchange: Optional exchange name to filter on.
+        :param symbol: Optional symbol to filter on.
+        :return: The matching records. A view when no filter is given, a copy otherwise.
+        """
+        mask = None
+        if exchange is not None:
+            mask = self.records['exchange'] == self.exchange_id(exchange)
+        if symbol is not None:
+            symbol_mask = self.records['symbol_id'] == self.symbol_id(symbol)
+            mask = symbol_mask if mask is None else mask & symbol_mask
+        return self.records if mask is None else self.records[mask]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+
+def list_tick_files(directory: str = './ticks', prefix: str = 'ticks') -> list[str]:
+    """
+    List the tick files in a directory, oldest first.
+
+    :param directory: Directory where tick files are written.
+    :param prefix: File name prefix.
+    :return: Sorted list of file paths.
+    """
+    names = sorted(name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith('.tick'))
+    return [os.path.join(directory, name) for name in names]
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import mmap
+import heapq
+import queue
+import struct
+import asyncio
+import threading
+import numpy as np
+
+from utils.logger import market_logger
+
+MAGIC = b'FRMS'
+# Per-frame prefix: local receive time (seconds) and payload length.
+FRAME_PREFIX = struct.Struct('<dI')
+
+
+class FrameRecorder:
+    """
+    Append-only capture of the raw websocket frames received by one Market.
+
+    Frames are appended to an in-memory batch on the receive loop and written by a background thread,
+    so capturing does not block the event loop. The file header stores what is needed to rebuild
+    an equivalent Market for replay (exchange, symbols, depth and stream mode).
+    """
+
+    def __init__(self, market, path: str, batch_bytes: int = 1 << 20, flush_interval: float = 1):
+        """
+        Initialize a frame recorder for a market.
+
+        :param market: The Market instance whose frames are captured.
+        :param path: Path of the frame file to write.
+        :param batch_bytes: Number of buffered bytes that triggers a write.
+        :param flush_interval: Seconds after which a partial batch is written anyway.
+        """
+        self.market = market
+        self.path = path
+        self.batch_bytes = batch_bytes
+        self.flush_interval = flush_interval
+        self._batch = bytearray()
+        self._flush_at = 0
+        self._batches = queue.SimpleQueue()
+        self._writer = None
+
+    def start(self):
+        """
+        Open the file, start the writer thread and begin capturing the market's frames.
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        meta = json.dumps({
+            'exchange': self.market.exchange,
+            'symbols': list(self.market.symbols),
+            'order_book_depth': self.market.order_book_depth,
+            'combined_stream': getattr(self.market, 'combined_stream', None),
+            'diff_depth': getattr(self.market, 'diff_depth', False),
+            # Diff depth markets write their REST snapshots into the frame stream.
+            'snapshot_frames': getattr(self.market, 'diff_depth', False),
+            'created_at': time.time(),
+        }).encode()
+        self._file = open(self.path, 'wb')
+        self._file.write(MAGIC + len(meta).to_bytes(4, 'little') + meta)
+        self._writer = threading.Thread(target=self._write_loop, name='frame-recorder', daemon=True)
+        self._writer.start()
+        self._flush_at = time.time() + self.flush_interval
+        self.market.frame_recorder = self
+
+    def close(self):
+        """
+        Stop capturing, write the remaining frames and close the file.
+        """
+        if self.market.frame_recorder is self:
+            self.market.frame_recorder = None
+        self.flush()
+        if self._writer is not None:
+            self._batches.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def record(self, message):
+        """
+        Append one frame to the current batch.
+
+        :param message: The raw websocket message (str or bytes).
+        """
+        if isinstance(message, str):
+            message = message.encode()
+        now = time.time()
+        self._batch += FRAME_PREFIX.pack(now, len(message))
+        self._batch += message
+        if len(self._batch) >= self.batch_bytes or now >= self._flush_at:
+            self.flush()
+
+    def flush(self):
+        """
+        Hand the current batch to the writer thread.
+        """
+        if self._batch:
+            self._batches.put(self._batch)
+            self._batch = bytearray()
+        self._flush_at = time.time() + self.flush_interval
+
+    def _write_loop(self):
+        """
+        Writer thread: append batches to the file.
+        """
+        while True:
+            batch = self._batches.get()
+            if batch is None:
+                break
+            try:
+                self._file.write(batch)
+                self._file.flush()
+            except Exception as e:
+                message = f"Error while writing frames to {self.path}: {e}"
+                market_logger.error(message)
+        self._file.close()
+
+
+def read_frame_meta(path: str) -> dict:
+    """
+    Read the header of a frame file.
+
+    :param path: Path of the frame file.
+    :return: The header metadata.
+    """
+    with open(path, 'rb') as f:
+        if f.read(4) != MAGIC:
+            raise ValueError(f"{path} is not a frame file")
+        return json.loads(f.read(int.from_bytes(f.read(4), 'little')))
+
+
+def read_frames(path: str) -> list[tuple[float, bytes]]:
+    """
+    Read every frame of a frame file. A trailing partial frame is ignored.
+
+    :param path: Path of the frame file.
+    :return: List of (receive time, raw message).
+    """
+    frames = []
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[:4] != MAGIC:
+                raise ValueError(f"{path} is not a frame file")
+            offset = 8 + int.from_bytes(data[4:8], 'little')
+            size = len(data)
+            while offset + FRAME_PREFIX.size <= size:
+                recv_time, length = FRAME_PREFIX.unpack_from(data, offset)
+                offset += FRAME_PREFIX.size
+                if offset + length > size:
+                    break
+                frames.append((recv_time, data[offset:offset + length]))
+                offset += length
+    return frames
+
+
+class ReplayStats:
+    """
+    Throughput and per-message latency of a replay run.
+    """
+
+    def __init__(self, latencies_ns: np.ndarray, elapsed: float, updates: int):
+        """
+        :param latencies_ns: Time spent in Market._on_message per frame, listeners included, in nanoseconds.
+        :param elapsed: Wall-clock duration of the replay in seconds.
+        :param updates: Number of frames that updated an order book.
+        """
+        self.latencies_ns = latencies_ns
+        self.elapsed = elapsed
+        self.messages = len(latencies_ns)
+        self.updates = updates
+
+    def percentile(self, q: float) -> float:
+        """
+        Get a latency percentile in microseconds.
+
+        :param q: Percentile between 0 and 100.
+        :return: The latency in microseconds.
+        """
+        if not self.messages:
+            return 0.0
+        return float(np.percentile(self.latencies_ns, q)) / 1000
+
+    def __str__(self):
+        throughput = self.messages / self.elapsed if self.elapsed else 0
+        return (f"messages: {self.messages}\n"
+                f"book updates: {self.updates}\n"
+                f"elapsed: {self.elapsed:.3f}s\n"
+                f"throughput: {throughput:,.0f} msg/s\n"
+                f"tick-to-signal p50: {self.percentile(50):.1f}us\n"
+                f"tick-to-signal p99: {self.percentile(99):.1f}us\n"
+                f"tick-to-signal max: {self.percentile(100):.1f}us\n")
+
+
+class MarketReplayer:
+    """
+    Drives Market instances from recorded frames without the network.
+
+    Frames of several markets are merged by receive time and fed through each market's
+    _on_message, the same path the live receive loops use, so order books and listeners
+    (strategies, SpreadEngine, recorders) behave exactly as live. The markets are flagged as replaying,
+    so they make no network requests: Binance USDM diff depth books are bootstrapped from the
+    snapshots recorded in the frames.
+    """
+
+    def __init__(self, sources: list, speed: float = None):
+        """
+        Initialize a replayer.
+
+        :param sources: List of (market, frame file path or list of (receive time, message)).
+        :param speed: Replay speed relative to wall-clock (1 = real time). None replays as fast as possible.
+        """
+        self.speed = speed
+        self.sources = []
+        for market, frames in sources:
+            if isinstance(frames, str):
+                meta = read_frame_meta(frames)
+                if meta.get('diff_depth') and not meta.get('snapshot_frames'):
+                    raise ValueError(f"{frames} was recorded without depth snapshots, so its diff depth books cannot be rebuilt")
+                frames = read_frames(frames)
+            market.replaying = True
+            self.sources.append((market, frames))
+
+    def _merged(self):
+        """
+        Iterate over every frame of every source in receive-time order.
+
+        :return: Iterator of (receive time, market, message).
+        """
+        def _tagged(market, frames):
+            for recv_time, message in frames:
+                yield recv_time, market, message
+
+        streams = [_tagged(market, frames) for market, frames in self.sources]
+        yield from heapq.merge(*streams, key=lambda frame: frame[0])
+
+    def replay(self) -> ReplayStats:
+        """
+        Replay every frame as fast as possible on the calling thread.
+
+        :return: The replay statistics.
+        """
+        total = sum(len(frames) for _, frames in self.sources)
+        latencies = np.empty(total, dtype=np.int64)
+        updates = 0
+        perf_counter_ns = time.perf_counter_ns
+        start = time.perf_counter()
+        for n, (_, market, message) in enumerate(self._merged()):
+            t0 = perf_counter_ns()
+            symbol = market._on_message(message)
+            latencies[n] = perf_counter_ns() - t0
+            if symbol is not None:
+                updates += 1
+        return ReplayStats(latencies, time.perf_counter() - start, updates)
+
+    async def areplay(self) -> ReplayStats:
+        """
+        Replay every frame on the event loop, paced by self.speed.
+        Yields to the loop between frames so other tasks (strategies, order placement) keep running.
+
+        :return: The replay statistics.
+        """
+        total = sum(len(frames) for _, frames in self.sources)
+        latencies = np.empty(total, dtype=np.int64)
+        updates = 0
+        perf_counter_ns = time.perf_counter_ns
+        start = time.perf_counter()
+        first_recv_time = None
+        for n, (recv_time, market, message) in enumerate(self._merged()):
+            if first_recv_time is None:
+                first_recv_time = recv_time
+            if self.speed:
+                delay = start + (recv_time - first_recv_time) / self.speed - time.perf_counter()
+                await asyncio.sleep(max(delay, 0))
+            else:
+                await asyncio.sleep(0)
+            t0 = perf_counter_ns()
+            symbol = market._on_message(message)
+            latencies[n] = perf_counter_ns() - t0
+            if symbol is not None:
+                updates += 1
+        return ReplayStats(latencies, time.perf_counter() - start, updates)
@@ -1,6 +1,7 @@
 import asyncio
 from abc import abstractmethod
 from base.OrderSheet import OrderSheet
+from utils.logger import trade_logger
 
 class Broker:
     @abstractmethod
@@ -12,6 +13,16 @@ class Broker:
         """
         pass
 
+    async def aplace_orders(self, order_sheets: list[OrderSheet]) -> list[OrderSheet]:
+        """
+        Place several orders at once. Orders are sent concurrently, one request each;
+        brokers with a batch endpoint override this.
+
+        :param order_sheets: The OrderSheets to place.
+        :return: The results of aplace_order, in the same order.
+        """
+        return list(await asyncio.gather(*[self.aplace_order(order_sheet) for order_sheet in order_sheets]))
+
     def _set_query_string(self, params: dict) -> str:
         """
         Generate a query string from a dictionary of parameters.
@@ -21,3 +32,39 @@ class Broker:
         """
         query_string = '&'.join(["{}={}".format(key, params[key]) for key in params.keys()])
         return query_string
+
+
+async def aplace_orders_across(legs: list[tuple[Broker, OrderSheet]]) -> list[OrderSheet]:
+    """
+    Fan out the legs of a cross-exchange entry: each broker receives its legs through
+    aplace_orders, and all brokers are sent to concurrently.
+
+    Each returned OrderSheet carries its own timing (timestamp = response time, time_took = latency),
+    so the skew between legs is max(timestamp) - min(timestamp).
+
+    :param legs: List of (broker, order sheet).
+    :return: The results, in the same order as legs. A leg whose broker raised is returned unsuccessful.
+    """
+    by_broker = {}
+    for index, (broker, order_sheet) in enumerate(legs):
+        by_broker.setdefault(broker, []).append(index)
+    brokers = list(by_broker)
+    responses = await asyncio.gather(*[broker.aplace_orders([legs[index][1] for index in by_broker[broker]]) for broker in brokers],
+                                     return_exceptions=True)
+    results = [order_sheet for _, order_sheet in legs]
+    for broker, response in zip(brokers, responses):
+        if isinstance(response, BaseException):
+            message = f"Error while placing orders with {type(broker).__name__}: {response}"
+            trade_logger.error(message)
+            for index in by_broker[broker]:
+                results[index].is_successful = False
+            continue
+        for index, result in zip(by_broker[broker], response):
+            if result:
+                results[index] = result
+            else:
+                results[index].is_successful = False
+    trade_logger.info("Legs placed: " + ", ".join(f"{type(legs[i][0]).__name__} {order_sheet.symbol} "
+                                                  f"{'ok' if order_sheet.is_successful else 'failed'} {order_sheet.time_took * 1000:.1f}ms"
+                                                  for i, order_sheet in enumerate(results)))
+    return results
@@ -0,0 +1,133 @@
+import time
+from array import array
+import numpy as np
+
+
+class FreshnessIndex:
+    """
+    Per-symbol freshness of a market's order book, one row per OrderBook row.
+
+    Tracks the local receive time of the last update, a smoothed update rate and an explicit stale
+    flag (set when the book was cleared or its connection dropped, cleared by the next update).
+    The columns are array.array buffers (or views of a shared memory segment), so the per-message update
+    is plain item assignment, and numpy views over the same memory answer the vectorized queries without copying.
+    """
+
+    def __init__(self, symbols: list, smoothing: float = 0.1, buffer=None):
+        """
+        Initialize the index with every symbol stale, or attach to one laid out in a buffer.
+
+        :param symbols: List of symbols, in OrderBook row order.
+        :param smoothing: Weight of the newest interval in the update rate average.
+        :param buffer: Writable buffer of at least buffer_size(len(symbols)) bytes (a shared memory segment)
+            to lay the columns out in. It is used as-is: the creator of a shared index calls mark_stale() on every row once.
+        """
+        self.symbols = list(symbols)
+        self.index = {symbol: row for row, symbol in enumerate(self.symbols)}
+        self.smoothing = smoothing
+        n = len(self.symbols)
+        if buffer is None:
+            self.recv_time = array('d', bytes(8 * n))
+            self.interval = array('d', bytes(8 * n))
+            self.stale = array('b', b'\x01' * n)
+        else:
+            buffer = memoryview(buffer).cast('B')
+            self.recv_time = buffer[:8 * n].cast('d')
+            self.interval = buffer[8 * n:16 * n].cast('d')
+            self.stale = buffer[16 * n:17 * n].cast('b')
+        self._recv_time = np.frombuffer(self.recv_time, dtype=np.float64)
+        self._interval = np.frombuffer(self.interval, dtype=np.float64)
+        self._stale = np.frombuffer(self.stale, dtype=np.int8)
+
+    @staticmethod
+    def buffer_size(symbol_count: int) -> int:
+        """
+        Get the number of bytes an index needs when laid out in a buffer.
+
+        :param symbol_count: Number of symbols.
+        :return: The size in bytes.
+        """
+        return 17 * symbol_count
+
+    def touch(self, row: int, now: float):
+        """
+        Record an update of a symbol.
+
+        :param row: Row of the symbol.
+        :param now: Local receive time in seconds.
+        """
+        last = self.recv_time[row]
+        if last:
+            interval = self.interval[row]
+            self.interval[row] = interval + self.smoothing * (now - last - interval) if interval else now - last
+        self.recv_time[row] = now
+        self.stale[row] = 0
+
+    def mark_stale(self, rows: list):
+        """
+        Flag symbols as stale until their next update.
+
+        :param rows: Rows of the symbols.
+        """
+        for row in rows:
+            self.stale[row] = 1
+
+    def is_fresh(self, symbol: str, max_age: float, now: float = None) -> bool:
+        """
+        Check if a symbol was updated within max_age seconds and is not flagged stale.
+
+        :param symbol: The symbol.
+        :param max_age: Maximum age in seconds.
+        :param now: Current time. Defaults to time.time().
+        :return: True if the symbol is fresh.
+        """
+        row = self.index[symbol]
+        return not self.stale[row] and (now or time.time()) - self.recv_time[row] <= max_age
+
+    def fresh_mask(self, max_age: float, now: float = None) -> np.ndarray:
+        """
+        Vectorized freshness of every symbol.
+
+        :param max_age: Maximum age in seconds.
+        :param now: Current time. Defaults to time.time().
+        :return: Boolean array, one entry per row.
+        """
+        return (self._stale == 0) & ((now or time.time()) - self._recv_time <= max_age)
+
+    def fresh_symbols(self, max_age: float, now: float = None) -> list[str]:
+        """
+        Get every fresh symbol.
+
+        :param max_age: Maximum age in seconds.
+        :param now: Current time. Defaults to time.time().
+        :return: List of fresh symbols.
+        """
+        return [self.symbols[row] for row in np.flatnonzero(self.fresh_mask(max_age, now))]
+
+    def update_rate(self, now: float = None) -> np.ndarray:
+        """
+        Smoothed updates per second of every symbol. A symbol that went quiet decays
+        with the time since its last update instead of keeping its last rate.
+
+        :param now: Current time. Defaults to time.time().
+        :return: Array of rates, one entry per row. 0 until a symbol has two updates.
+        """
+        interval = np.maximum(self._interval, (now or time.time()) - self._recv_time)
+        with np.errstate(divide='ignore'):
+            return np.where(self._interval > 0, 1 / interval, 0.0)
+
+    def get(self, symbol: str) -> dict:
+        """
+        Get the freshness of a symbol.
+
+        :param symbol: The symbol.
+        :return: Dictionary with recv_time, age, update_rate and stale.
+        """
+        row = self.index[symbol]
+        interval = self.interval[row]
+        return {
+            'recv_time': self.recv_time[row],
+            'age': time.time() - self.recv_time[row],
+            'update_rate': 1 / interval if interval > 0 else 0.0,
+            'stale': bool(self.stale[row]),
+        }
@@ -1,9 +1,24 @@
+import time
 import asyncio
 from abc import abstractmethod
 import logging
+import websockets
+
+from utils.backoff import Backoff
+from utils.logger import market_logger
 
 class Market:
+    exchange = None
     order_book = {}
+    listeners = ()
+    frame_recorder = None
+    # Set by MarketReplayer: the market is fed recorded frames and must not make network requests.
+    replaying = False
+    freshness = None
+    # Seconds without a message after which a connection is considered dead,
+    # and without an update after which a symbol's book is resynced.
+    stale_after = 30
+    _tasks = None
 
     def get_order_book(self) -> dict:
         """
@@ -13,6 +28,202 @@ class Market:
         """
         return self.order_book
 
+    def add_listener(self, callback):
+        """
+        Register a callback that is called as callback(market, symbol) after every order book update.
+        Callbacks run inline on the receive loop, so they must be cheap and must not block.
+        Exceptions they raise are logged and do not reach the receive loop.
+
+        :param callback: The callback to register.
+        """
+        self.listeners = self.listeners + (callback,)
+
+    def remove_listener(self, callback):
+        """
+        Unregister a callback registered with add_listener.
+
+        :param callback: The callback to remove.
+        """
+        self.listeners = tuple(listener for listener in self.listeners if listener != callback)
+
+    def _publish(self, symbol: str):
+        """
+        Notify the listeners that a symbol's order book was updated.
+
+        :param symbol: The updated symbol.
+        """
+        for listener in self.listeners:
+            try:
+                listener(self, symbol)
+            except Exception as e:
+                message = f"Error in {self.exchange} order book listener {getattr(listener, '__qualname__', listener)} for {symbol}: {e!r}"
+                market_logger.error(message)
+
+    def _on_message(self, message) -> str:
+        """
+        Handle one raw websocket message: decode it, write it into the order book and notify the listeners.
+        Every receive loop and the replay harness go through this method.
+        Subclasses bind self._decode to a decoder from utils.decoder.
+
+        :param message: The raw websocket message (str or bytes).
+        :return: The updated symbol, or None if the message carried no book update.
+        """
+        if self.frame_recorder is not None:
+            self.frame_recorder.record(message)
+        return self._apply(self._decode(message))
+
+    def _apply(self, data) -> str:
+        """
+        Write decoded data (a stream message or a REST snapshot in the same shape) into the order book,
+        record its freshness and notify the listeners.
+
+        :param data: The decoded message.
+        :return: The updated symbol, or None if the data carried no book update.
+        """
+        symbol = self._process_data(data)
+        if symbol is not None:
+            if self.freshness is not None:
+                self.freshness.touch(self.order_book.index[symbol], time.time())
+            if self.listeners:
+                self._publish(symbol)
+        return symbol
+
+    def is_fresh(self, symbol: str, max_age: float = None) -> bool:
+        """
+        Check if a symbol's book was updated within max_age seconds and is not flagged stale.
+
+        :param symbol: The symbol.
+        :param max_age: Maximum age in seconds. Defaults to stale_after.
+        :return: True if the book is fresh.
+        """
+        return self.freshness.is_fresh(symbol, max_age or self.stale_after)
+
+    def fresh_symbols(self, max_age: float = None) -> list[str]:
+        """
+        Get every symbol whose book is fresh.
+
+        :param max_age: Maximum age in seconds. Defaults to stale_after.
+        :return: List of fresh symbols.
+        """
+        return self.freshness.fresh_symbols(max_age or self.stale_after)
+
+    def get_freshness(self, symbol: str) -> dict:
+        """
+        Get the freshness of a symbol's book.
+
+        :param symbol: The symbol.
+        :return: Dictionary with recv_time, age, update_rate and stale.
+        """
+        return self.freshness.get(symbol)
+
+    @abstractmethod
+    def _process_data(self, raw_data) -> str:
+        """
+        An abstract method for writing a decoded message into the order book.
+        Subclasses return the updated symbol, or None if the message carried no book update.
+        """
+        pass
+
+    async def asupervise(self, endpoint: str, symbols: list[str], subscribe_message: str = None):
+        """
+        Keep one websocket connection streaming into the order book until cancelled.
+
+        Reconnects with exponential backoff and jitter instead of recursing or dying, closes connections
+        that went silent for stale_after seconds, and resyncs symbols whose books are older than
+        stale_after through aresync, so book age stays bounded while the network churns.
+
+        :param endpoint: The websocket URL.
+        :param symbols: Symbols streamed over this connection.
+        :param subscribe_message: Message sent right after connecting, if the exchange needs one.
+        """
+        backoff = Backoff()
+        rows = [self.order_book.index[symbol] for symbol in symbols]
+        while True:
+            connected_at = time.time()
+            try:
+                async with websockets.connect(endpoint) as websocket:
+                    if subscribe_message is not None:
+                        await websocket.send(subscribe_message)
+                    last_message = [time.time()]
+                    watchdog = self._own_task(self._awatch(websocket, symbols, rows, last_message))
+                    try:
+                        async for message in websocket:
+                            last_message[0] = time.time()
+                            self._on_message(message)
+                    finally:
+                        watchdog.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                message = f"{self.exchange} stream of {len(symbols)} symbols failed: {e}"
+                market_logger.error(message)
+            if self.freshness is not None:
+                self.freshness.mark_stale(rows)
+            if time.time() - connected_at > self.stale_after:
+                backoff.reset()
+            delay = backoff.next_delay()
+            market_logger.info(f"Reconnecting {self.exchange} stream of {len(symbols)} symbols in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _awatch(self, websocket, symbols: list[str], rows: list[int], last_message: list[float]):
+        """
+        Watchdog of one supervised connection.
+
+        :param websocket: The connection.
+        :param symbols: Symbols streamed over the connection.
+        :param rows: Order book rows of those symbols.
+        :param last_message: Single-item list holding the local time of the last message on the connection.
+        """
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            now = time.time()
+            if now - last_message[0] > self.stale_after:
+                market_logger.error(f"{self.exchange} stream of {len(symbols)} symbols went silent, reconnecting")
+                await websocket.close()
+                return
+            if self.freshness is not None:
+                fresh = self.freshness.fresh_mask(self.stale_after, now)[rows]
+            else:
+                fresh = now - self.order_book.update_time[rows] <= self.stale_after
+            stale = [symbol for symbol, is_fresh in zip(symbols, fresh) if not is_fresh]
+            if stale:
+                try:
+                    await self.aresync(stale)
+                except Exception as e:
+                    message = f"Failed to resync {len(stale)} {self.exchange} symbols: {e}"
+                    market_logger.error(message)
+
+    async def aresync(self, symbols: list[str]):
+        """
+        Refresh the books of stale symbols from a snapshot. Subclasses with a REST snapshot endpoint override this.
+
+        :param symbols: The stale symbols.
+        """
+        pass
+
+    def _own_task(self, coroutine) -> asyncio.Task:
+        """
+        Start a background task owned by this market, so aclose() can cancel it.
+
+        :param coroutine: The coroutine to run.
+        :return: The task.
+        """
+        if self._tasks is None:
+            self._tasks = set()
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def aclose(self):
+        """
+        Cancel every background task owned by this market.
+        """
+        tasks = list(self._tasks or ())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
     async def stream(self):
         """
         Asynchronously start streaming market data.
@@ -0,0 +1,173 @@
+import gc
+import time
+import asyncio
+import multiprocessing
+import numpy as np
+
+from base.Market import Market
+from base.Freshness import FreshnessIndex
+from base.OrderBook import OrderBook
+from utils.backoff import Backoff
+from utils import runtime
+from utils.logger import market_logger
+from utils.shared_memory import create_segment, attach_segment, release_segment
+
+
+def _run_market(market_class, symbols: list, order_book_depth: int, order_book_name: str, freshness_name: str, kwargs: dict):
+    """
+    Worker process entry point: stream a market into the shared order book and freshness index.
+    Runs under utils.runtime, so the worker gets uvloop, its own loop lag reports and a graceful SIGTERM.
+    The worker places no orders, so its HTTP pool is not warmed up.
+
+    :param market_class: Market subclass to run.
+    :param symbols: List of symbols to track.
+    :param order_book_depth: Depth of the order book to track.
+    :param order_book_name: Name of the order book's shared memory segment.
+    :param freshness_name: Name of the freshness index's shared memory segment.
+    :param kwargs: Further keyword arguments of market_class.
+    """
+    order_book_segment = attach_segment(order_book_name)
+    freshness_segment = attach_segment(freshness_name)
+    order_book = OrderBook(symbols, order_book_depth, buffer=order_book_segment.buf)
+    freshness = FreshnessIndex(symbols, buffer=freshness_segment.buf)
+    market = market_class(symbols, order_book_depth, order_book=order_book, freshness=freshness, **kwargs)
+    try:
+        runtime.run(market.aconnect(), warm_up=False)
+    finally:
+        # Drop every view of the segments (markets hold reference cycles) so they can be closed.
+        del market, order_book, freshness
+        gc.collect()
+        release_segment(order_book_segment)
+        release_segment(freshness_segment)
+
+
+class MarketProcess(Market):
+    """
+    Runs a market in a worker process and serves its order book in this one.
+
+    The worker owns the websocket connections, JSON decoding and book building, and writes into an
+    OrderBook and a FreshnessIndex laid out in shared memory. This process reads the same memory without
+    copies: order_book, freshness and every Market query work as on the wrapped market.
+    Listeners are driven by polling the book's seqlock counters every poll_interval seconds, so each
+    symbol that changed since the last poll is published once. A worker that dies is restarted with backoff,
+    after the rows it was writing are cleared. get_depth() is not available: only the top order_book_depth
+    levels of a diff depth market's local books are shared.
+    """
+
+    def __init__(self, market_class, symbols: list, order_book_depth: int, poll_interval: float = 0.001, **kwargs):
+        """
+        Initialize a market process. Shared memory is allocated here, the worker starts in aconnect().
+
+        :param market_class: Market subclass to run in the worker, e.g. UpbitKrwMarket or BinanceUsdmMarket.
+            It must accept order_book and freshness keyword arguments.
+        :param symbols: List of symbols to track.
+        :param order_book_depth: Depth of the order book to track.
+        :param poll_interval: Seconds between checks for updated symbols.
+        :param kwargs: Further keyword arguments of market_class.
+        """
+        self.market_class = market_class
+        self.exchange = market_class.exchange
+        self.stale_after = market_class.stale_after
+        self.symbols = symbols
+        self.order_book_depth = order_book_depth
+        self.poll_interval = poll_interval
+        self.kwargs = kwargs
+        self._order_book_segment = create_segment(OrderBook.buffer_size(len(symbols), order_book_depth))
+        self._freshness_segment = create_segment(FreshnessIndex.buffer_size(len(symbols)))
+        self.order_book = OrderBook(symbols, order_book_depth, buffer=self._order_book_segment.buf)
+        self.order_book.clear_all()
+        self.freshness = FreshnessIndex(symbols, buffer=self._freshness_segment.buf)
+        self.freshness.mark_stale(range(len(symbols)))
+        self.process = None
+
+    def start(self):
+        """
+        Start the worker process.
+        """
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(target=_run_market,
+                                       args=(self.market_class, self.symbols, self.order_book_depth,
+                                             self._order_book_segment.name, self._freshness_segment.name, self.kwargs),
+                                       name=f"{self.exchange}-market", daemon=True)
+        self.process.start()
+        market_logger.info(f"Started {self.exchange} market worker (pid {self.process.pid}) for {len(self.symbols)} symbols")
+
+    async def astop(self, timeout: float = 5):
+        """
+        Stop the worker process. The worker is joined off the event loop, and killed if it has not exited
+        within timeout seconds of SIGTERM.
+
+        :param timeout: Seconds the worker gets to shut down gracefully.
+        """
+        process, self.process = self.process, None
+        if process is not None and process.is_alive():
+            process.terminate()
+            await asyncio.to_thread(process.join, timeout)
+            if process.is_alive():
+                message = f"{self.exchange} market worker did not exit within {timeout}s, killing it"
+                market_logger.error(message)
+                process.kill()
+                await asyncio.to_thread(process.join)
+
+    async def aconnect(self):
+        """
+        Start the worker and publish its updates to the listeners until cancelled.
+        """
+        backoff = Backoff()
+        published = self.order_book.seq.copy()
+        self.start()
+        started_at = time.time()
+        try:
+            while True:
+                await asyncio.sleep(self.poll_interval)
+                if not self.process.is_alive():
+                    message = f"{self.exchange} market worker exited with code {self.process.exitcode}"
+                    market_logger.error(message)
+                    self.freshness.mark_stale(range(len(self.symbols)))
+                    # Rows the worker died writing would keep odd counters, and stay unreadable, under the next worker.
+                    torn = self.order_book.recover_interrupted_writes()
+                    if torn.size:
+                        market_logger.error(f"Cleared {torn.size} {self.exchange} rows the market worker died writing: "
+                                            f"{[self.symbols[row] for row in torn.tolist()]}")
+                    if time.time() - started_at > self.stale_after:
+                        backoff.reset()
+                    await asyncio.sleep(backoff.next_delay())
+                    self.start()
+                    started_at = time.time()
+                    continue
+                current = self.order_book.seq.copy()
+                # Rows with an odd counter are being written: they are published on a later poll.
+                changed = np.flatnonzero((current != published) & (current % 2 == 0))
+                if changed.size:
+                    published[changed] = current[changed]
+                    if self.listeners:
+                        for row in changed.tolist():
+                            self._publish(self.order_book.symbols[row])
+        finally:
+            await self.astop()
+
+    async def aclose(self):
+        """
+        Stop the worker and release the shared memory. The order book and freshness index are dropped,
+        so views of them must not be used afterwards.
+        """
+        await super().aclose()
+        await self.astop()
+        self.order_book = self.freshness = None
+        release_segment(self._order_book_segment, unlink=True)
+        release_segment(self._freshness_segment, unlink=True)
+
+    def get_depth(self, symbol: str, depth: int) -> tuple[list, list]:
+        """
+        Not available: a diff depth market's local books live in the worker process,
+        and only their top order_book_depth levels are shared through order_book.
+        """
+        raise NotImplementedError(f"get_depth is not available on a MarketProcess: the local books of {self.exchange} live in the "
+                                  f"worker process. Read the top {self.order_book_depth} levels from order_book, or create the "
+                                  f"market with a larger order_book_depth.")
+
+    def _process_data(self, raw_data) -> str:
+        """
+        Books are built by the worker process.
+        """
+        return None
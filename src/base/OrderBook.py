@@ -0,0 +1,238 @@
+import time
+from collections.abc import Mapping
+import numpy as np
+
+# Axis indices of OrderBook.levels
+ASK, BID = 0, 1
+PRICE, QTY = 0, 1
+
+# read() spins this many times on a row being written, then yields to the writer between attempts
+# and gives up after READ_TIMEOUT seconds (the writer died mid-write).
+READ_SPINS = 100
+READ_TIMEOUT = 0.01
+
+
+class OrderBook(Mapping):
+    """
+    Preallocated order book store for many symbols.
+
+    Every level of every symbol lives in one float64 array of shape
+    (symbols, side, depth, {price, qty}) plus an update-time vector, and ticks are written in place.
+    Rows are found through a symbol -> row index, so cross-symbol reads such as
+    "best bid for all symbols" are single NumPy slices.
+
+    For backwards compatibility the book is also a read-only mapping of
+    symbol -> {'update_time', 'ask_1', 'ask_1_qty', 'bid_1', ...}. Those dicts are only built on read.
+
+    The arrays can live in a caller-provided buffer (a multiprocessing shared memory segment), so a
+    writer process and reader processes share one book without copies. Every row carries a seqlock
+    counter: writers make it odd for the duration of a write, and read() retries until it copied a row
+    under the same even counter. The vectorized views stay lock-free and may mix one row's old and new
+    levels while it is being written. The protocol relies on the store order of x86-64.
+    A writer that dies mid-write leaves its row's counter odd: the row reads as empty until the owner of the
+    book calls recover_interrupted_writes() before starting a new writer.
+    """
+
+    def __init__(self, symbols: list, depth: int, buffer=None):
+        """
+        Initialize an empty order book, or attach to one laid out in a buffer.
+
+        :param symbols: List of symbols to store.
+        :param depth: Number of levels stored per side.
+        :param buffer: Writable buffer of at least buffer_size(len(symbols), depth) bytes to lay the arrays out in.
+            It is used as-is: the creator of a shared book calls clear_all() once.
+        """
+        self.symbols = list(symbols)
+        self.depth = depth
+        self.index = {symbol: row for row, symbol in enumerate(self.symbols)}
+        n = len(self.symbols)
+        if buffer is None:
+            self.levels = np.full((n, 2, depth, 2), np.nan)
+            self.update_time = np.zeros(n)
+            self.seq = np.zeros(n, dtype=np.uint64)
+        else:
+            self.seq = np.frombuffer(buffer, dtype=np.uint64, count=n)
+            self.update_time = np.frombuffer(buffer, dtype=np.float64, count=n, offset=8 * n)
+            self.levels = np.frombuffer(buffer, dtype=np.float64, count=n * 2 * depth * 2, offset=16 * n).reshape(n, 2, depth, 2)
+        self._seq = memoryview(self.seq).cast('B').cast('Q')
+
+    @staticmethod
+    def buffer_size(symbol_count: int, depth: int) -> int:
+        """
+        Get the number of bytes a book needs when laid out in a buffer.
+
+        :param symbol_count: Number of symbols.
+        :param depth: Number of levels stored per side.
+        :return: The size in bytes.
+        """
+        return 8 * symbol_count * (2 + 2 * depth * 2)
+
+    def begin_write(self, row: int):
+        """
+        Start writing a row outside of update() and clear(). Pair every call with end_write().
+
+        :param row: Row of the symbol, from self.index.
+        """
+        self._seq[row] += 1
+
+    def end_write(self, row: int):
+        """
+        Publish a row written after begin_write().
+
+        :param row: Row of the symbol, from self.index.
+        """
+        self._seq[row] += 1
+
+    def update(self, row: int, update_time: float, asks: list, bids: list):
+        """
+        Overwrite a symbol's levels in place.
+
+        :param row: Row of the symbol, from self.index.
+        :param update_time: Exchange timestamp of the update in seconds.
+        :param asks: Sequence of [price, qty] pairs, best first. Numeric strings are accepted.
+        :param bids: Sequence of [price, qty] pairs, best first. Numeric strings are accepted.
+        """
+        levels = self.levels[row]
+        n_asks, n_bids = min(self.depth, len(asks)), min(self.depth, len(bids))
+        self._seq[row] += 1
+        try:
+            levels[ASK, :n_asks] = asks[:n_asks]
+            levels[BID, :n_bids] = bids[:n_bids]
+            if n_asks < self.depth:
+                levels[ASK, n_asks:] = np.nan
+            if n_bids < self.depth:
+                levels[BID, n_bids:] = np.nan
+            self.update_time[row] = update_time
+        finally:
+            self._seq[row] += 1
+
+    def clear(self, row: int):
+        """
+        Mark a symbol as having no data.
+
+        :param row: Row of the symbol, from self.index.
+        """
+        self._seq[row] += 1
+        self.levels[row] = np.nan
+        self.update_time[row] = 0
+        self._seq[row] += 1
+
+    def clear_all(self):
+        """
+        Mark every symbol as having no data and reset the seqlock counters.
+        """
+        self.levels[:] = np.nan
+        self.update_time[:] = 0
+        self.seq[:] = 0
+
+    def recover_interrupted_writes(self) -> np.ndarray:
+        """
+        Clear the rows a dead writer left in the middle of a write and make their counters even again,
+        so the next writer's updates are readable. Only call this while no writer is running.
+
+        :return: The recovered rows.
+        """
+        rows = np.flatnonzero(self.seq % 2 == 1)
+        if rows.size:
+            self.levels[rows] = np.nan
+            self.update_time[rows] = 0
+            self.seq[rows] += 1
+        return rows
+
+    def read(self, row: int) -> tuple[float, np.ndarray]:
+        """
+        Copy one symbol's book consistently, retrying while a writer is in the middle of the row.
+        A row that stays mid-write for READ_TIMEOUT seconds reads as empty.
+
+        :param row: Row of the symbol, from self.index.
+        :return: A tuple of the update time (0 when empty) and a copy of the row's levels.
+        """
+        seq = self._seq
+        spins = 0
+        deadline = None
+        while True:
+            before = seq[row]
+            if not before & 1:
+                levels = self.levels[row].copy()
+                update_time = float(self.update_time[row])
+                if seq[row] == before:
+                    return update_time, levels
+            spins += 1
+            if spins >= READ_SPINS:
+                now = time.perf_counter()
+                if deadline is None:
+                    deadline = now + READ_TIMEOUT
+                elif now >= deadline:
+                    return 0.0, np.full(self.levels.shape[1:], np.nan)
+                time.sleep(0)
+
+    def best_ask(self) -> np.ndarray:
+        """
+        Get the best ask price of every symbol, ordered like self.symbols.
+
+        :return: A view of the best ask prices.
+        """
+        return self.levels[:, ASK, 0, PRICE]
+
+    def best_bid(self) -> np.ndarray:
+        """
+        Get the best bid price of every symbol, ordered like self.symbols.
+
+        :return: A view of the best bid prices.
+        """
+        return self.levels[:, BID, 0, PRICE]
+
+    def best_ask_qty(self) -> np.ndarray:
+        """
+        Get the best ask quantity of every symbol, ordered like self.symbols.
+
+        :return: A view of the best ask quantities.
+        """
+        return self.levels[:, ASK, 0, QTY]
+
+    def best_bid_qty(self) -> np.ndarray:
+        """
+        Get the best bid quantity of every symbol, ordered like self.symbols.
+
+        :return: A view of the best bid quantities.
+        """
+        return self.levels[:, BID, 0, QTY]
+
+    def mid_price(self) -> np.ndarray:
+        """
+        Get the mid price of every symbol, ordered like self.symbols.
+
+        :return: An array of mid prices.
+        """
+        return (self.best_ask() + self.best_bid()) / 2
+
+    def to_dataframe(self):
+        """
+        Get the book as a DataFrame indexed by symbol with the legacy column names.
+
+        :return: A pandas DataFrame.
+        """
+        import pandas as pd
+        return pd.DataFrame.from_dict({symbol: self[symbol] for symbol in self.symbols}, orient='index')
+
+    def __getitem__(self, symbol: str) -> dict:
+        update_time, levels = self.read(self.index[symbol])
+        if not update_time:
+            return {}
+        levels = levels.tolist()
+        symbol_data = {'update_time': update_time}
+        for i in range(self.depth):
+            symbol_data[f"ask_{i+1}"] = levels[ASK][i][PRICE]
+            symbol_data[f"bid_{i+1}"] = levels[BID][i][PRICE]
+            symbol_data[f"ask_{i+1}_qty"] = levels[ASK][i][QTY]
+            symbol_data[f"bid_{i+1}_qty"] = levels[BID][i][QTY]
+        return symbol_data
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
@@ -0,0 +1,375 @@
+import math
+import time
+import itertools
+
+from base.Account import Account
+from base.Broker import Broker
+from base.OrderBook import ASK, BID, PRICE, QTY
+from base.OrderSheet import OrderSheet
+from utils.logger import trade_logger
+
+
+class PaperAccount(Account):
+    """
+    Account-compatible balance updated by PaperBroker fills.
+
+    Cash-flow accounting: buys pay quote currency, sells receive it, fees are paid in quote currency,
+    and positions are signed (negative qty is a short). total_balance marks positions to the market's mid price.
+    """
+
+    def __init__(self, initial_balance: float, market=None):
+        """
+        Initialize a paper account.
+
+        :param initial_balance: Starting balance in quote currency.
+        :param market: Optional Market used to mark positions to market in total_balance.
+        """
+        self.cash = initial_balance
+        self.reserved = 0
+        self.market = market
+        self.balance = {'total_balance': initial_balance, 'available_balance': initial_balance, 'positions': {}}
+
+    def apply_fill(self, symbol: str, is_buy: bool, qty: float, price: float, fee: float):
+        """
+        Update cash and the position of a symbol with a fill.
+
+        :param symbol: The filled symbol.
+        :param is_buy: True for a buy fill, False for a sell fill.
+        :param qty: The filled quantity.
+        :param price: The fill price.
+        :param fee: The fee paid in quote currency.
+        """
+        signed_qty = qty if is_buy else -qty
+        self.cash -= signed_qty * price + fee
+        positions = self.balance['positions']
+        position = positions.get(symbol)
+        if position is None:
+            positions[symbol] = {'avg_price': price, 'qty': signed_qty}
+        else:
+            old_qty = position['qty']
+            new_qty = old_qty + signed_qty
+            if abs(new_qty) < 1e-12:
+                del positions[symbol]
+                new_qty = 0
+            elif old_qty * signed_qty > 0:
+                position['avg_price'] = (position['avg_price'] * old_qty + price * signed_qty) / new_qty
+            elif old_qty * new_qty < 0:
+                # Position flipped: the remainder was opened at this fill's price.
+                position['avg_price'] = price
+            if new_qty:
+                position['qty'] = new_qty
+        self._refresh()
+
+    def reserve(self, amount: float):
+        """
+        Lock quote currency for a resting buy order.
+
+        :param amount: Amount to lock. Negative values release a reservation.
+        """
+        self.reserved += amount
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Recompute available and total balance.
+        """
+        self.balance['available_balance'] = self.cash - self.reserved
+        total_balance = self.cash
+        for symbol, position in self.balance['positions'].items():
+            total_balance += position['qty'] * self._mark_price(symbol, position)
+        self.balance['total_balance'] = total_balance
+
+    def _mark_price(self, symbol: str, position: dict) -> float:
+        """
+        Get the price a position is marked at: the book mid price, or the average price without a book.
+
+        :param symbol: The position's symbol.
+        :param position: The position.
+        :return: The mark price.
+        """
+        if self.market is not None:
+            row = self.market.order_book.index.get(symbol)
+            if row is not None:
+                levels = self.market.order_book.levels[row]
+                mid = (levels[ASK, 0, PRICE] + levels[BID, 0, PRICE]) / 2
+                if mid == mid:
+                    return float(mid)
+        return position['avg_price']
+
+
+class _RestingOrder:
+    __slots__ = ('order_sheet', 'is_buy', 'price', 'remaining')
+
+    def __init__(self, order_sheet: OrderSheet, is_buy: bool, price: float, remaining: float):
+        self.order_sheet = order_sheet
+        self.is_buy = is_buy
+        self.price = price
+        self.remaining = remaining
+
+
+class PaperBroker(Broker):
+    """
+    Simulated broker that fills OrderSheets against the live or replayed order book of a Market.
+
+    Market orders walk the book level by level. A market order the book cannot fill completely keeps its
+    partial fills but is reported unsuccessful. Limit orders fill their marketable part immediately and rest
+    the remainder, which fills as the book crosses their price. Prices and quantities are rounded with the
+    exchange's tick and lot rules before matching. Orders on books that are not fresh are rejected.
+    """
+
+    def __init__(self, market, account: PaperAccount, price_unit=None, qty_step=None, fee_rate: float = 0.0):
+        """
+        Initialize a paper broker.
+
+        :param market: The Market whose order book is used for matching.
+        :param account: The PaperAccount updated by fills.
+        :param price_unit: Optional function (symbol, price) -> price tick.
+        :param qty_step: Optional function (symbol) -> quantity step.
+        :param fee_rate: Fee as a fraction of the fill notional.
+        """
+        self.market = market
+        self.account = account
+        self.price_unit = price_unit
+        self.qty_step = qty_step
+        self.fee_rate = fee_rate
+        self.open_orders = {}
+        self.fills = []
+        self._order_ids = itertools.count(1)
+
+    @classmethod
+    def for_binance_usdm(cls, market, account: PaperAccount, fee_rate: float = 0.0004):
+        """
+        Create a paper broker with Binance USDM tick and lot rules.
+
+        :param market: A BinanceUsdmMarket instance.
+        :param account: The PaperAccount updated by fills.
+        :param fee_rate: Taker fee rate.
+        :return: A PaperBroker.
+        """
+        from binance_usdm.broker import BINANCE_USDM_RULES
+        return cls(market, account,
+                   price_unit=lambda symbol, price: BINANCE_USDM_RULES[symbol].tick_size,
+                   qty_step=lambda symbol: BINANCE_USDM_RULES[symbol].step_size,
+                   fee_rate=fee_rate)
+
+    @classmethod
+    def for_upbit_krw(cls, market, account: PaperAccount, fee_rate: float = 0.0005):
+        """
+        Create a paper broker with Upbit KRW price units.
+
+        :param market: An UpbitKrwMarket instance.
+        :param account: The PaperAccount updated by fills.
+        :param fee_rate: Fee rate.
+        :return: A PaperBroker.
+        """
+        from upbit.broker import upbit_price_unit
+        return cls(market, account, price_unit=lambda symbol, price: upbit_price_unit(price), fee_rate=fee_rate)
+
+    def start(self):
+        """
+        Start matching resting orders on every order book update.
+        """
+        self.market.add_listener(self.on_update)
+
+    def stop(self):
+        """
+        Stop matching resting orders.
+        """
+        self.market.remove_listener(self.on_update)
+
+    async def aplace_order(self, order_sheet: OrderSheet) -> OrderSheet:
+        """
+        Place an order using the provided OrderSheet.
+
+        :param order_sheet: An instance of the OrderSheet to use for placing the order.
+        :return: The OrderSheet with the simulated result.
+        """
+        return self.place_order(order_sheet)
+
+    def place_order(self, order_sheet: OrderSheet) -> OrderSheet:
+        """
+        Synchronously match an order against the current book.
+
+        :param order_sheet: An instance of the OrderSheet to use for placing the order.
+        :return: The OrderSheet with the simulated result.
+        """
+        time1 = time.time()
+        symbol = order_sheet.symbol
+        row = self.market.order_book.index.get(symbol)
+        is_buy = order_sheet.side.lower() in ('buy', 'bid')
+        qty = self._round_qty(symbol, order_sheet.qty)
+        order_sheet.is_successful = False
+        if row is None or (qty <= 0 and not order_sheet.qty_by_quote):
+            trade_logger.error(f"Paper order rejected:\n" + str(order_sheet))
+            return order_sheet
+        if self.market.freshness is not None and not self.market.is_fresh(symbol):
+            trade_logger.error(f"Paper order rejected, {symbol} book is not fresh:\n" + str(order_sheet))
+            return order_sheet
+        levels = self.market.order_book.levels[row, ASK if is_buy else BID].tolist()
+        if order_sheet.order_type == 'market':
+            if qty > 0:
+                remaining = self._match(symbol, is_buy, levels, qty, math.inf if is_buy else 0)
+                unfilled = f"{remaining} of {qty}"
+            else:
+                remaining = self._match_by_quote(symbol, is_buy, levels, order_sheet.qty_by_quote)
+                unfilled = f"{remaining} of {order_sheet.qty_by_quote} quote"
+            if remaining > 1e-9:
+                trade_logger.error(f"Paper market order not filled, {unfilled} left unfilled by the {symbol} book:\n" + str(order_sheet))
+                return order_sheet
+        else:
+            price = self._round_price(symbol, order_sheet.price)
+            remaining = self._match(symbol, is_buy, levels, qty, price)
+            if remaining > 0:
+                self.open_orders.setdefault(symbol, []).append(_RestingOrder(order_sheet, is_buy, price, remaining))
+                if is_buy:
+                    self.account.reserve(remaining * price)
+        time2 = time.time()
+        order_sheet.is_successful = True
+        order_sheet.exchange_order_id = next(self._order_ids)
+        order_sheet.timestamp = time2
+        order_sheet.time_took = time2 - time1
+        return order_sheet
+
+    async def acancel_order(self, order_sheet: OrderSheet):
+        """
+        Cancel a resting order using the provided OrderSheet.
+
+        :param order_sheet: The OrderSheet returned by aplace_order.
+        """
+        orders = self.open_orders.get(order_sheet.symbol, [])
+        for order in orders:
+            if order.order_sheet is order_sheet or order.order_sheet.exchange_order_id == order_sheet.exchange_order_id:
+                self._remove(order_sheet.symbol, order)
+                return
+
+    async def acancel_order_by_symbol(self, symbol: str):
+        """
+        Cancel all resting orders for a specific symbol.
+
+        :param symbol: The symbol for which to cancel all open orders.
+        """
+        for order in list(self.open_orders.get(symbol, [])):
+            self._remove(symbol, order)
+
+    def on_update(self, market, symbol: str):
+        """
+        Market listener: fill resting orders of the symbol that the new book crosses.
+
+        :param market: The updated market.
+        :param symbol: The updated symbol.
+        """
+        orders = self.open_orders.get(symbol)
+        if not orders:
+            return
+        levels = self.market.order_book.levels[self.market.order_book.index[symbol]]
+        best_ask, best_bid = levels[ASK, 0, PRICE], levels[BID, 0, PRICE]
+        asks, bids = None, None
+        for order in list(orders):
+            if order.is_buy and best_ask <= order.price:
+                asks = levels[ASK].tolist() if asks is None else asks
+                filled = order.remaining - self._match(symbol, True, asks, order.remaining, order.price, consume=True)
+                self.account.reserve(-filled * order.price)
+            elif not order.is_buy and best_bid >= order.price:
+                bids = levels[BID].tolist() if bids is None else bids
+                filled = order.remaining - self._match(symbol, False, bids, order.remaining, order.price, consume=True)
+            else:
+                continue
+            order.remaining -= filled
+            if order.remaining <= 1e-12:
+                self._remove(symbol, order, release=False)
+
+    def _match(self, symbol: str, is_buy: bool, levels: list, qty: float, limit_price: float, consume: bool = False) -> float:
+        """
+        Walk the opposite side of the book and fill up to qty at prices no worse than limit_price.
+
+        :param symbol: The symbol to fill.
+        :param is_buy: True for buys (walks asks), False for sells (walks bids).
+        :param levels: The opposite side as a list of [price, qty], best first.
+        :param qty: Quantity to fill.
+        :param limit_price: Worst acceptable price.
+        :param consume: Reduce level quantities in levels, so several resting orders share the displayed liquidity.
+        :return: The unfilled quantity.
+        """
+        for level in levels:
+            price, level_qty = level[PRICE], level[QTY]
+            if qty <= 0 or not level_qty > 0:
+                break
+            if (is_buy and price > limit_price) or (not is_buy and price < limit_price):
+                break
+            fill_qty = min(qty, level_qty)
+            self._fill(symbol, is_buy, fill_qty, price)
+            qty -= fill_qty
+            if consume:
+                level[QTY] = level_qty - fill_qty
+        return qty
+
+    def _match_by_quote(self, symbol: str, is_buy: bool, levels: list, quote_qty: float) -> float:
+        """
+        Walk the opposite side of the book and fill until quote_qty of notional is spent.
+
+        :param symbol: The symbol to fill.
+        :param is_buy: True for buys (walks asks), False for sells (walks bids).
+        :param levels: The opposite side as a list of [price, qty], best first.
+        :param quote_qty: Notional to fill in quote currency.
+        :return: The unfilled notional, 0 once what is left is less than one lot.
+        """
+        for price, level_qty in levels:
+            if quote_qty <= 0 or not level_qty > 0:
+                break
+            fill_qty = self._round_qty(symbol, min(level_qty, quote_qty / price))
+            if fill_qty <= 0:
+                return 0.0
+            self._fill(symbol, is_buy, fill_qty, price)
+            quote_qty -= fill_qty * price
+        return quote_qty
+
+    def _fill(self, symbol: str, is_buy: bool, qty: float, price: float):
+        """
+        Record a fill and apply it to the account.
+
+        :param symbol: The filled symbol.
+        :param is_buy: True for a buy fill, False for a sell fill.
+        :param qty: The filled quantity.
+        :param price: The fill price.
+        """
+        fee = qty * price * self.fee_rate
+        self.fills.append((time.time(), symbol, 'buy' if is_buy else 'sell', price, qty, fee))
+        self.account.apply_fill(symbol, is_buy, qty, price, fee)
+
+    def _remove(self, symbol: str, order: _RestingOrder, release: bool = True):
+        """
+        Remove a resting order and release its reservation.
+
+        :param symbol: The order's symbol.
+        :param order: The resting order.
+        :param release: Release the unfilled part of a buy order's reservation.
+        """
+        self.open_orders[symbol].remove(order)
+        if release and order.is_buy:
+            self.account.reserve(-order.remaining * order.price)
+
+    def _round_price(self, symbol: str, price: float) -> float:
+        """
+        Round a price to the symbol's tick.
+
+        :param symbol: The symbol.
+        :param price: The price to round.
+        :return: The rounded price.
+        """
+        if self.price_unit is None:
+            return price
+        tick = self.price_unit(symbol, price)
+        return round(round(price / tick) * tick, 10)
+
+    def _round_qty(self, symbol: str, qty: float) -> float:
+        """
+        Round a quantity down to the symbol's lot step.
+
+        :param symbol: The symbol.
+        :param qty: The quantity to round.
+        :return: The rounded quantity.
+        """
+        if self.qty_step is None or not qty:
+            return qty
+        step = self.qty_step(symbol)
+        return round(math.floor(qty / step + 1e-9) * step, 10)
@@ -1,32 +1,22 @@
-import hmac
 import time
-import hashlib
-import requests
-from aiohttp import ClientSession, ClientTimeout
 
 from base.OrderSheet import OrderSheet
 from base.Broker import Broker
+from utils.exchange_info import exchange_info
+from utils.binance_auth import BinanceSigner, spot_clock
+from utils.http_pool import http_pool
+from utils.symbol_rules import SymbolRulesTable
+from utils.benchmark import timed
 from utils.logger import trade_logger
 
 def fetch_symbols_and_tick_info() -> tuple[list[str], dict]:
     """
-    Fetch symbols and tick size information from the Binance API.
+    Get symbols and tick size information from the shared exchange info registry.
 
     :return: A tuple containing the list of symbols and a dictionary of tick size information.
     """
-    symbol_data = fetch_symbol_data()
-    return _process_symbol_data(symbol_data)
-
-def fetch_symbol_data():
-    """
-    Fetch symbol data from the Binance API.
-
-    :return: Raw symbol data from the Binance API.
-    """
-    endpoint = "https://api4.binance.com/api/v3/exchangeInfo"
-    response = requests.get(endpoint)
-    symbol_data = response.json()
-    return symbol_data
+    symbols, tick_info = exchange_info.get('binance_spot_symbols')
+    return symbols, tick_info
 
 def _process_symbol_data(raw_symbol_data):
     """
@@ -55,7 +45,17 @@ def _process_symbol_data(raw_symbol_data):
                 }
     return symbols, tick_info
 
-all_symbols, tick_info = fetch_symbols_and_tick_info()
+exchange_info.register('binance_spot_symbols', "https://api4.binance.com/api/v3/exchangeInfo", _process_symbol_data)
+
+def __getattr__(name: str):
+    # all_symbols and tick_info are resolved lazily so importing this module never touches the network.
+    if name == 'all_symbols':
+        return fetch_symbols_and_tick_info()[0]
+    if name == 'tick_info':
+        return fetch_symbols_and_tick_info()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+BINANCE_SPOT_RULES = SymbolRulesTable('binance_spot_symbols', 'USDT')
 
 class BinanceSpotBroker(Broker):
     def __init__(self, api_key: str, secret_key: str):
@@ -67,8 +67,17 @@ class BinanceSpotBroker(Broker):
         """
         self.api_key = api_key
         self.secret_key = secret_key
+        self.signer = BinanceSigner(api_key, secret_key)
+        self.clock = spot_clock
         self.base_endpoint = "https://api4.binance.com/api/v3/order"
 
+    async def aconnect(self):
+        """
+        Start the clock sync with Binance Spot, so the first order is not rejected for its timestamp.
+        """
+        self.clock.start_sync()
+
+    @timed
     async def aplace_order(self, order_sheet: OrderSheet):
         """
         Place an order using the provided OrderSheet.
@@ -150,51 +159,36 @@ class BinanceSpotBroker(Broker):
         :param order_sheet: An instance of the OrderSheet to use for placing the order.
         :return: A dictionary of order parameters.
         """
-        params = {}
-        symbol, side, qty, qty_by_quote, price, order_type = order_sheet.symbol, order_sheet.side, order_sheet.qty, order_sheet.qty_by_quote, order_sheet.price, order_sheet.order_type
-        min_qty = tick_info[symbol]['min_qty']
-        tick_size = tick_info[symbol]['tick_size']
-        min_qty_decimal_places = self._get_decimal_places(min_qty)
-        tick_size_decimal_places = self._get_decimal_places(tick_size)
-        price = float(format(price, f".{tick_size_decimal_places}f"))
-        timestamp = self._set_timestamp()
-        if qty != 0:
-            qty = float(format(qty, f".{min_qty_decimal_places}f"))
-            params = {'symbol': symbol + 'USDT',
-                  'side': side.upper(),
-                  'type': order_type.upper(),
-                  'quantity': str(qty),
-                  'recvWindow': 5000,
-                  'timestamp': timestamp
-                  }
-        else: 
-            qty_by_quote = float(format(qty_by_quote, f".1f"))
-            params = {'symbol': symbol + 'USDT',
-                  'side': side.upper(),
-                  'type': order_type.upper(),
-                  'quoteOrderQty': str(qty_by_quote),
-                  'recvWindow': 5000,
-                  'timestamp': timestamp
-                  }
-
+        rules = BINANCE_SPOT_RULES[order_sheet.symbol]
+        order_type = order_sheet.order_type
+        params = rules.template((order_sheet.side, order_type), self._build_order_template).copy()
+        if order_sheet.qty != 0:
+            params['quantity'] = rules.format_qty(order_sheet.qty)
+        else:
+            params['quoteOrderQty'] = format(order_sheet.qty_by_quote, ".1f")
+        params['timestamp'] = self._set_timestamp()
         if order_type == 'limit':
-            params['timeInForce'] = 'GTC'
-            params['price'] = str(price)
+            params['price'] = rules.format_price(order_sheet.price)
         return params
 
-
-    def _get_decimal_places(self, num) -> int:
+    def _build_order_template(self, symbol: str, key: tuple) -> dict:
         """
-        Determine the number of decimal places in a given number.
+        Build the constant part of the order parameters of a symbol.
 
-        :param num: The number for which to calculate the decimal places.
-        :return: The number of decimal places.
+        :param symbol: The exchange symbol (e.g. 'BTCUSDT').
+        :param key: Tuple of (side, order_type).
+        :return: A dictionary of order parameters.
         """
-        if num < 1.0:
-            return len(str(num).split('.')[-1])
-        else:
-            return len(str(num).split('.')[0]) - 1
-        
+        side, order_type = key
+        params = {'symbol': symbol,
+                  'side': side.upper(),
+                  'type': order_type.upper(),
+                  'recvWindow': 5000}
+        if order_type == 'limit':
+            params['timeInForce'] = 'GTC'
+        return params
+
+    @timed
     async def _acall_api(self, method: str, endpoint: str, params: dict):
         """
         Make an asynchronous API call to the specified endpoint.
@@ -204,13 +198,10 @@ class BinanceSpotBroker(Broker):
         :param params: The parameters to include in the API call.
         :return: The JSON response from the API call.
         """
-        query_string = self._set_query_string(params)
-        signature = self._set_signature(query_string)
-        headers = self._set_headers()
-        timeout = ClientTimeout(total=1)
-        async with ClientSession(timeout=timeout) as session:
-            async with session.request(method, f"{endpoint}?{query_string}&signature={signature}", headers=headers) as res:
-                return await res.json()
+        url = self.signer.signed_url(endpoint, params)
+        response = await http_pool.arequest(method, url, headers=self.signer.headers, timeout=1)
+        self.clock.check_response(response)
+        return response
 
     def _set_signature(self, query_string: str) -> str:
         """
@@ -219,8 +210,7 @@ class BinanceSpotBroker(Broker):
         :param query_string: The query string to be signed.
         :return: The generated API signature.
         """
-        signature = hmac.new(self.secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-        return signature
+        return self.signer.sign(query_string)
 
     def _set_headers(self) -> dict:
         """
@@ -228,10 +218,7 @@ class BinanceSpotBroker(Broker):
 
         :return: A dictionary containing the API headers.
         """
-        headers = {
-            'X-MBX-APIKEY': self.api_key,
-        }
-        return headers
+        return self.signer.headers
     
     def _set_timestamp(self) -> int:
         """
@@ -240,5 +227,4 @@ class BinanceSpotBroker(Broker):
         :return: The generated timestamp.
         :rtype: int
         """
-        timestamp = int(time.time() * 1000)
-        return timestamp
+        return self.clock.timestamp()
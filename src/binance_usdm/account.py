@@ -1,51 +1,260 @@
-import hmac
 import time
-import hashlib
 import asyncio
 import websockets
 import json
-from pubsub import pub
-from aiohttp import ClientSession, ClientTimeout
 
 from base.Account import Account
-from base.Events import Events
+from utils.backoff import Backoff
+from utils.binance_auth import BinanceSigner, usdm_clock
+from utils.decoder import get_decoder
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import account_logger
 
+# Listen keys expire after 60 minutes without a keepalive.
+LISTEN_KEY_KEEP_ALIVE_INTERVAL = 30 * 60
+
 class BinanceUsdmAccount(Account):
 
     def __init__(self, api_key:str, secret_key:str):
         self.api_key = api_key
         self.secret_key = secret_key
+        self.signer = BinanceSigner(api_key, secret_key)
+        self.clock = usdm_clock
         self.account_endpoint = "https://fapi.binance.com/fapi/v2/account"
         self.stream_endpoint = "wss://fstream.binance.com/ws"
-        pub.subscribe(self._on_account_event_from_client, Events.ACCOUNT_EVENT_FROM_CLIENT.value)
+        self.balance = {'total_balance':0, 'available_balance':0, 'positions':{}}
+        # USDT wallet balance and available balance of the last REST snapshot, and the wallet balance since.
+        self._snapshot_wallet_balance = 0
+        self._snapshot_available_balance = 0
+        self._wallet_balance = 0
+        self._unrealized_profits = {}
+        self.open_orders = {}
+        self.last_event_time = 0
+        self._refresh_task = None
+        # ACCOUNT_UPDATE events received while a REST snapshot is in flight, re-applied on top of it.
+        self._replay = None
+        self._decode = get_decoder()
+        self.listen_key_endpoint = "https://fapi.binance.com/fapi/v1/listenKey"
+        self._websocket = None
+        self._stale_since = time.time()
+        self.synced_at = 0
+        self.reconnects = 0
 
     async def aupdate_balance(self):
+        """
+        Replace the account state with a REST snapshot. Prefer arefresh(), which coalesces concurrent calls.
+        """
         try: 
             #updates balance and positions and publishes the event
+            fetch_time = self._set_timestamp()
+            self._replay = []
             raw_account_data = await self._fetch_account_data()
-            balance = self._process_raw_account_data(raw_account_data)
-            self.balance = balance
+            self._apply_snapshot(raw_account_data)
+            for event in self._replay:
+                if event['T'] >= fetch_time:
+                    self._apply_account_update(event)
+            self.synced_at = time.time()
+            if self._websocket is not None and self._stale_since is not None:
+                account_logger.info(f"Binance USDM account view resynced after {self.staleness():.1f}s stale")
+                self._stale_since = None
         except Exception as e:
             message = f"Error while updating Binance USDM balance: {e}"
             account_logger.error(message)
+        finally:
+            self._replay = None
+
+    async def arefresh(self):
+        """
+        Reconcile with a REST snapshot. Concurrent calls share a single request.
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.aupdate_balance())
+        await asyncio.shield(self._refresh_task)
+
+    async def areconcile_periodically(self, interval: float = 600):
+        """
+        Reconcile with a REST snapshot on a slow timer, in case a stream event was missed.
+
+        :param interval: Seconds between snapshots.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            await self.arefresh()
         
-    async def aconnect(self):
+    async def aconnect(self, reconcile_interval: float = 600):
+        """
+        Supervise the user data stream: keep the listen key alive, reconnect with backoff and jitter
+        after any error, and resync from REST after every (re)connect and every reconcile_interval seconds.
+        Runs until cancelled.
+
+        :param reconcile_interval: Seconds between REST reconciliations.
+        """
+        self.clock.start_sync()
+        backoff = Backoff()
+        reconcile_task = asyncio.create_task(self.areconcile_periodically(reconcile_interval))
         try:
-            listen_key = await self._get_listen_key()
-            async with websockets.connect(f"{self.stream_endpoint}/{listen_key}") as websocket:
-                while True:
-                    try:
-                        response = await websocket.recv()
-                        pub.sendMessage(Events.ACCOUNT_EVENT_FROM_CLIENT.value, message="Account event from client")
-                    except Exception as e:
-                        print(f"Error in receiving message: {e}")
-        except Exception as e:
-            message = f"Error while connecting stream: {e}"
-            account_logger.error(message)
+            while True:
+                try:
+                    listen_key = await self._get_listen_key()
+                    if listen_key is None:
+                        raise ConnectionError("no listen key")
+                    async with websockets.connect(f"{self.stream_endpoint}/{listen_key}") as websocket:
+                        self._websocket = websocket
+                        keep_alive_task = asyncio.create_task(self._akeep_alive(websocket))
+                        try:
+                            await self.arefresh()
+                            backoff.reset()
+                            async for response in websocket:
+                                try:
+                                    self._on_message(response)
+                                except Exception as e:
+                                    message = f"Error while applying Binance USDM user stream event: {e}"
+                                    account_logger.error(message)
+                                    asyncio.create_task(self.arefresh())
+                        finally:
+                            keep_alive_task.cancel()
+                            self._websocket = None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    message = f"Error while connecting stream: {e}"
+                    account_logger.error(message)
+                self._mark_stale()
+                self.reconnects += 1
+                delay = backoff.next_delay()
+                account_logger.info(f"Reconnecting Binance USDM user stream in {delay:.1f}s")
+                await asyncio.sleep(delay)
+        finally:
+            reconcile_task.cancel()
+
+    def staleness(self) -> float:
+        """
+        Get how long the account view has not been backed by a live, synced stream.
+
+        :return: Seconds since the view went stale, 0 while it is live.
+        """
+        if self._stale_since is None:
+            return 0.0
+        return time.time() - self._stale_since
+
+    @property
+    def is_live(self) -> bool:
+        return self._stale_since is None
+
+    async def _akeep_alive(self, websocket, interval: float = LISTEN_KEY_KEEP_ALIVE_INTERVAL):
+        """
+        Extend the listen key periodically. Closes the stream if the key cannot be extended,
+        so the supervisor reconnects with a new one.
+
+        :param websocket: The user data stream connection.
+        :param interval: Seconds between keepalive requests.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                response = await self._acall_api("PUT", self.listen_key_endpoint, {'recvWindow': 5000, 'timestamp': self._set_timestamp()})
+                if isinstance(response, dict) and 'code' in response:
+                    raise ValueError(response)
+            except Exception as e:
+                message = f"Failed to keep Binance USDM listen key alive, reconnecting: {e}"
+                account_logger.error(message)
+                await websocket.close()
+                return
+
+    def _mark_stale(self):
+        """
+        Record that the stream went down. The view stays stale until the next successful resync.
+        """
+        if self._stale_since is None:
+            self._stale_since = time.time()
+
+    def _on_message(self, message):
+        """
+        Apply one user data stream event to the account state.
+
+        :param message: The raw websocket message.
+        """
+        event = self._decode(message)
+        event_type = event.get('e')
+        event_time = event.get('E', 0)
+        if event_time < self.last_event_time:
+            # Out of order delivery: the in-place deltas can no longer be trusted.
+            account_logger.error(f"Binance USDM user stream event out of order, reconciling: {event}")
+            asyncio.create_task(self.arefresh())
+        self.last_event_time = max(self.last_event_time, event_time)
+        if event_type == 'ACCOUNT_UPDATE':
+            if self._replay is not None:
+                self._replay.append(event)
+            self._apply_account_update(event)
+        elif event_type == 'ORDER_TRADE_UPDATE':
+            self._apply_order_update(event['o'])
+        elif event_type == 'listenKeyExpired':
+            account_logger.error("Binance USDM listen key expired, reconnecting")
+            if self._websocket is not None:
+                asyncio.create_task(self._websocket.close())
+
+    def _apply_snapshot(self, raw_account_data: dict):
+        """
+        Replace the account state with a REST snapshot.
+
+        :param raw_account_data: The /fapi/v2/account response.
+        """
+        balance = self._process_raw_account_data(raw_account_data)
+        self._snapshot_available_balance = balance['available_balance']
+        self._snapshot_wallet_balance = self._wallet_balance = float(raw_account_data['totalWalletBalance'])
+        self._unrealized_profits = {symbol: float(position['unrealizedProfit'])
+                                    for symbol, position in self._iter_usdt_positions(raw_account_data['positions'], 'symbol')}
+        self.balance = balance
+
+    def _apply_account_update(self, event: dict):
+        """
+        Apply an ACCOUNT_UPDATE event. Wallet balances and positions in the event are absolute,
+        so applying an event twice is harmless.
+
+        :param event: The ACCOUNT_UPDATE event.
+        """
+        update = event['a']
+        for asset in update.get('B', []):
+            if asset['a'] == 'USDT':
+                self._wallet_balance = float(asset['wb'])
+        positions = self.balance['positions']
+        for symbol, position in self._iter_usdt_positions(update.get('P', []), 's'):
+            qty = float(position['pa'])
+            avg_price = float(position['ep'])
+            self._unrealized_profits[symbol] = float(position['up'])
+            if abs(qty * avg_price) > 1:
+                positions[symbol] = {'avg_price': avg_price, 'qty': qty}
+            else:
+                positions.pop(symbol, None)
+        # Available balance moves with the wallet until the next snapshot; margin changes are picked up there.
+        self.balance['available_balance'] = self._snapshot_available_balance + self._wallet_balance - self._snapshot_wallet_balance
+        self.balance['total_balance'] = self._wallet_balance + sum(self._unrealized_profits.values())
+
+    def _apply_order_update(self, order: dict):
+        """
+        Track open orders from an ORDER_TRADE_UPDATE event. Fills move positions through the ACCOUNT_UPDATE that follows.
+
+        :param order: The 'o' object of the event.
+        """
+        if order['X'] in ('NEW', 'PARTIALLY_FILLED'):
+            self.open_orders[order['i']] = order
+        else:
+            self.open_orders.pop(order['i'], None)
+        if order['x'] == 'TRADE':
+            account_logger.info(f"Binance USDM fill: {order['s']} {order['S']} {order['l']} @ {order['L']} ({order['X']})")
+
+    def _iter_usdt_positions(self, positions: list, symbol_key: str):
+        """
+        Iterate over the USDT margined positions of a REST response or a stream event.
 
-    def _on_account_event_from_client(self, message):
-        asyncio.create_task(self.aupdate_balance())
+        :param positions: List of positions.
+        :param symbol_key: Key of the exchange symbol in each position.
+        :return: Iterator of (base symbol, position).
+        """
+        for position in positions:
+            if 'USDT' in position[symbol_key]:
+                yield position[symbol_key].replace('USDT', ''), position
 
     async def _fetch_account_data(self):
         try:
@@ -84,36 +293,29 @@ class BinanceUsdmAccount(Account):
                 'recvWindow': 5000,
                 'timestamp': self._set_timestamp()
             }
-            response = await self._acall_api("POST", f"https://fapi.binance.com/fapi/v1/listenKey", params)
+            response = await self._acall_api("POST", self.listen_key_endpoint, params)
             return response['listenKey']
 
         except Exception as e:
             message = f"Error while getting listen key: {e}"
             account_logger.error(message)
 
+    @timed
     async def _acall_api(self, method:str, endpoint:str, params:dict):
-        query_string = self._set_query_string(params)
-        signature = self._set_signature(query_string)
-        headers = self._set_headers()
-        timeout = ClientTimeout(total=1)
-        async with ClientSession(timeout=timeout) as session:
-            async with session.request(method, f"{endpoint}?{query_string}&signature={signature}", headers=headers) as res:
-                return await res.json()
+        url = self.signer.signed_url(endpoint, params)
+        response = await http_pool.arequest(method, url, headers=self.signer.headers, timeout=1)
+        self.clock.check_response(response)
+        return response
 
     def _set_query_string(self, params: dict) -> str:
         query_string = '&'.join(["{}={}".format(key, params[key]) for key in params.keys()])
         return query_string
     
     def _set_signature(self, query_string: dict) -> str:
-        signature = hmac.new(self.secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-        return signature
+        return self.signer.sign(query_string)
 
     def _set_headers(self):
-        headers = {
-            'X-MBX-APIKEY': self.api_key,
-        }
-        return headers
+        return self.signer.headers
     
     def _set_timestamp(self):
-        timestamp = int(time.time() * 1000)
-        return timestamp
\ No newline at end of file
+        return self.clock.timestamp()
\ No newline at end of file
@@ -1,32 +1,62 @@
-import hmac
+import json
 import time
-import hashlib
-import requests
-from aiohttp import ClientSession, ClientTimeout
+import asyncio
+from urllib.parse import quote
 
 from base.OrderSheet import OrderSheet
 from base.Broker import Broker
-from binance_usdm.market import BINANCE_USDM_TICK_INFO
+import binance_usdm.market  # registers the binance_usdm_symbols exchange info
+from binance_usdm.ws_api import BinanceUsdmWsApi, WsApiUnavailable
+from utils.symbol_rules import SymbolRulesTable
+from utils.binance_auth import BinanceSigner, usdm_clock
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import trade_logger
 
+BINANCE_USDM_RULES = SymbolRulesTable('binance_usdm_symbols', 'USDT')
+# Maximum number of orders per batchOrders request.
+BATCH_ORDER_LIMIT = 5
+
 class BinanceUsdmBroker(Broker):
-    def __init__(self, api_key: str, secret_key: str):
+    def __init__(self, api_key: str, secret_key: str, ws_api_endpoint: str = None):
         """
         Initialize a Binance USDM Broker with API keys.
 
         :param api_key: The Binance API key.
         :param secret_key: The Binance API secret key.
+        :param ws_api_endpoint: WebSocket API URL to place orders over (e.g. WS_API_ENDPOINT).
+                                Orders go over REST when None or while the websocket is down.
         """
         self.api_key = api_key
         self.secret_key = secret_key
+        self.signer = BinanceSigner(api_key, secret_key)
+        self.clock = usdm_clock
         self.base_endpoint = "https://fapi.binance.com/fapi/v1/order"
+        self.batch_endpoint = "https://fapi.binance.com/fapi/v1/batchOrders"
+        self.ws_api = BinanceUsdmWsApi(self.signer, self.clock, ws_api_endpoint) if ws_api_endpoint else None
+
+    async def aconnect(self):
+        """
+        Start the clock sync with Binance USDM and keep the WebSocket API order channel connected.
+        Returns right away when the WebSocket API is not configured.
+        """
+        self.clock.start_sync()
+        if self.ws_api is not None:
+            await self.ws_api.aconnect()
 
+    @timed
     async def aplace_order(self, order_sheet: OrderSheet):
         """
         Place an order using the provided OrderSheet.
 
         :param order_sheet: An instance of the OrderSheet to use for placing the order.
         """
+        if self.ws_api is not None and self.ws_api.is_connected:
+            try:
+                return await self._aplace_order_ws(order_sheet)
+            except WsApiUnavailable as e:
+                message = f"Falling back to REST order entry in Binance USDM: {e}"
+                trade_logger.error(message)
         params = self._set_order_params(order_sheet)
         time1 = time.time()
         trade_logger.info(f"Placing order in Binance USDM:\n" + str(order_sheet))
@@ -51,6 +81,101 @@ class BinanceUsdmBroker(Broker):
             message = f"Error while creating order in Binance USDM: {e}"
             trade_logger.error(message)
 
+    async def _aplace_order_ws(self, order_sheet: OrderSheet):
+        """
+        Place an order over the WebSocket API.
+
+        :param order_sheet: An instance of the OrderSheet to use for placing the order.
+        :raises WsApiUnavailable: If the order could not be sent, so it can go over REST instead.
+        """
+        params = self._set_order_params(order_sheet)
+        del params['timestamp']
+        params = {key: self._format_batch_value(value) for key, value in params.items()}
+        time1 = time.time()
+        trade_logger.info(f"Placing order in Binance USDM (WebSocket API):\n" + str(order_sheet))
+        try:
+            response = await self.ws_api.aplace_order(params)
+        except WsApiUnavailable:
+            raise
+        except Exception as e:
+            message = f"Error while creating order in Binance USDM (WebSocket API): {e}"
+            trade_logger.error(message)
+            order_sheet.is_successful = False
+            return False
+        time2 = time.time()
+        order_sheet.is_successful = True
+        order_sheet.timestamp = time2
+        order_sheet.time_took = time2 - time1
+        order_sheet.exchange_order_id = str(response['orderId'])
+        return order_sheet
+
+    async def aplace_orders(self, order_sheets: list[OrderSheet]) -> list[OrderSheet]:
+        """
+        Place several orders through the batchOrders endpoint, BATCH_ORDER_LIMIT orders per request.
+        Requests for different chunks are sent concurrently. While the WebSocket API is connected,
+        every order is pipelined over it instead.
+
+        :param order_sheets: The OrderSheets to place.
+        :return: The OrderSheets, in the same order, each with its own result.
+        """
+        if self.ws_api is not None and self.ws_api.is_connected:
+            return await super().aplace_orders(order_sheets)
+        if len(order_sheets) == 1:
+            return [await self.aplace_order(order_sheets[0])]
+        chunks = [order_sheets[i:i + BATCH_ORDER_LIMIT] for i in range(0, len(order_sheets), BATCH_ORDER_LIMIT)]
+        await asyncio.gather(*[self._aplace_batch(chunk) for chunk in chunks])
+        return order_sheets
+
+    async def _aplace_batch(self, order_sheets: list[OrderSheet]):
+        """
+        Place up to BATCH_ORDER_LIMIT orders in a single batchOrders request.
+
+        :param order_sheets: The OrderSheets to place. Each one is updated with its result.
+        """
+        batch = []
+        for order_sheet in order_sheets:
+            params = self._set_order_params(order_sheet)
+            del params['recvWindow'], params['timestamp']
+            batch.append({key: self._format_batch_value(value) for key, value in params.items()})
+        params = {
+            'batchOrders': quote(json.dumps(batch, separators=(',', ':'))),
+            'recvWindow': 5000,
+            'timestamp': self._set_timestamp(),
+        }
+        time1 = time.time()
+        trade_logger.info(f"Placing {len(order_sheets)} orders in Binance USDM:\n" + "\n".join(str(order_sheet) for order_sheet in order_sheets))
+        try:
+            responses = await self._acall_api("POST", self.batch_endpoint, params)
+            time2 = time.time()
+            if not isinstance(responses, list):
+                raise ValueError(responses)
+            for order_sheet, response in zip(order_sheets, responses):
+                order_sheet.timestamp = time2
+                order_sheet.time_took = time2 - time1
+                if 'orderId' in response:
+                    order_sheet.is_successful = True
+                    order_sheet.exchange_order_id = str(response['orderId'])
+                else:
+                    order_sheet.is_successful = False
+                    message = f"Failed to place order in Binance USDM: {response}"
+                    trade_logger.error(message)
+        except Exception as e:
+            for order_sheet in order_sheets:
+                order_sheet.is_successful = False
+            message = f"Error while creating batch orders in Binance USDM: {e}"
+            trade_logger.error(message)
+
+    def _format_batch_value(self, value) -> str:
+        """
+        Format an order parameter for the batchOrders and WebSocket API JSON, which only take strings.
+
+        :param value: The parameter value.
+        :return: The string value.
+        """
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        return str(value)
+
     async def acancel_order(self, order_sheet: OrderSheet):
         """
         Cancel an order using the provided OrderSheet.
@@ -99,39 +224,34 @@ class BinanceUsdmBroker(Broker):
         :param order_sheet: An instance of the OrderSheet to use for placing the order.
         :return: A dictionary of order parameters.
         """
-        params = {}
-        symbol, side, qty, price, order_type = order_sheet.symbol, order_sheet.side, order_sheet.qty, order_sheet.price, order_sheet.order_type
-        min_qty = BINANCE_USDM_TICK_INFO[symbol]['min_qty']
-        tick_size = BINANCE_USDM_TICK_INFO[symbol]['tick_size']
-        min_qty_decimal_places = self._get_decimal_places(min_qty)
-        tick_size_decimal_places = self._get_decimal_places(tick_size)
-        qty = float(format(qty, f".{min_qty_decimal_places}f"))
-        price = float(format(price, f".{tick_size_decimal_places}f"))
-        params = {'symbol': symbol + 'USDT',
+        rules = BINANCE_USDM_RULES[order_sheet.symbol]
+        order_type = order_sheet.order_type
+        params = rules.template((order_sheet.side, order_type, order_sheet.reduce_only), self._build_order_template).copy()
+        params['quantity'] = rules.format_qty(order_sheet.qty)
+        params['timestamp'] = self._set_timestamp()
+        if order_type == 'limit':
+            params['price'] = rules.format_price(order_sheet.price)
+        return params
+
+    def _build_order_template(self, symbol: str, key: tuple) -> dict:
+        """
+        Build the constant part of the order parameters of a symbol.
+
+        :param symbol: The exchange symbol (e.g. 'BTCUSDT').
+        :param key: Tuple of (side, order_type, reduce_only).
+        :return: A dictionary of order parameters.
+        """
+        side, order_type, reduce_only = key
+        params = {'symbol': symbol,
                   'side': side.upper(),
                   'type': order_type.upper(),
-                  'quantity': str(qty),
                   'recvWindow': 5000,
-                  'timestamp': self._set_timestamp(),
-                  'reduceOnly': order_sheet.reduce_only}
+                  'reduceOnly': reduce_only}
         if order_type == 'limit':
             params['timeInForce'] = 'GTC'
-            params['price'] = str(price)
         return params
 
-
-    def _get_decimal_places(self, num) -> int:
-        """
-        Determine the number of decimal places in a given number.
-
-        :param num: The number for which to calculate the decimal places.
-        :return: The number of decimal places.
-        """
-        if num < 1.0:
-            return len(str(num).split('.')[-1])
-        else:
-            return len(str(num).split('.')[0]) - 1
-        
+    @timed
     async def _acall_api(self, method: str, endpoint: str, params: dict):
         """
         Make an asynchronous API call to the specified endpoint.
@@ -141,13 +261,10 @@ class BinanceUsdmBroker(Broker):
         :param params: The parameters to include in the API call.
         :return: The JSON response from the API call.
         """
-        query_string = self._set_query_string(params)
-        signature = self._set_signature(query_string)
-        headers = self._set_headers()
-        timeout = ClientTimeout(total=1)
-        async with ClientSession(timeout=timeout) as session:
-            async with session.request(method, f"{endpoint}?{query_string}&signature={signature}", headers=headers) as res:
-                return await res.json()
+        url = self.signer.signed_url(endpoint, params)
+        response = await http_pool.arequest(method, url, headers=self.signer.headers, timeout=1)
+        self.clock.check_response(response)
+        return response
 
     def _set_signature(self, query_string: str) -> str:
         """
@@ -156,8 +273,7 @@ class BinanceUsdmBroker(Broker):
         :param query_string: The query string to be signed.
         :return: The generated API signature.
         """
-        signature = hmac.new(self.secret_key.encode(), query_string.encode(), hashlib.sha256).hexdigest()
-        return signature
+        return self.signer.sign(query_string)
 
     def _set_headers(self) -> dict:
         """
@@ -165,10 +281,7 @@ class BinanceUsdmBroker(Broker):
 
         :return: A dictionary containing the API headers.
         """
-        headers = {
-            'X-MBX-APIKEY': self.api_key,
-        }
-        return headers
+        return self.signer.headers
     
     def _set_timestamp(self) -> int:
         """
@@ -177,5 +290,4 @@ class BinanceUsdmBroker(Broker):
         :return: The generated timestamp.
         :rtype: int
         """
-        timestamp = int(time.time() * 1000)
-        return timestamp
+        return self.clock.timestamp()
@@ -0,0 +1,164 @@
+from bisect import bisect_left, insort
+
+# Events kept while a book waits for its snapshot. Older events are dropped first.
+MAX_BUFFERED_EVENTS = 1000
+
+
+class LocalBook:
+    """
+    Full-depth order book of one symbol, maintained from a REST snapshot and a diff depth stream.
+
+    Each side is a price -> qty dict plus a sorted price list (bids are stored negated, so both
+    lists are best first), so a level change is a dict write and, for new or removed levels,
+    one bisect and one list insert or delete. Any depth can be read from the front of the lists.
+
+    Sequencing follows the Binance USDM rules: events are buffered until a snapshot is loaded,
+    events older than the snapshot are dropped, the first applied event must span (or directly follow)
+    the snapshot's lastUpdateId, and every following event's pu must equal the previous event's u.
+    A broken chain resets the book, which then waits for a new snapshot.
+    """
+
+    def __init__(self, watch_depth: int):
+        """
+        Initialize an empty, unsynced book.
+
+        :param watch_depth: Number of top levels whose changes apply() reports.
+        """
+        self.watch_depth = watch_depth
+        self.asks = {}
+        self.bids = {}
+        self.ask_prices = []
+        self.bid_prices = []
+        self.last_update_id = None
+        self.buffer = []
+        self.gaps = 0
+        self._bridged = False
+
+    @property
+    def synced(self) -> bool:
+        return self.last_update_id is not None
+
+    def reset(self):
+        """
+        Drop every level and wait for a new snapshot. Buffered events are kept.
+        """
+        self.asks.clear()
+        self.bids.clear()
+        self.ask_prices.clear()
+        self.bid_prices.clear()
+        self.last_update_id = None
+        self._bridged = False
+
+    def load_snapshot(self, last_update_id: int, asks: list, bids: list) -> bool:
+        """
+        Load a REST depth snapshot and replay the buffered events on top of it.
+
+        :param last_update_id: lastUpdateId of the snapshot.
+        :param asks: Sequence of [price, qty] pairs. Numeric strings are accepted.
+        :param bids: Sequence of [price, qty] pairs. Numeric strings are accepted.
+        :return: True if the book is synced, False if the snapshot is older than the buffered
+            events and a newer snapshot is needed.
+        """
+        buffer = [event for event in self.buffer if event[1] >= last_update_id]
+        if buffer and buffer[0][0] > last_update_id + 1:
+            self.buffer = buffer
+            return False
+        self.reset()
+        self.asks = {float(price): float(qty) for price, qty in asks if float(qty)}
+        self.bids = {-float(price): float(qty) for price, qty in bids if float(qty)}
+        self.ask_prices = sorted(self.asks)
+        self.bid_prices = sorted(self.bids)
+        self.last_update_id = last_update_id
+        self.buffer = []
+        for event in buffer:
+            self.apply(*event)
+        return self.synced
+
+    def apply(self, first_update_id: int, final_update_id: int, previous_final_update_id: int, asks: list, bids: list):
+        """
+        Apply one diff depth event.
+
+        :param first_update_id: U, the first update id of the event.
+        :param final_update_id: u, the final update id of the event.
+        :param previous_final_update_id: pu, the final update id of the previous event.
+        :param asks: Sequence of [price, qty] pairs. A zero qty removes the level.
+        :param bids: Sequence of [price, qty] pairs. A zero qty removes the level.
+        :return: None if the event was buffered, dropped or broke the chain, otherwise
+            True if one of the top watch_depth levels changed and False if it did not.
+        """
+        last_update_id = self.last_update_id
+        if last_update_id is None:
+            self._buffer(first_update_id, final_update_id, previous_final_update_id, asks, bids)
+            return None
+        if final_update_id < last_update_id:
+            return None
+        if self._bridged:
+            if previous_final_update_id != last_update_id:
+                return self._gap(first_update_id, final_update_id, previous_final_update_id, asks, bids)
+        elif first_update_id > last_update_id + 1:
+            return self._gap(first_update_id, final_update_id, previous_final_update_id, asks, bids)
+        self._bridged = True
+        self.last_update_id = final_update_id
+        changed = False
+        if asks:
+            boundary = _set_levels(self.asks, self.ask_prices, asks, 1.0)
+            changed = len(self.ask_prices) <= self.watch_depth or boundary <= self.ask_prices[self.watch_depth - 1]
+        if bids:
+            boundary = _set_levels(self.bids, self.bid_prices, bids, -1.0)
+            changed = changed or len(self.bid_prices) <= self.watch_depth or boundary <= self.bid_prices[self.watch_depth - 1]
+        return changed
+
+    def top(self, depth: int) -> tuple[list, list]:
+        """
+        Get the best levels of both sides.
+
+        :param depth: Number of levels per side.
+        :return: A tuple of asks and bids, each a list of [price, qty] pairs, best first.
+        """
+        asks, bids = self.asks, self.bids
+        return ([[price, asks[price]] for price in self.ask_prices[:depth]],
+                [[-key, bids[key]] for key in self.bid_prices[:depth]])
+
+    def _buffer(self, *event):
+        """
+        Keep an event for replay once a snapshot is loaded.
+        """
+        self.buffer.append(event)
+        if len(self.buffer) > MAX_BUFFERED_EVENTS:
+            del self.buffer[0]
+
+    def _gap(self, *event):
+        """
+        Reset the book after a sequencing gap and keep the event that revealed it.
+        """
+        self.gaps += 1
+        self.reset()
+        self.buffer = []
+        self._buffer(*event)
+        return None
+
+
+def _set_levels(levels: dict, keys: list, changes: list, sign: float) -> float:
+    """
+    Write level changes into one side of a book.
+
+    :param levels: Key -> qty dict of the side.
+    :param keys: Sorted keys of the side.
+    :param changes: Sequence of [price, qty] pairs.
+    :param sign: 1.0 for asks, -1.0 for bids (keys are negated prices).
+    :return: The best (lowest) key that changed.
+    """
+    best = float('inf')
+    for price, qty in changes:
+        key = sign * float(price)
+        qty = float(qty)
+        if key < best:
+            best = key
+        if qty:
+            if key not in levels:
+                insort(keys, key)
+            levels[key] = qty
+        elif key in levels:
+            del levels[key]
+            del keys[bisect_left(keys, key)]
+    return best
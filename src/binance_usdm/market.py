@@ -1,30 +1,27 @@
-import websockets
+import time
 import asyncio
 import json
-import requests 
 
 from base.Market import Market
+from base.Freshness import FreshnessIndex
+from base.OrderBook import OrderBook
+from binance_usdm.local_book import LocalBook
+from binance_usdm.schema import BinanceDepthMessage, BinanceCombinedDepthMessage, BinanceDiffDepthMessage, BinanceCombinedDiffDepthMessage
+from utils.backoff import Backoff
+from utils.decoder import get_decoder
+from utils.exchange_info import exchange_info
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import market_logger
 
 def fetch_symbols_and_tick_info() -> tuple[list[str], dict]:
     """
-    Fetch symbols and tick size information from the Binance API.
+    Get symbols and tick size information from the shared exchange info registry.
 
     :return: A tuple containing the list of symbols and a dictionary of tick size information.
     """
-    symbol_data = fetch_symbol_data()
-    return _process_symbol_data(symbol_data)
-
-def fetch_symbol_data():
-    """
-    Fetch symbol data from the Binance API.
-
-    :return: Raw symbol data from the Binance API.
-    """
-    endpoint = "https://fapi.binance.com/fapi/v1/exchangeInfo"
-    response = requests.get(endpoint)
-    symbol_data = response.json()
-    return symbol_data
+    symbols, tick_info = exchange_info.get('binance_usdm_symbols')
+    return symbols, tick_info
 
 def _process_symbol_data(raw_symbol_data):
     """
@@ -53,77 +50,254 @@ def _process_symbol_data(raw_symbol_data):
                 }
     return symbols, tick_info
 
-BINANCE_USDM_SYMBOLS, BINANCE_USDM_TICK_INFO = fetch_symbols_and_tick_info()
+exchange_info.register('binance_usdm_symbols', "https://fapi.binance.com/fapi/v1/exchangeInfo", _process_symbol_data)
+
+def __getattr__(name: str):
+    # BINANCE_USDM_SYMBOLS and BINANCE_USDM_TICK_INFO are resolved lazily so importing this module never touches the network.
+    if name == 'BINANCE_USDM_SYMBOLS':
+        return fetch_symbols_and_tick_info()[0]
+    if name == 'BINANCE_USDM_TICK_INFO':
+        return fetch_symbols_and_tick_info()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Maximum number of REST depth snapshots per resync.
+RESYNC_LIMIT = 10
+# Levels per side of the snapshot that bootstraps a local book in diff depth mode.
+SNAPSHOT_LIMIT = 1000
+# Concurrent snapshot requests in diff depth mode (a 1000 level snapshot weighs 20).
+SNAPSHOT_CONCURRENCY = 4
+# Event type of the REST snapshots that diff depth mode writes into the frame stream, so replays rebuild the same books.
+SNAPSHOT_EVENT = 'depthSnapshot'
 
 class BinanceUsdmMarket(Market):
-    def __init__(self, symbols: list, order_book_depth: int):
+    exchange = 'BinanceUsdm'
+    # Binance accepts at most 200 streams per combined-stream connection.
+    MAX_STREAMS_PER_CONNECTION = 200
+
+    def __init__(self, symbols: list, order_book_depth: int, combined_stream: bool = True, streams_per_connection: int = 100, json_backend: str = None,
+                 diff_depth: bool = False, diff_depth_speed: str = '100ms', order_book: OrderBook = None, freshness: FreshnessIndex = None):
         """
         Initialize a Binance USDM Market instance.
 
         :param symbols: List of symbols to track.
         :param order_book_depth: Depth of the order book to track.
+        :param combined_stream: Multiplex many symbols onto few /stream connections instead of one socket per symbol.
+        :param streams_per_connection: Number of symbols packed onto one combined-stream connection.
+        :param json_backend: JSON decoder backend ('msgspec', 'orjson' or 'json'). Defaults to the fastest installed.
+        :param diff_depth: Maintain a full local book per symbol from the diff depth stream and REST snapshots
+            instead of consuming depth5 partial snapshots. The top order_book_depth levels are mirrored into
+            order_book and any depth is available from get_depth().
+        :param diff_depth_speed: Update speed suffix of the diff depth stream ('100ms', '250ms', '500ms').
+        :param order_book: Order book to write into, e.g. one in shared memory. Defaults to a new OrderBook.
+        :param freshness: Freshness index to record into, e.g. one in shared memory. Defaults to a new FreshnessIndex.
         """
         self.symbols = symbols
         self.order_book_depth = order_book_depth
-        self.order_book = {symbol: {} for symbol in symbols}
+        self.order_book = order_book if order_book is not None else OrderBook(symbols, order_book_depth)
+        self.code_to_row = {f"{symbol}USDT": row for symbol, row in self.order_book.index.items()}
+        self.freshness = freshness if freshness is not None else FreshnessIndex(self.order_book.symbols)
+        self.combined_stream = combined_stream
+        self.streams_per_connection = min(streams_per_connection, self.MAX_STREAMS_PER_CONNECTION)
+        self.diff_depth = diff_depth
+        if diff_depth:
+            self.stream_name = f"depth@{diff_depth_speed}"
+            self.local_books = [LocalBook(order_book_depth) for _ in self.order_book.symbols]
+            self._snapshot_pending = set()
+            self._snapshot_slots = None
+            self._process_data = self._process_diff
+            message_schema, combined_schema = BinanceDiffDepthMessage, BinanceCombinedDiffDepthMessage
+        else:
+            self.stream_name = "depth5@100ms"
+            self.local_books = None
+            message_schema, combined_schema = BinanceDepthMessage, BinanceCombinedDepthMessage
+        if combined_stream:
+            self._decode_combined = get_decoder(combined_schema, json_backend)
+            self._decode = self._decode_envelope
+        else:
+            self._decode = get_decoder(message_schema, json_backend)
 
     async def aconnect(self):
         """
         Connect to the Binance USDM market and start streaming data for multiple symbols.
         """
         market_logger.info("Starting Binance USDM market stream")
-        await asyncio.gather(*[self.aconnect_to_symbol(symbol) for symbol in self.symbols])
+        if self.combined_stream:
+            tasks = [self._own_task(self.aconnect_to_symbols(shard)) for shard in self._shard_symbols()]
+        else:
+            tasks = [self._own_task(self.aconnect_to_symbol(symbol)) for symbol in self.symbols]
+        await asyncio.gather(*tasks)
+
+    def _shard_symbols(self) -> list[list[str]]:
+        """
+        Split the symbols evenly across the smallest number of combined-stream connections.
+
+        :return: List of symbol shards, one per connection.
+        """
+        shard_count = -(-len(self.symbols) // self.streams_per_connection)
+        return [self.symbols[i::shard_count] for i in range(shard_count)]
+
+    async def aconnect_to_symbols(self, symbols: list[str]):
+        """
+        Stream several symbols over a single supervised combined-stream connection.
+
+        :param symbols: List of symbols to multiplex onto the connection.
+        """
+        streams = '/'.join(f"{symbol.lower()}usdt@{self.stream_name}" for symbol in symbols)
+        await self.asupervise(f"wss://fstream.binance.com/stream?streams={streams}", symbols)
+
+    def _decode_envelope(self, message) -> dict:
+        """
+        Decode a combined-stream message and unwrap its payload.
+
+        :param message: The raw websocket message.
+        :return: The depth payload.
+        """
+        return self._decode_combined(message).get('data', {})
 
     async def aconnect_to_symbol(self, symbol: str):
         """
-        Connect to a specific symbol on the Binance USDM market and stream its data.
+        Stream a specific symbol on the Binance USDM market over its own supervised connection.
+        Used when combined_stream is False.
 
         :param symbol: The symbol to connect to.
         """
-        endpoint = f"wss://fstream.binance.com/ws/{symbol.lower()}usdt@depth5@100ms"
-        try:
-            async with websockets.connect(endpoint) as websocket:
-            # Ping 메시지를 보내는 작업을 백그라운드에서 실행합니다.
-                asyncio.create_task(self.ping(websocket))
-                # Run the ping message in the background.
-                asyncio.create_task(self._ping(websocket))
-                await websocket.send(json.dumps({
-                    "method": "SUBSCRIBE",
-                    "params": [
-                        f"{symbol.upper()}USDT@depth5@100ms"
-                    ],
-                    "id": 1
-                }))
-                async for message in websocket:
-                    data = json.loads(message)
-                    symbol_data = self._process_data(data)
-                    self.order_book[symbol] = symbol_data
-        except Exception as e:
-            message = f"Error while connecting to {symbol}: {e}"
-            market_logger.error(message)
-
-    async def _ping(self, websocket):
-        while True:
-            await asyncio.sleep(1800)  # Send a ping message every 30 minutes.
-            await websocket.ping()
-
-    def _process_data(self, raw_data:json) -> dict:
-        """
-        Process raw data received from Binance WebSocket into a structured format.
+        subscribe_message = json.dumps({
+            "method": "SUBSCRIBE",
+            "params": [
+                f"{symbol.lower()}usdt@{self.stream_name}"
+            ],
+            "id": 1
+        })
+        await self.asupervise(f"wss://fstream.binance.com/ws/{symbol.lower()}usdt@{self.stream_name}", [symbol], subscribe_message)
+
+    async def aresync(self, symbols: list[str]):
+        """
+        Refresh stale books from the REST depth endpoint, at most RESYNC_LIMIT symbols per call
+        to stay within the request weight budget.
+
+        In diff depth mode a synced local book that received no events is quiet, not stale: sequence gaps,
+        including those left by a reconnect, are caught by _process_diff, which resyncs the book itself.
+        Only books that are still unsynced get their snapshot retried.
+
+        :param symbols: The stale symbols.
+        """
+        if self.diff_depth:
+            rows = [self.order_book.index[symbol] for symbol in symbols]
+            for row in [row for row in rows if not self.local_books[row].synced][:RESYNC_LIMIT]:
+                self._request_snapshot(row)
+            return
+
+        async def _aresync_symbol(symbol):
+            snapshot = await http_pool.arequest("GET", f"https://fapi.binance.com/fapi/v1/depth?symbol={symbol}USDT&limit=5", timeout=2)
+            self._apply({'s': f"{symbol}USDT", 'E': snapshot['E'], 'a': snapshot['asks'], 'b': snapshot['bids']})
+
+        await asyncio.gather(*[_aresync_symbol(symbol) for symbol in symbols[:RESYNC_LIMIT]])
+
+    @timed
+    def _process_data(self, raw_data:json) -> str:
+        """
+        Write raw data received from Binance WebSocket into the order book in place.
+
         :param raw_data: Raw data received from the WebSocket.
-        :return: Processed symbol data.
+        :return: The updated symbol, or None if the message carried no book.
         """
-        symbol_data = {}
         asks = raw_data.get('a', [])
         bids = raw_data.get('b', [])
         update_time = raw_data.get('E', None)
-        if asks and bids and update_time:
-            symbol_data['update_time'] = float(update_time) / 1000
-            for i in range(self.order_book_depth):
-                symbol_data[f"ask_{i+1}"] = float(asks[i][0])
-                symbol_data[f"bid_{i+1}"] = float(bids[i][0])
-                symbol_data[f"ask_{i+1}_qty"] = float(asks[i][1])
-                symbol_data[f"bid_{i+1}_qty"] = float(bids[i][1])
-            return symbol_data
+        row = self.code_to_row.get(raw_data.get('s'))
+        if asks and bids and update_time and row is not None:
+            self.order_book.update(row, update_time / 1000, asks, bids)
+            return self.order_book.symbols[row]
+        else:
+            return None
+
+    @timed
+    def _process_diff(self, raw_data) -> str:
+        """
+        Apply a diff depth event to the symbol's local book and mirror its top levels into the order book
+        when they changed. Events that arrive before the book is synced are buffered and trigger a snapshot.
+        A snapshot event (live from _asnapshot, or recorded) is loaded into the local book instead.
+
+        :param raw_data: Decoded diff depth or snapshot event.
+        :return: The updated symbol, or None if the event was not applied.
+        """
+        row = self.code_to_row.get(raw_data.get('s'))
+        if row is None:
+            return None
+        book = self.local_books[row]
+        if 'lastUpdateId' in raw_data:
+            if not book.load_snapshot(raw_data['lastUpdateId'], raw_data.get('a', ()), raw_data.get('b', ())):
+                return None
+            asks, bids = book.top(self.order_book_depth)
+            self.order_book.update(row, raw_data['E'] / 1000, asks, bids)
+            return self.order_book.symbols[row]
+        changed = book.apply(raw_data['U'], raw_data['u'], raw_data.get('pu'), raw_data.get('a', ()), raw_data.get('b', ()))
+        if changed is None:
+            if not book.synced:
+                self._request_snapshot(row)
+            return None
+        if changed:
+            asks, bids = book.top(self.order_book_depth)
+            self.order_book.update(row, raw_data['E'] / 1000, asks, bids)
         else:
-            return {}
+            self.order_book.update_time[row] = raw_data['E'] / 1000
+        return self.order_book.symbols[row]
+
+    def get_depth(self, symbol: str, depth: int) -> tuple[list, list]:
+        """
+        Get any number of levels of a symbol's local book. Requires diff_depth mode.
+
+        :param symbol: The symbol.
+        :param depth: Number of levels per side.
+        :return: A tuple of asks and bids, each a list of [price, qty] pairs, best first.
+            Both are empty while the book is not synced.
+        """
+        if not self.diff_depth:
+            raise ValueError("get_depth requires a BinanceUsdmMarket created with diff_depth=True")
+        return self.local_books[self.order_book.index[symbol]].top(depth)
+
+    def _request_snapshot(self, row: int):
+        """
+        Start bootstrapping a local book from a REST snapshot unless one is already in flight.
+
+        :param row: Row of the symbol.
+        """
+        if row in self._snapshot_pending or self.replaying:
+            # Replays load the recorded snapshots from the frame stream instead.
+            return
+        self._snapshot_pending.add(row)
+        self.freshness.mark_stale([row])
+        self._own_task(self._asnapshot(row))
+
+    async def _asnapshot(self, row: int):
+        """
+        Load REST snapshots into a local book until it is synced with the stream,
+        backing off between failed attempts. Each snapshot goes through _apply as a snapshot event
+        and is written to the frame recorder, if any, so replays load the same snapshots.
+
+        :param row: Row of the symbol.
+        """
+        if self._snapshot_slots is None:
+            self._snapshot_slots = asyncio.Semaphore(SNAPSHOT_CONCURRENCY)
+        symbol = self.order_book.symbols[row]
+        backoff = Backoff(base_delay=0.5, max_delay=10)
+        try:
+            while True:
+                try:
+                    async with self._snapshot_slots:
+                        snapshot = await http_pool.arequest("GET", f"https://fapi.binance.com/fapi/v1/depth?symbol={symbol}USDT&limit={SNAPSHOT_LIMIT}", timeout=5)
+                    data = {'e': SNAPSHOT_EVENT, 'E': snapshot['E'], 's': f"{symbol}USDT", 'lastUpdateId': snapshot['lastUpdateId'],
+                            'a': snapshot['asks'], 'b': snapshot['bids']}
+                    if self.frame_recorder is not None:
+                        self.frame_recorder.record(json.dumps({'stream': f"{symbol.lower()}usdt@{SNAPSHOT_EVENT}", 'data': data}
+                                                              if self.combined_stream else data))
+                    if self._apply(data) is not None:
+                        return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    message = f"Failed to load Binance USDM depth snapshot of {symbol}: {e}"
+                    market_logger.error(message)
+                await asyncio.sleep(backoff.next_delay())
+        finally:
+            self._snapshot_pending.discard(row)
@@ -0,0 +1,29 @@
+from typing import TypedDict
+
+class BinanceDepthMessage(TypedDict, total=False):
+    # Partial book depth event. Prices and quantities arrive as strings.
+    E: int
+    s: str
+    a: list[tuple[float, float]]
+    b: list[tuple[float, float]]
+
+class BinanceCombinedDepthMessage(TypedDict, total=False):
+    stream: str
+    data: BinanceDepthMessage
+
+class BinanceDiffDepthMessage(TypedDict, total=False):
+    # Diff book depth event. U/u are the first and final update ids, pu the previous event's u.
+    # REST snapshots are recorded in the same shape with e='depthSnapshot' and lastUpdateId instead of U/u/pu.
+    e: str
+    E: int
+    s: str
+    U: int
+    u: int
+    pu: int
+    lastUpdateId: int
+    a: list[tuple[float, float]]
+    b: list[tuple[float, float]]
+
+class BinanceCombinedDiffDepthMessage(TypedDict, total=False):
+    stream: str
+    data: BinanceDiffDepthMessage
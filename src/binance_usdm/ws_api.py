@@ -0,0 +1,144 @@
+import json
+import asyncio
+import itertools
+import websockets
+
+from utils.binance_auth import BinanceSigner, BinanceClock, build_query_string
+from utils.decoder import get_decoder
+from utils.logger import trade_logger
+
+WS_API_ENDPOINT = "wss://ws-fapi.binance.com/ws-fapi/v1"
+
+
+class WsApiUnavailable(Exception):
+    """
+    The request could not be written to the websocket, so it never reached the exchange
+    and can safely be sent over REST instead.
+    """
+
+
+class BinanceUsdmWsApi:
+    """
+    Order entry over a persistent, authenticated Binance USDM WebSocket API connection.
+
+    Requests are tagged with an id and written without waiting for earlier responses,
+    so any number of orders can be in flight; the receive loop resolves each request's
+    future when the response with the same id arrives.
+    """
+
+    def __init__(self, signer: BinanceSigner, clock: BinanceClock, endpoint: str = WS_API_ENDPOINT,
+                 request_timeout: float = 2, reconnect_delay: float = 1):
+        """
+        Initialize a WebSocket API client. The connection is opened by aconnect().
+
+        :param signer: Signer holding the API key and the keyed HMAC.
+        :param clock: Clock used for request timestamps.
+        :param endpoint: WebSocket API URL (a local mock server in tests).
+        :param request_timeout: Seconds to wait for a response.
+        :param reconnect_delay: Seconds to wait before reconnecting after a disconnect.
+        """
+        self.signer = signer
+        self.clock = clock
+        self.endpoint = endpoint
+        self.request_timeout = request_timeout
+        self.reconnect_delay = reconnect_delay
+        self._websocket = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._decode = get_decoder()
+
+    @property
+    def is_connected(self) -> bool:
+        return self._websocket is not None
+
+    async def aconnect(self):
+        """
+        Keep the connection open, reconnecting after errors. Run it as a background task.
+        """
+        while True:
+            try:
+                async with websockets.connect(self.endpoint) as websocket:
+                    self._websocket = websocket
+                    trade_logger.info(f"Connected to Binance USDM WebSocket API at {self.endpoint}")
+                    async for message in websocket:
+                        self._on_message(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                message = f"Binance USDM WebSocket API connection error: {e}"
+                trade_logger.error(message)
+            finally:
+                self._websocket = None
+                self._fail_pending(ConnectionError("Binance USDM WebSocket API disconnected"))
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def arequest(self, method: str, params: dict) -> dict:
+        """
+        Send a signed request and wait for its response.
+
+        :param method: WebSocket API method (e.g. 'order.place').
+        :param params: Request parameters, without apiKey, timestamp and signature.
+        :return: The result of the request.
+        :raises WsApiUnavailable: If the request could not be sent.
+        :raises ConnectionError: If the connection dropped before the response arrived.
+        :raises ValueError: If the exchange rejected the request.
+        """
+        websocket = self._websocket
+        if websocket is None:
+            raise WsApiUnavailable("Binance USDM WebSocket API is not connected")
+        params = dict(params, apiKey=self.signer.api_key, timestamp=self.clock.timestamp())
+        params['signature'] = self.signer.sign(build_query_string(dict(sorted(params.items()))))
+        request_id = str(next(self._ids))
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await websocket.send(json.dumps({'id': request_id, 'method': method, 'params': params}))
+        except Exception as e:
+            self._pending.pop(request_id, None)
+            raise WsApiUnavailable(f"Failed to send {method} request: {e}") from e
+        try:
+            response = await asyncio.wait_for(future, self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+        self.clock.check_response(response.get('error'))
+        if response.get('status') != 200:
+            raise ValueError(f"{method} rejected: {response.get('error', response)}")
+        return response['result']
+
+    async def aplace_order(self, params: dict) -> dict:
+        """
+        Place an order.
+
+        :param params: Order parameters, as for the REST order endpoint.
+        :return: The order result (orderId, status, ...).
+        """
+        return await self.arequest('order.place', params)
+
+    async def aclose(self):
+        """
+        Close the connection.
+        """
+        if self._websocket is not None:
+            await self._websocket.close()
+
+    def _on_message(self, message):
+        """
+        Resolve the pending request a response belongs to.
+
+        :param message: The raw websocket message.
+        """
+        response = self._decode(message)
+        future = self._pending.get(response.get('id'))
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def _fail_pending(self, error: Exception):
+        """
+        Fail every request still waiting for a response.
+
+        :param error: The exception to set on the pending futures.
+        """
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
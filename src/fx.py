@@ -1,5 +1,5 @@
-import aiohttp
 import asyncio
+from utils.http_pool import http_pool
 from utils.logger import market_logger
 
 class FxMarket:
@@ -27,13 +27,10 @@ class FxMarket:
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.102 Safari/537.36'
         }
         url = 'https://quotation-api-cdn.dunamu.com/v1/forex/recent?codes=FRX.KRWUSD'
-        timeout = aiohttp.ClientTimeout(total=1)
         while True:
             try: 
-                async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-                    async with session.get(url) as response:
-                        data = await response.json()
-                        self.usd_krw_rate = float(data[0]['basePrice'])   
+                data = await http_pool.arequest("GET", url, headers=headers, timeout=1)
+                self.usd_krw_rate = float(data[0]['basePrice'])   
                 await asyncio.sleep(time_interval) # 5분마다 업데이트
             except Exception as e:
                 message = f"Error while updating usd krw rate: {e}"
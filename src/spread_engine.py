@@ -0,0 +1,207 @@
+import math
+import time
+import heapq
+import numpy as np
+
+from base.OrderBook import ASK, BID, PRICE
+from fx import FxMarket
+
+
+class SpreadEngine:
+    """
+    Incrementally maintained kimchi premium between Upbit KRW and Binance USDM books.
+
+    For every common symbol two premiums are tracked:
+        bid premium = upbit_bid / (binance_ask * usd_krw) - 1   (sell on Upbit, buy on Binance)
+        ask premium = upbit_ask / (binance_bid * usd_krw) - 1   (buy on Upbit, sell on Binance)
+
+    Only the symbol that just ticked is recomputed. Premium ratios are kept in two heaps with lazy
+    invalidation, so a top-N query costs O(N log n) instead of a scan over every symbol.
+    The USD/KRW rate divides every ratio equally and does not change the ordering, so it is read
+    from FxMarket at query time instead of re-ranking on every FX update.
+    Symbols with a stale book on either market are skipped by the top-N queries.
+    """
+
+    def __init__(self, upbit_market, binance_market, fx_market: FxMarket, symbols: list = None, max_age: float = None):
+        """
+        Initialize the engine over the symbols listed on both markets.
+
+        :param upbit_market: An UpbitKrwMarket instance.
+        :param binance_market: A BinanceUsdmMarket instance.
+        :param fx_market: An FxMarket instance providing the USD/KRW rate.
+        :param symbols: Optional subset of symbols to track. Defaults to every common symbol.
+        :param max_age: Symbols whose book on either market is older than this (seconds) or flagged stale
+                        are left out of the top premium queries. Defaults to each market's stale_after.
+        """
+        self.upbit_market = upbit_market
+        self.binance_market = binance_market
+        self.fx_market = fx_market
+        binance_symbols = set(binance_market.order_book.index)
+        candidates = symbols if symbols is not None else upbit_market.order_book.symbols
+        self.symbols = [symbol for symbol in candidates if symbol in upbit_market.order_book.index and symbol in binance_symbols]
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.upbit_rows = [upbit_market.order_book.index[symbol] for symbol in self.symbols]
+        self.binance_rows = [binance_market.order_book.index[symbol] for symbol in self.symbols]
+        self.bid_ratio = [math.nan] * len(self.symbols)
+        self.ask_ratio = [math.nan] * len(self.symbols)
+        self._versions = [0] * len(self.symbols)
+        self._bid_heap = []  # (-bid_ratio, version, i): highest bid premium first
+        self._ask_heap = []  # (ask_ratio, version, i): lowest ask premium first
+        self.upbit_max_age = max_age or upbit_market.stale_after
+        self.binance_max_age = max_age or binance_market.stale_after
+
+    def start(self):
+        """
+        Compute every premium once and subscribe to updates from both markets.
+        """
+        self.rebuild()
+        self.upbit_market.add_listener(self.on_update)
+        self.binance_market.add_listener(self.on_update)
+
+    def stop(self):
+        """
+        Unsubscribe from both markets.
+        """
+        self.upbit_market.remove_listener(self.on_update)
+        self.binance_market.remove_listener(self.on_update)
+
+    def on_update(self, market, symbol: str):
+        """
+        Market listener: recompute the premium of the symbol that just ticked.
+
+        :param market: The market that was updated.
+        :param symbol: The updated symbol.
+        """
+        i = self.index.get(symbol)
+        if i is not None:
+            self._update(i)
+
+    def rebuild(self):
+        """
+        Recompute every premium from the current books and rebuild the heaps.
+        """
+        upbit_levels = self.upbit_market.order_book.levels[self.upbit_rows]
+        binance_levels = self.binance_market.order_book.levels[self.binance_rows]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bid_ratio = upbit_levels[:, BID, 0, PRICE] / binance_levels[:, ASK, 0, PRICE]
+            ask_ratio = upbit_levels[:, ASK, 0, PRICE] / binance_levels[:, BID, 0, PRICE]
+        self.bid_ratio = [ratio if math.isfinite(ratio) else math.nan for ratio in bid_ratio.tolist()]
+        self.ask_ratio = [ratio if math.isfinite(ratio) else math.nan for ratio in ask_ratio.tolist()]
+        self._versions = [version + 1 for version in self._versions]
+        self._bid_heap = [(-ratio, self._versions[i], i) for i, ratio in enumerate(self.bid_ratio) if ratio == ratio]
+        self._ask_heap = [(ratio, self._versions[i], i) for i, ratio in enumerate(self.ask_ratio) if ratio == ratio]
+        heapq.heapify(self._bid_heap)
+        heapq.heapify(self._ask_heap)
+
+    def _update(self, i: int):
+        """
+        Recompute one symbol's ratios and push them onto the heaps. Older heap entries of the symbol become stale.
+
+        :param i: Index of the symbol in self.symbols.
+        """
+        upbit_levels = self.upbit_market.order_book.levels[self.upbit_rows[i]]
+        binance_levels = self.binance_market.order_book.levels[self.binance_rows[i]]
+        upbit_bid, upbit_ask = float(upbit_levels[BID, 0, PRICE]), float(upbit_levels[ASK, 0, PRICE])
+        binance_bid, binance_ask = float(binance_levels[BID, 0, PRICE]), float(binance_levels[ASK, 0, PRICE])
+        bid_ratio = upbit_bid / binance_ask if binance_ask > 0 else math.nan
+        ask_ratio = upbit_ask / binance_bid if binance_bid > 0 else math.nan
+        version = self._versions[i] + 1
+        self._versions[i] = version
+        self.bid_ratio[i] = bid_ratio
+        self.ask_ratio[i] = ask_ratio
+        if bid_ratio == bid_ratio:
+            heapq.heappush(self._bid_heap, (-bid_ratio, version, i))
+        if ask_ratio == ask_ratio:
+            heapq.heappush(self._ask_heap, (ask_ratio, version, i))
+        if len(self._bid_heap) + len(self._ask_heap) > 8 * len(self.symbols) + 64:
+            self._compact()
+
+    def _compact(self):
+        """
+        Drop stale entries so the heaps stay proportional to the number of symbols.
+        """
+        versions = self._versions
+        self._bid_heap = [entry for entry in self._bid_heap if entry[1] == versions[entry[2]]]
+        self._ask_heap = [entry for entry in self._ask_heap if entry[1] == versions[entry[2]]]
+        heapq.heapify(self._bid_heap)
+        heapq.heapify(self._ask_heap)
+
+    def _top(self, heap: list, n: int) -> list:
+        """
+        Pop the n best live entries of a heap and push them back.
+
+        :param heap: One of the premium heaps.
+        :param n: Number of entries to return.
+        :return: The best entries, best first.
+        """
+        versions = self._versions
+        top, skipped = [], []
+        now = time.time()
+        while heap and len(top) < n:
+            entry = heapq.heappop(heap)
+            if entry[1] == versions[entry[2]]:
+                if self._is_fresh(entry[2], now):
+                    top.append(entry)
+                else:
+                    skipped.append(entry)
+        for entry in top + skipped:
+            heapq.heappush(heap, entry)
+        return top
+
+    def _is_fresh(self, i: int, now: float) -> bool:
+        """
+        Check that both books of a symbol are fresh.
+
+        :param i: Index of the symbol in self.symbols.
+        :param now: Current time.
+        :return: True if neither book is stale. Markets without a freshness index count as fresh.
+        """
+        upbit_freshness, binance_freshness = self.upbit_market.freshness, self.binance_market.freshness
+        if upbit_freshness is not None:
+            row = self.upbit_rows[i]
+            if upbit_freshness.stale[row] or now - upbit_freshness.recv_time[row] > self.upbit_max_age:
+                return False
+        if binance_freshness is not None:
+            row = self.binance_rows[i]
+            if binance_freshness.stale[row] or now - binance_freshness.recv_time[row] > self.binance_max_age:
+                return False
+        return True
+
+    def top_bid_premiums(self, n: int = 5) -> list[tuple[str, float]]:
+        """
+        Get the symbols with the highest bid premium (sell on Upbit, buy on Binance).
+
+        :param n: Number of symbols to return.
+        :return: List of (symbol, bid premium), highest first.
+        """
+        usd_krw_rate = self.fx_market.get_usd_krw_rate()
+        return [(self.symbols[i], -neg_ratio / usd_krw_rate - 1) for neg_ratio, _, i in self._top(self._bid_heap, n)]
+
+    def top_ask_premiums(self, n: int = 5) -> list[tuple[str, float]]:
+        """
+        Get the symbols with the lowest ask premium (buy on Upbit, sell on Binance).
+
+        :param n: Number of symbols to return.
+        :return: List of (symbol, ask premium), lowest first.
+        """
+        usd_krw_rate = self.fx_market.get_usd_krw_rate()
+        return [(self.symbols[i], ratio / usd_krw_rate - 1) for ratio, _, i in self._top(self._ask_heap, n)]
+
+    def get_premium(self, symbol: str) -> tuple[float, float]:
+        """
+        Get the current premiums of a symbol.
+
+        :param symbol: The symbol to look up.
+        :return: A tuple of (bid premium, ask premium). NaN when either book is empty.
+        """
+        i = self.index[symbol]
+        usd_krw_rate = self.fx_market.get_usd_krw_rate()
+        return self.bid_ratio[i] / usd_krw_rate - 1, self.ask_ratio[i] / usd_krw_rate - 1
+
+    def get_premiums(self) -> dict:
+        """
+        Get the current premiums of every tracked symbol.
+
+        :return: A dictionary of symbol -> (bid premium, ask premium).
+        """
+        return {symbol: self.get_premium(symbol) for symbol in self.symbols}
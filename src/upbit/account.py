@@ -1,12 +1,12 @@
-import jwt
-import uuid
 import asyncio
 from pubsub import pub
-from aiohttp import ClientSession, ClientTimeout
 import pandas as pd
 
 from base.Account import Account
 from base.Events import Events
+from upbit.auth import UpbitSigner
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import account_logger as logger
 
 
@@ -14,6 +14,7 @@ class UpbitAccount(Account):
     def __init__(self, api_key, secret_key):
         self.api_key = api_key
         self.secret_key = secret_key
+        self.signer = UpbitSigner(api_key, secret_key)
         self.endpoint = "https://api.upbit.com/v1/accounts"
 
 
@@ -78,6 +79,7 @@ class UpbitAccount(Account):
         balance_data['total_balance'] = total_balance
         return balance_data
     
+    @timed
     async def _acall_api(self, method: str, endpoint: str, params: dict, headers=None, data=None, time=2):
         """
         Make an asynchronous HTTP request to the API endpoint.
@@ -90,17 +92,8 @@ class UpbitAccount(Account):
         :param time: Timeout for the request.
         :return: JSON response from the API.
         """
-        timeout = ClientTimeout(total=time)
-        async with ClientSession(timeout=timeout) as session:
-            async with session.request(method, f"{endpoint}?{params}", headers=headers, data=data) as res:
-                return await res.json()
+        return await http_pool.arequest(method, f"{endpoint}?{params}", headers=headers, data=data, timeout=time)
             
     def _set_headers(self, query_string=None):
-        payload = {'access_key': self.api_key, 'nonce': str(uuid.uuid4())}
-        if query_string:
-            payload['query'] = query_string
-        jwt_token = jwt.encode(payload, self.secret_key)
-        authorization = 'Bearer {}'.format(jwt_token)
-        headers = {'Authorization': authorization}
-        return headers
+        return self.signer.headers(query_string)
     
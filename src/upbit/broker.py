@@ -1,12 +1,40 @@
 import time
-import uuid
-import jwt
-from aiohttp import ClientSession, ClientTimeout
+import asyncio
+from bisect import bisect_right
+from decimal import Decimal
 
 from base.OrderSheet import OrderSheet
 from base.Broker import Broker
+from upbit.auth import UpbitSigner
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import trade_logger
 
+# Upbit KRW price units: UPBIT_PRICE_UNITS[i] applies below UPBIT_PRICE_THRESHOLDS[i],
+# the last unit at or above the highest threshold.
+UPBIT_PRICE_THRESHOLDS = [0.1, 1, 10, 100, 1000, 10000, 100000, 500000, 1000000, 2000000]
+UPBIT_PRICE_UNITS = [0.0001, 0.001, 0.01, 0.1, 1, 5, 10, 50, 100, 500, 1000]
+_UPBIT_DECIMAL_PRICE_UNITS = [Decimal(repr(unit)) for unit in UPBIT_PRICE_UNITS]
+
+def upbit_price_unit(price: float) -> float:
+    """
+    Determine the Upbit KRW price unit of a price.
+
+    :param price: The price value.
+    :return: The price unit.
+    """
+    return UPBIT_PRICE_UNITS[bisect_right(UPBIT_PRICE_THRESHOLDS, price)]
+
+def format_upbit_price(price: float) -> Decimal:
+    """
+    Round a price to the nearest Upbit KRW price unit.
+
+    :param price: The price value.
+    :return: The exact rounded price.
+    """
+    index = bisect_right(UPBIT_PRICE_THRESHOLDS, price)
+    return _UPBIT_DECIMAL_PRICE_UNITS[index] * round(price / UPBIT_PRICE_UNITS[index])
+
 # Create a Broker subclass specific to UpbitKrw
 class UpbitKrwBroker(Broker):
     def __init__(self, api_key: str, secret_key: str):
@@ -18,8 +46,10 @@ class UpbitKrwBroker(Broker):
         """
         self.api_key = api_key
         self.secret_key = secret_key
+        self.signer = UpbitSigner(api_key, secret_key)
         self.base_endpoint = "https://api.upbit.com/v1/orders"
 
+    @timed
     async def aplace_order(self, order_sheet: OrderSheet) -> OrderSheet:
         """
         Place an order using the provided OrderSheet.
@@ -65,9 +95,7 @@ class UpbitKrwBroker(Broker):
         responses = []
         orders = await self.afetch_open_orders_by_symbol(symbol)
         if orders != [] and orders != None:
-            for order in orders:
-                response = await self.acancel_order_by_id(order['uuid'])
-                responses.append(response)
+            responses = list(await asyncio.gather(*[self.acancel_order_by_id(order['uuid']) for order in orders]))
         trade_logger.info(f"Orders cancelled for {symbol}")
         trade_logger.info(responses)
         return responses
@@ -110,14 +138,12 @@ class UpbitKrwBroker(Broker):
             # Handle market orders
             if side == 'bid':
                 order_type = 'price'
-                price = float(round(price / self._set_price_unit(price)) * self._set_price_unit(price)) * qty
-                params['price'] = str(price)
+                params['price'] = format(format_upbit_price(price) * Decimal(repr(float(qty))), 'f')
             if side == 'ask':
                 params['volume'] = str(qty)
         elif order_type == 'limit':
             # Handle limit orders
-            price = float(round(price / self._set_price_unit(price)) * self._set_price_unit(price))
-            params['price'] = str(price)
+            params['price'] = format(format_upbit_price(price), 'f')
             params['volume'] = str(qty)
         return params
 
@@ -128,23 +154,9 @@ class UpbitKrwBroker(Broker):
         :param price: The price value.
         :return: The price unit.
         """
-        price_dict = {
-            2000000: 1000,
-            1000000: 500,
-            500000: 100,
-            100000: 50,
-            10000: 10,
-            1000: 5,
-            100: 1,
-            10: 0.1,
-            1: 0.01,
-            0.1: 0.001
-        }
-        for key in sorted(price_dict.keys(), reverse=True):
-            if price >= key:
-                return price_dict[key]
-        return 0.0001
+        return upbit_price_unit(price)
 
+    @timed
     async def _acall_api(self, method: str, endpoint: str, params: dict, headers=None, data=None, time=2):
         """
         Make an asynchronous HTTP request to the API endpoint.
@@ -157,10 +169,7 @@ class UpbitKrwBroker(Broker):
         :param time: Timeout for the request.
         :return: JSON response from the API.
         """
-        timeout = ClientTimeout(total=time)
-        async with ClientSession(timeout=timeout) as session:
-            async with session.request(method, f"{endpoint}?{params}", headers=headers, data=data) as res:
-                return await res.json()
+        return await http_pool.arequest(method, f"{endpoint}?{params}", headers=headers, data=data, timeout=time)
 
     def _set_headers(self, query_string=None) -> dict:
         """
@@ -169,10 +178,4 @@ class UpbitKrwBroker(Broker):
         :param query_string: The query string to include in the headers.
         :return: HTTP headers.
         """
-        payload = {'access_key': self.api_key, 'nonce': str(uuid.uuid4())}
-        if query_string:
-            payload['query'] = query_string
-        jwt_token = jwt.encode(payload, self.secret_key)
-        authorization = 'Bearer {}'.format(jwt_token)
-        headers = {'Authorization': authorization}
-        return headers
+        return self.signer.headers(query_string)
@@ -1,15 +1,20 @@
-import websockets
 import asyncio
 import json
-import requests
 import time
-import uuid
-import jwt
-from aiohttp import ClientSession, ClientTimeout
 import os
+from collections import Counter
 
 
 from base.Market import Market
+from base.Freshness import FreshnessIndex
+from base.OrderBook import OrderBook
+from upbit.auth import UpbitSigner
+from upbit.schema import UpbitOrderbookMessage
+from upbit.shard_planner import ShardPlanner
+from utils.decoder import get_decoder
+from utils.exchange_info import exchange_info
+from utils.http_pool import http_pool
+from utils.benchmark import timed
 from utils.logger import market_logger  
 
 from dotenv import load_dotenv
@@ -18,42 +23,80 @@ load_dotenv()
 
 UPBIT_API_KEY = os.getenv("UPBIT_API_KEY")
 UPBIT_SECRET_KEY =  os.getenv("UPBIT_SECRET_KEY")
+UPBIT_SIGNER = UpbitSigner(UPBIT_API_KEY, UPBIT_SECRET_KEY)
+# Number of markets per REST order book snapshot request.
+RESYNC_BATCH_SIZE = 50
+# Seconds a replaced connection keeps streaming after its successor started, so the books never go dark.
+SHARD_HANDOVER_DELAY = 5
 
 
-def fetch_symbols():
-    try: 
-        upbit_markets = fetch_markets()
-        upbit_krw_symbols = [market["market"] for market in upbit_markets if "KRW" in market["market"]]
-        upbit_krw_base_symbols = [symbol[4:] for symbol in upbit_krw_symbols]
-        market_logger.info(f"Upbit KRW symbols: {upbit_krw_base_symbols}")
-        return upbit_krw_base_symbols
-    except Exception as e:
-        message = f"Failed to fetch upbit symbols{e}"
-        market_logger.error(message)
-        time.sleep(0.5)
-        return fetch_symbols()
-    
-def fetch_markets():
-    endpoint = "https://api.upbit.com/v1/market/all"
-    response = requests.get(endpoint)
-    upbit_markets = json.loads(response.text)
-    return upbit_markets        
+def _process_markets(upbit_markets: list) -> list[str]:
+    """
+    Extract KRW base symbols from the Upbit market list.
+
+    :param upbit_markets: Raw market list from the Upbit API.
+    :return: List of KRW base symbols.
+    """
+    upbit_krw_symbols = [market["market"] for market in upbit_markets if "KRW" in market["market"]]
+    upbit_krw_base_symbols = [symbol[4:] for symbol in upbit_krw_symbols]
+    market_logger.info(f"Upbit KRW symbols: {upbit_krw_base_symbols}")
+    return upbit_krw_base_symbols
+
+exchange_info.register('upbit_krw_symbols', "https://api.upbit.com/v1/market/all", _process_markets)
+
+def fetch_symbols() -> list[str]:
+    """
+    Get the Upbit KRW symbols from the shared exchange info registry.
 
-UPBIT_SYMBOLS = fetch_symbols()
+    :return: List of KRW base symbols.
+    """
+    return exchange_info.get('upbit_krw_symbols')
+
+def __getattr__(name: str):
+    # UPBIT_SYMBOLS is resolved lazily so importing this module never touches the network.
+    if name == 'UPBIT_SYMBOLS':
+        return fetch_symbols()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class UpbitKrwMarket(Market):
+    exchange = 'UpbitKrw'
     non_working_symbols = []
 
-    def __init__(self, symbols: list, order_book_depth: int):
+    def __init__(self, symbols: list, order_book_depth: int, json_backend: str = None, shard_planner: ShardPlanner = None,
+                 rebalance_interval: float = 60, wallet_status_interval: float = 60, order_book: OrderBook = None,
+                 freshness: FreshnessIndex = None):
         """
         Initialize an Upbit KRW Market instance.
 
         :param symbols: List of symbols to track.
         :param order_book_depth: Depth of the order book to track.
+        :param json_backend: JSON decoder backend ('msgspec', 'orjson' or 'json'). Defaults to the fastest installed.
+        :param shard_planner: Planner deciding how symbols are spread over connections. Defaults to ShardPlanner().
+        :param rebalance_interval: Seconds between checks of the shards against the observed message rates.
+        :param wallet_status_interval: Seconds between wallet status polls for non working symbols.
+        :param order_book: Order book to write into, e.g. one in shared memory. Defaults to a new OrderBook.
+        :param freshness: Freshness index to record into, e.g. one in shared memory. Defaults to a new FreshnessIndex.
         """
         self.symbols = symbols
         self.order_book_depth = order_book_depth
-        self.order_book = {symbol: {} for symbol in symbols}
+        self.shard_planner = shard_planner or ShardPlanner()
+        self.rebalance_interval = rebalance_interval
+        self.wallet_status_interval = wallet_status_interval
+        self.shards = {}
+        self.order_book = order_book if order_book is not None else OrderBook(symbols, order_book_depth)
+        self.code_to_row = {f"KRW-{symbol}": row for symbol, row in self.order_book.index.items()}
+        self._decode_typed = get_decoder(UpbitOrderbookMessage, json_backend)
+        self._decode_raw = get_decoder(None, json_backend)
+        self._decode = self._decode_message
+        self.freshness = freshness if freshness is not None else FreshnessIndex(self.order_book.symbols)
+        # Flat float64 views of each symbol's OrderBook row: ask price/qty pairs, then bid price/qty pairs.
+        self._row_buffers = [memoryview(self.order_book.levels[row]).cast('B').cast('d') for row in range(len(self.order_book))]
+        self._offsets = [(2 * i, 2 * i + 1, 2 * (order_book_depth + i), 2 * (order_book_depth + i) + 1) for i in range(order_book_depth)]
+        self._last_units = [None] * len(self.order_book)
+        # Exchange timestamp (tms) of each row's last applied message.
+        self._last_tms = [0] * len(self.order_book)
+        # Malformed messages per symbol (None for messages that are not valid JSON).
+        self.parse_errors = Counter()
     
     def get_non_working_symbols(self) -> list:
         """
@@ -63,73 +106,171 @@ class UpbitKrwMarket(Market):
         """
         return self.non_working_symbols
     
-    async def aconnect(self):       
+    async def aconnect(self):
         """
         Connect to the Upbit KRW market and start streaming data for multiple symbols.
+        Shards start evenly split and are rebalanced every rebalance_interval seconds from the
+        observed message rates, isolating hot symbols on their own connections.
         """
         message = "Starting Upbit KRW market stream"
         market_logger.info(message)
-        if len(self.symbols) < 5:
-            tasks = [self.aconnect_to_symbols(self.symbols)]
-        else:
-            tasks = []
-            batch_size = (len(self.symbols) // 4) + 1
-            for i in range(3):
-                tasks.append(self.aconnect_to_symbols(self.symbols[batch_size*i:batch_size*(i+1)]))
-            tasks.append(self.aconnect_to_symbols(self.symbols[batch_size*3:]))
-        tasks.append(self.afetch_non_working_symbols())
-        await asyncio.gather(*tasks)
+        self._own_task(self.afetch_non_working_symbols_periodically(self.wallet_status_interval))
+        self._start_shards(self.shard_planner.plan(self.symbols))
+        while True:
+            await asyncio.sleep(self.rebalance_interval)
+            try:
+                await self.arebalance()
+            except Exception as e:
+                message = f"Failed to rebalance Upbit KRW shards: {e}"
+                market_logger.error(message)
+
+    def message_rates(self) -> dict:
+        """
+        Get the smoothed messages per second of every symbol.
+
+        :return: Dictionary of symbol -> messages per second.
+        """
+        return dict(zip(self.order_book.symbols, self.freshness.update_rate().tolist()))
+
+    async def arebalance(self):
+        """
+        Adjust the shards if they no longer fit the observed message rates. Only the shards whose symbols
+        changed are reconnected: their new connections are started before the ones they replace are closed.
+        """
+        rates = self.message_rates()
+        current = [list(shard) for shard in self.shards]
+        if not self.shard_planner.needs_rebalance(current, rates):
+            return
+        plan = {frozenset(shard): shard for shard in self.shard_planner.replan(current, rates)}
+        retired = [shard for shard in self.shards if shard not in plan]
+        if not retired:
+            return
+        started = [shard for key, shard in plan.items() if key not in self.shards]
+        market_logger.info(f"Rebalancing Upbit KRW shards: replacing {len(retired)} of {len(self.shards)} connections with {len(started)}, "
+                           f"isolated {sorted(self.shard_planner.hot)}")
+        self._start_shards(started)
+        await asyncio.sleep(SHARD_HANDOVER_DELAY)
+        for shard in retired:
+            self.shards.pop(shard).cancel()
+
+    def _start_shards(self, shards: list[list[str]]):
+        """
+        Start one supervised connection per shard. Shards are keyed by their set of symbols.
+
+        :param shards: Symbol shards.
+        """
+        for shard in shards:
+            if shard:
+                self.shards[frozenset(shard)] = self._own_task(self.aconnect_to_symbols(shard))
 
     async def aconnect_to_symbols(self, symbols: list[str]):
         """
-        Connect to a specific set of symbols on the Upbit KRW market and stream their data.
+        Stream a specific set of symbols on the Upbit KRW market over one supervised connection.
+        Upbit sends a snapshot of every book right after subscribing, so each reconnect resyncs the books.
 
         :param symbols: List of symbols to connect to.
         """
-        endpoint = "wss://api.upbit.com/websocket/v1"
+        subscribe_data = json.dumps([
+            {"ticket": "con"},
+            {
+                "type": "orderbook",
+                "codes": [f"KRW-{symbol}.{self.order_book_depth}" for symbol in symbols],
+                "isOnlySnapshot": "false",
+            },
+            {"format": "SIMPLE"}
+        ])
+        await self.asupervise("wss://api.upbit.com/websocket/v1", symbols, subscribe_data)
+
+    async def aresync(self, symbols: list[str]):
+        """
+        Refresh stale books from the REST order book snapshot endpoint.
+
+        :param symbols: The stale symbols.
+        """
+        for i in range(0, len(symbols), RESYNC_BATCH_SIZE):
+            markets = ','.join(f"KRW-{symbol}" for symbol in symbols[i:i + RESYNC_BATCH_SIZE])
+            snapshots = await http_pool.arequest("GET", f"https://api.upbit.com/v1/orderbook?markets={markets}", timeout=2)
+            for snapshot in snapshots:
+                self._apply({
+                    'cd': snapshot['market'],
+                    'tms': snapshot['timestamp'],
+                    'obu': [{'ap': unit['ask_price'], 'as': unit['ask_size'], 'bp': unit['bid_price'], 'bs': unit['bid_size']}
+                            for unit in snapshot['orderbook_units']],
+                })
+
+    def _decode_message(self, message) -> dict:
+        """
+        Decode a websocket message. A message that fails schema validation is decoded again without the schema,
+        so _process_data counts the error against its symbol instead of the exception dropping the connection.
+
+        :param message: The raw websocket message.
+        :return: The decoded message, or an empty dict if it is not valid JSON.
+        """
         try:
-            async with websockets.connect(endpoint) as websocket:
-                subscribe_data = json.dumps([
-                    {"ticket": "con"},
-                    {
-                        "type": "orderbook",
-                        "codes": [f"KRW-{symbol}.{self.order_book_depth}" for symbol in symbols],
-                        "isOnlySnapshot": "false",
-                        "isOnlyRealtime": "true"
-                    },
-                    {"format": "SIMPLE"}
-                ])
-                await websocket.send(subscribe_data)
-                async for response in websocket:
-                    raw_data = json.loads(response)
-                    symbol = raw_data['cd'].replace('KRW-', '')
-                    self.order_book[symbol] = self._process_data(raw_data)
-        except Exception as e:
-            message = f"Failed to stream Upbit order book: {e}. Reconnecting..."
-            market_logger.error(message)
-            await asyncio.sleep(1)  # Wait for a moment and then retry
-            await self.aconnect_to_symbols(symbols)
+            return self._decode_typed(message)
+        except Exception:
+            try:
+                return self._decode_raw(message)
+            except Exception as e:
+                self.parse_errors[None] += 1
+                message = f"Failed to decode Upbit message: {e!r}"
+                market_logger.error(message)
+                return {}
 
-    def _process_data(self, raw_data: json) -> dict:
+    @timed
+    def _process_data(self, raw_data: json) -> str:
         """
-        Process raw data received from the Upbit WebSocket into a structured format.
+        Write raw data received from the Upbit WebSocket straight into the symbol's order book row.
+
+        Messages older than the row's last applied one are dropped: while a shard is handed over, the retiring
+        connection, which is the congested one, would otherwise overwrite fresher books from its replacement.
+        Messages whose units equal the previous message's (the book changed below the subscribed depth)
+        only refresh the update time and freshness, without touching the levels or waking the listeners.
+        Malformed messages clear the row, mark it stale and are counted in parse_errors.
 
         :param raw_data: Raw data received from the WebSocket.
-        :return: Processed symbol data.
+        :return: The updated symbol, or None if the message carried no change or could not be processed.
         """
-        symbol_data = {}
+        row = self.code_to_row.get(raw_data.get('cd'))
+        if row is None:
+            return None
         try:
-            update_time = float(raw_data['tms']) / 1000
-            symbol_data['update_time'] = update_time
-            for i in range(self.order_book_depth):
-                obu = raw_data['obu'][i]
-                symbol_data[f"ask_{i+1}"] = float(obu['ap'])
-                symbol_data[f"bid_{i+1}"] = float(obu['bp'])
-                symbol_data[f"ask_{i+1}_qty"] = float(obu['as'])
-                symbol_data[f"bid_{i+1}_qty"] = float(obu['bs'])
-            return symbol_data
+            obu = raw_data['obu']
+            tms = raw_data['tms']
+            if tms < self._last_tms[row]:
+                return None
+            update_time = float(tms) / 1000
+            if obu == self._last_units[row]:
+                self.order_book.update_time[row] = update_time
+                self._last_tms[row] = tms
+                self.freshness.touch(row, time.time())
+                return None
+            buffer = self._row_buffers[row]
+            self.order_book.begin_write(row)
+            try:
+                for (ask_price, ask_qty, bid_price, bid_qty), unit in zip(self._offsets, obu):
+                    buffer[ask_price] = unit['ap']
+                    buffer[ask_qty] = unit['as']
+                    buffer[bid_price] = unit['bp']
+                    buffer[bid_qty] = unit['bs']
+                if len(obu) < self.order_book_depth:
+                    self.order_book.levels[row, :, len(obu):] = float('nan')
+                self.order_book.update_time[row] = update_time
+            finally:
+                self.order_book.end_write(row)
+            self._last_units[row] = obu
+            self._last_tms[row] = tms
+            return self.order_book.symbols[row]
         except Exception as e:
-            return {}
+            symbol = self.order_book.symbols[row]
+            self.parse_errors[symbol] += 1
+            if self.parse_errors[symbol] == 1:
+                message = f"Failed to parse Upbit order book of {symbol}: {e!r}"
+                market_logger.error(message)
+            self.order_book.clear(row)
+            self._last_units[row] = None
+            self.freshness.mark_stale([row])
+            return None
 
     async def aprint_data(self, time_interval: int = 5):
         """
@@ -143,25 +284,31 @@ class UpbitKrwMarket(Market):
             await asyncio.sleep(time_interval)
 
     async def afetch_non_working_symbols(self) -> list:
-        try: 
-            headers = self._set_headers()
-            timeout = ClientTimeout(total=3)
-            async with ClientSession(timeout=timeout) as session:
-                async with session.request("GET", f"https://api.upbit.com/v1/status/wallet", headers=headers) as res:
-                    symbol_status =  await res.json()
-            non_working_symbols = [item['currency'] for item in symbol_status if item['wallet_state'] not in ['working', 'withdraw_only'] or item['block_state'] == 'inactive']
-            self.non_working_symbols = non_working_symbols
-            await asyncio.sleep(60)
-        except Exception as e:
-            message = f"Failed to fetch upbit non working symbols{e}"
-            market_logger.error(message)
+        """
+        Fetch the symbols whose wallets are suspended or blocked.
+
+        :return: The list of non working symbols.
+        """
+        headers = self._set_headers()
+        symbol_status = await http_pool.arequest("GET", "https://api.upbit.com/v1/status/wallet", headers=headers, timeout=3)
+        non_working_symbols = [item['currency'] for item in symbol_status if item['wallet_state'] not in ['working', 'withdraw_only'] or item['block_state'] == 'inactive']
+        self.non_working_symbols = non_working_symbols
+        return non_working_symbols
+
+    async def afetch_non_working_symbols_periodically(self, interval: float = 60):
+        """
+        Keep the non working symbols up to date in the background.
+
+        :param interval: Seconds between wallet status polls.
+        """
+        while True:
+            try:
+                await self.afetch_non_working_symbols()
+            except Exception as e:
+                message = f"Failed to fetch upbit non working symbols{e}"
+                market_logger.error(message)
+            await asyncio.sleep(interval)
 
     def _set_headers(self, query_string=None):
-        payload = {'access_key': UPBIT_API_KEY, 'nonce': str(uuid.uuid4())}
-        if query_string:
-            payload['query'] = query_string
-        jwt_token = jwt.encode(payload, UPBIT_SECRET_KEY)
-        authorization = 'Bearer {}'.format(jwt_token)
-        headers = {'Authorization': authorization}
-        return headers
+        return UPBIT_SIGNER.headers(query_string)
 
@@ -0,0 +1,9 @@
+from typing import TypedDict
+
+# Orderbook unit in SIMPLE format. 'as' is a keyword, hence the functional syntax.
+UpbitOrderbookUnit = TypedDict('UpbitOrderbookUnit', {'ap': float, 'bp': float, 'as': float, 'bs': float}, total=False)
+
+class UpbitOrderbookMessage(TypedDict, total=False):
+    cd: str
+    tms: int
+    obu: list[UpbitOrderbookUnit]
@@ -0,0 +1,141 @@
+import math
+
+
+class ShardPlanner:
+    """
+    Decides how symbols are spread over websocket connections.
+
+    The connection count follows from the number of symbols and their observed message rates,
+    so no connection carries more than symbols_per_connection symbols or (hot symbols aside)
+    more than target_rate messages per second. Symbols above hot_rate get a connection of their own,
+    so a burst on one market does not queue behind, or delay, the others on a shared socket.
+    A symbol stays isolated until its rate falls below half of hot_rate, so plans do not flap.
+
+    plan() lays out shards from scratch. replan() adjusts running shards and moves as few symbols
+    as it can, so a rebalance only reconnects the shards whose symbols changed.
+    """
+
+    def __init__(self, symbols_per_connection: int = 60, target_rate: float = 200, hot_rate: float = 40,
+                 max_hot: int = 4, max_connections: int = 10):
+        """
+        Initialize a planner.
+
+        :param symbols_per_connection: Maximum number of symbols on a shared connection.
+        :param target_rate: Messages per second a shared connection should carry at most.
+        :param hot_rate: Messages per second above which a symbol gets its own connection.
+        :param max_hot: Maximum number of isolated symbols (the busiest are isolated first).
+        :param max_connections: Maximum number of connections, isolated ones included.
+        """
+        self.symbols_per_connection = symbols_per_connection
+        self.target_rate = target_rate
+        self.hot_rate = hot_rate
+        self.max_hot = max_hot
+        self.max_connections = max_connections
+        self.hot = set()
+
+    def plan(self, symbols: list[str], rates: dict = None) -> list[list[str]]:
+        """
+        Split symbols into connection shards.
+
+        :param symbols: Symbols to stream.
+        :param rates: Observed messages per second by symbol. Without rates the symbols are split evenly.
+        :return: List of symbol shards, one per connection. Isolated symbols come first.
+        """
+        if not symbols:
+            return []
+        if not rates:
+            shard_count = min(self.max_connections, math.ceil(len(symbols) / self.symbols_per_connection))
+            return [symbols[i::shard_count] for i in range(shard_count)]
+        self._update_hot(symbols, rates)
+        hot = [symbol for symbol in symbols if symbol in self.hot]
+        rest = [symbol for symbol in symbols if symbol not in self.hot]
+        shard_count = max(math.ceil(len(rest) / self.symbols_per_connection),
+                          math.ceil(sum(rates.get(symbol, 0) for symbol in rest) / self.target_rate), 1)
+        shard_count = min(shard_count, max(self.max_connections - len(hot), 1))
+        # Busiest first onto the least loaded shard that still has room.
+        shards = [[] for _ in range(shard_count)]
+        loads = [0.0] * shard_count
+        capacity = math.ceil(len(rest) / shard_count)
+        for symbol in sorted(rest, key=lambda symbol: rates.get(symbol, 0), reverse=True):
+            i = min((i for i in range(shard_count) if len(shards[i]) < capacity), key=loads.__getitem__)
+            shards[i].append(symbol)
+            loads[i] += rates.get(symbol, 0)
+        return [[symbol] for symbol in hot] + [shard for shard in shards if shard]
+
+    def replan(self, shards: list[list[str]], rates: dict) -> list[list[str]]:
+        """
+        Adjust running shards to the observed rates. Symbols that turned hot move out to shards of their own,
+        isolated symbols that cooled down and the busiest symbols of overloaded shards move to the least loaded
+        shared shard with room (or a new one), and every other symbol stays where it is.
+
+        :param shards: Current symbol shards.
+        :param rates: Observed messages per second by symbol.
+        :return: The new symbol shards. Isolated symbols come first.
+        """
+        symbols = [symbol for shard in shards for symbol in shard]
+        if not symbols:
+            return []
+        self._update_hot(symbols, rates)
+        rate = lambda symbol: rates.get(symbol, 0)
+        load = lambda shard: sum(rate(symbol) for symbol in shard)
+        isolated, shared, moving = [], [], []
+        for shard in shards:
+            if len(shard) == 1 and len(shards) > 1:
+                (isolated if shard[0] in self.hot else moving).append(shard[0])
+                continue
+            isolated += [symbol for symbol in shard if symbol in self.hot]
+            shared.append([symbol for symbol in shard if symbol not in self.hot])
+        shared = [shard for shard in shared if shard]
+        for shard in shared:
+            while len(shard) > 1 and (len(shard) > self.symbols_per_connection or load(shard) > self.target_rate):
+                busiest = max(shard, key=rate)
+                shard.remove(busiest)
+                moving.append(busiest)
+        for symbol in sorted(moving, key=rate, reverse=True):
+            fits = [shard for shard in shared
+                    if len(shard) < self.symbols_per_connection and load(shard) + rate(symbol) <= self.target_rate]
+            if fits:
+                min(fits, key=load).append(symbol)
+            elif not shared or len(isolated) + len(shared) < self.max_connections:
+                shared.append([symbol])
+            else:
+                min(shared, key=load).append(symbol)
+        # Isolating symbols may push the connection count over the limit: fold the least loaded shared shards together.
+        while len(shared) > 1 and len(isolated) + len(shared) > self.max_connections:
+            shared.sort(key=load)
+            shared[1] += shared.pop(0)
+        return [[symbol] for symbol in isolated] + shared
+
+    def needs_rebalance(self, shards: list[list[str]], rates: dict) -> bool:
+        """
+        Check if the current shards no longer fit the observed rates.
+
+        :param shards: Current symbol shards.
+        :param rates: Observed messages per second by symbol.
+        :return: True if a hot symbol shares a connection, an isolated symbol cooled down,
+            or a shared connection carries more than target_rate.
+        """
+        symbols = [symbol for shard in shards for symbol in shard]
+        self._update_hot(symbols, rates)
+        for shard in shards:
+            if len(shard) == 1 and len(shards) > 1:
+                if shard[0] not in self.hot:
+                    return True
+                continue
+            if any(symbol in self.hot for symbol in shard):
+                return True
+            if sum(rates.get(symbol, 0) for symbol in shard) > self.target_rate:
+                return True
+        return False
+
+    def _update_hot(self, symbols: list[str], rates: dict):
+        """
+        Refresh the set of isolated symbols, with hysteresis.
+
+        :param symbols: Symbols being streamed.
+        :param rates: Observed messages per second by symbol.
+        """
+        candidates = [symbol for symbol in symbols
+                      if rates.get(symbol, 0) >= (self.hot_rate / 2 if symbol in self.hot else self.hot_rate)]
+        candidates.sort(key=lambda symbol: rates.get(symbol, 0), reverse=True)
+        self.hot = set(candidates[:min(self.max_hot, self.max_connections - 1)])
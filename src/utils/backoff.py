@@ -0,0 +1,39 @@
+import random
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter for reconnect loops.
+
+    Each failure doubles the ceiling up to max_delay and the actual delay is drawn
+    uniformly below it, so many clients reconnecting at once do not retry in lockstep.
+    """
+
+    def __init__(self, base_delay: float = 0.5, max_delay: float = 30, factor: float = 2):
+        """
+        Initialize a backoff policy.
+
+        :param base_delay: Ceiling of the first delay in seconds.
+        :param max_delay: Largest ceiling in seconds.
+        :param factor: Growth of the ceiling per consecutive failure.
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.attempts = 0
+
+    def next_delay(self) -> float:
+        """
+        Record a failure and get the delay before the next attempt.
+
+        :return: The delay in seconds.
+        """
+        ceiling = min(self.max_delay, self.base_delay * self.factor ** self.attempts)
+        self.attempts += 1
+        return random.uniform(0, ceiling)
+
+    def reset(self):
+        """
+        Record a success: the next failure starts again from base_delay.
+        """
+        self.attempts = 0
@@ -1,16 +1,253 @@
-import time
-import utils.logger as logging
+import os
+import asyncio
+import inspect
+import functools
+import multiprocessing
+from time import perf_counter_ns
+
+from utils.logger import benchmark_logger
+
+# Set INSTRUMENTATION=0 in the environment to leave every @timed function undecorated.
+INSTRUMENTATION_ENABLED = os.getenv('INSTRUMENTATION', '1') != '0'
+
+# Log-linear buckets: values below 64ns are exact, above that every power of two is split into
+# 32 linear sub-buckets, so a recorded value is off by at most 1/32 (~3%).
+SUB_BUCKET_BITS = 6
+SUB_BUCKET_HALF = 1 << (SUB_BUCKET_BITS - 1)
+# Largest distinguishable value is 2**40 ns (~18 minutes). Larger values land in the last bucket.
+MAX_VALUE_BITS = 40
+BUCKET_COUNT = SUB_BUCKET_HALF * (MAX_VALUE_BITS - SUB_BUCKET_BITS) + 2 * SUB_BUCKET_HALF
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of nanosecond latencies in fixed memory.
+
+    Recording is one bit_length, one shift and one list increment, with no allocation, and
+    percentiles are read off the cumulative bucket counts, so a histogram can sit on any hot path
+    and stay the same size however many values it sees.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize an empty histogram.
+
+        :param name: Name used when the histogram is exported.
+        """
+        self.name = name
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value: int):
+        """
+        Record one latency.
+
+        :param value: Latency in nanoseconds.
+        """
+        shift = value.bit_length() - SUB_BUCKET_BITS
+        if shift > 0:
+            index = (shift << (SUB_BUCKET_BITS - 1)) + (value >> shift)
+            if index >= BUCKET_COUNT:
+                index = BUCKET_COUNT - 1
+        else:
+            index = value if value > 0 else 0
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentiles(self, quantiles: list[float]) -> list[float]:
+        """
+        Get latency percentiles.
+
+        :param quantiles: Percentiles between 0 and 100, ascending.
+        :return: The latencies in nanoseconds, one per percentile (the middle of the bucket holding it).
+        """
+        if not self.count:
+            return [0.0] * len(quantiles)
+        results = []
+        targets = iter([max(1, -(-q * self.count // 100)) for q in quantiles])
+        target = next(targets)
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            while cumulative >= target:
+                results.append(min(_bucket_middle(index), self.max))
+                target = next(targets, None)
+                if target is None:
+                    return results
+        return results + [float(self.max)] * (len(quantiles) - len(results))
+
+    def mean(self) -> float:
+        """
+        Get the mean latency.
+
+        :return: The mean in nanoseconds.
+        """
+        return self.total / self.count if self.count else 0.0
+
+    def reset(self):
+        """
+        Drop every recorded value.
+        """
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def summary(self) -> str:
+        """
+        Format the count and main percentiles in microseconds.
+
+        :return: One line summary.
+        """
+        p50, p90, p99, p999 = self.percentiles([50, 90, 99, 99.9])
+        return (f"{self.name}: n={self.count} mean={self.mean() / 1000:.1f}us p50={p50 / 1000:.1f}us "
+                f"p90={p90 / 1000:.1f}us p99={p99 / 1000:.1f}us p99.9={p999 / 1000:.1f}us max={self.max / 1000:.1f}us")
+
+
+def _bucket_middle(index: int) -> float:
+    """
+    Get the middle of the range of values a bucket holds.
+
+    :param index: The bucket index.
+    :return: The value in nanoseconds.
+    """
+    if index < 2 * SUB_BUCKET_HALF:
+        return float(index)
+    shift = index // SUB_BUCKET_HALF - 1
+    lower = (index - SUB_BUCKET_HALF * shift) << shift
+    return lower + ((1 << shift) - 1) / 2
+
+
+histograms = {}
+
+
+def get_histogram(name: str) -> LatencyHistogram:
+    """
+    Get the histogram registered under a name, creating it on first use.
+
+    :param name: Name of the histogram.
+    :return: The histogram.
+    """
+    histogram = histograms.get(name)
+    if histogram is None:
+        histogram = histograms[name] = LatencyHistogram(name)
+    return histogram
+
+
+class span:
+    """
+    Context manager timing a block into a named histogram. Create a span once, e.g. at module level,
+    and reuse it, so entering and exiting it only read the clock and record:
+
+        SCAN_SPAN = span('spread_engine.scan')
+
+        with SCAN_SPAN:
+            ...
+
+    A span holds a single start time: it must not be nested in itself, nor held across an await
+    while other coroutines use it. Time coroutines with @timed.
+    """
+    __slots__ = ('record', 'start')
+
+    def __init__(self, name: str):
+        """
+        :param name: Name of the histogram.
+        """
+        self.record = get_histogram(name).record
+        self.start = 0
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.record(perf_counter_ns() - self.start)
+
+
+def timed(name=None):
+    """
+    Decorator timing every call of a function or coroutine function into a named histogram.
+    Use it bare (@timed, named after the function's module and qualified name) or with a name (@timed('name')).
+    Calls that raise are timed too. With INSTRUMENTATION=0 the function is returned unchanged.
+
+    :param name: Name of the histogram.
+    :return: The decorator, or the decorated function when used bare.
+    """
+    if callable(name):
+        return timed()(name)
+
+    def decorator(function):
+        if not INSTRUMENTATION_ENABLED:
+            return function
+        record = get_histogram(name or f"{function.__module__}.{function.__qualname__}").record
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                start = perf_counter_ns()
+                try:
+                    return await function(*args, **kwargs)
+                finally:
+                    record(perf_counter_ns() - start)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(perf_counter_ns() - start)
+        return wrapper
+    return decorator
+
+
+def export(reset: bool = True):
+    """
+    Log the summary of every histogram that recorded values to benchmark_logger.
+
+    :param reset: Reset the histograms, so each export covers the period since the previous one.
+    """
+    process = multiprocessing.current_process().name
+    for histogram in list(histograms.values()):
+        if histogram.count:
+            benchmark_logger.info(f"[{process}] {histogram.summary()}")
+            if reset:
+                histogram.reset()
+
+
+async def aexport_periodically(interval: float = 60):
+    """
+    Export the histograms in the background.
+
+    :param interval: Seconds between exports.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        export()
+
 
 class TimeStamp:
-    def __init__():
-        self.start_time = time.time()
-        self.end_time = time.time()
-        self.benchmark = 0
+    """
+    Stopwatch for ad-hoc measurements: each stamping() measures the time since the previous stamp.
+    """
+
+    def __init__(self):
+        self.start_time = perf_counter_ns()
+        self.end_time = self.start_time
+        self.benchmark = 0.0
 
     def __str__(self):
         return f"benchmark: {self.benchmark:.5f} ms"
 
     def stamping(self):
-        self.end_time = time.time()
-        self.benchmark = self.end_time - self.start_time
-        self.start_time = self.end_time
\ No newline at end of file
+        """
+        Measure the time since the previous stamp (or creation) in milliseconds.
+        """
+        self.end_time = perf_counter_ns()
+        self.benchmark = (self.end_time - self.start_time) / 1e6
+        self.start_time = self.end_time
@@ -0,0 +1,179 @@
+import hmac
+import time
+import asyncio
+import hashlib
+
+from utils.http_pool import http_pool
+from utils.logger import trade_logger
+
+# Binance error code for a timestamp outside of recvWindow (or ahead of the server clock).
+TIMESTAMP_ERROR_CODE = -1021
+
+
+class BinanceClock:
+    """
+    Estimate of the offset between the local clock and a Binance server clock.
+
+    Request timestamps are local time plus the offset, so drift of the local clock
+    does not turn into recvWindow rejections. The offset is measured from the sample
+    with the lowest round trip time, assuming the server read its clock halfway through.
+    """
+
+    def __init__(self, time_url: str):
+        """
+        Initialize a clock with a zero offset.
+
+        :param time_url: Server time endpoint returning {"serverTime": ms}.
+        """
+        self.time_url = time_url
+        self.offset_ms = 0
+        self.round_trip_ms = None
+        self.synced_at = 0
+        self._sync_task = None
+        self._periodic_sync_task = None
+
+    def timestamp(self) -> int:
+        """
+        Get the current server time estimate.
+
+        :return: Milliseconds since the epoch on the server clock.
+        """
+        return int(time.time() * 1000) + self.offset_ms
+
+    async def aupdate_offset(self, samples: int = 5):
+        """
+        Measure the offset to the server clock.
+
+        :param samples: Number of server time requests. The fastest round trip is kept.
+        """
+        best = None
+        for _ in range(samples):
+            start = time.time() * 1000
+            response = await http_pool.arequest("GET", self.time_url, timeout=2)
+            end = time.time() * 1000
+            round_trip = end - start
+            if best is None or round_trip < best[0]:
+                best = (round_trip, response['serverTime'] - (start + end) / 2)
+        self.round_trip_ms, offset = best
+        self.offset_ms = int(round(offset))
+        self.synced_at = time.time()
+        trade_logger.info(f"Clock synced with {self.time_url}: offset {self.offset_ms}ms, round trip {self.round_trip_ms:.1f}ms")
+
+    async def aupdate_offset_periodically(self, interval: float = 60):
+        """
+        Keep the offset up to date in the background.
+
+        :param interval: Seconds between measurements.
+        """
+        while True:
+            try:
+                await self.aupdate_offset()
+            except Exception as e:
+                message = f"Failed to sync clock with {self.time_url}: {e}"
+                trade_logger.error(message)
+            await asyncio.sleep(interval)
+
+    def start_sync(self, interval: float = 60) -> asyncio.Task:
+        """
+        Start aupdate_offset_periodically in the background, once per clock: every client of the clock calls
+        this from its aconnect(), and calls while the sync is running return the running task. A sync that
+        finished (cancelled at shutdown, or crashed) is started again.
+
+        :param interval: Seconds between measurements.
+        :return: The sync task, or None outside a running event loop.
+        """
+        if self._periodic_sync_task is not None and not self._periodic_sync_task.done():
+            return self._periodic_sync_task
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+        self._periodic_sync_task = loop.create_task(self.aupdate_offset_periodically(interval))
+        return self._periodic_sync_task
+
+    def check_response(self, response):
+        """
+        Schedule an immediate resync when a request was rejected for its timestamp.
+
+        :param response: The decoded JSON response of a signed request.
+        """
+        if isinstance(response, dict) and response.get('code') == TIMESTAMP_ERROR_CODE:
+            self.schedule_sync()
+
+    def schedule_sync(self):
+        """
+        Resync in the background if an event loop is running and no sync is in flight.
+        """
+        if self._sync_task is not None and not self._sync_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._sync_task = loop.create_task(self._aupdate_offset_once())
+
+    async def _aupdate_offset_once(self):
+        """
+        Resync and log failures, keeping the previous offset.
+        """
+        try:
+            await self.aupdate_offset()
+        except Exception as e:
+            message = f"Failed to sync clock with {self.time_url}: {e}"
+            trade_logger.error(message)
+
+
+class BinanceSigner:
+    """
+    HMAC-SHA256 request signer with the key schedule done once.
+
+    The keyed HMAC state is built in the constructor and copied for each request,
+    so signing only hashes the query string.
+    """
+
+    def __init__(self, api_key: str, secret_key: str):
+        """
+        Initialize a signer.
+
+        :param api_key: The Binance API key.
+        :param secret_key: The Binance API secret key.
+        """
+        self.api_key = api_key
+        self.headers = {'X-MBX-APIKEY': api_key}
+        self._hmac = hmac.new(secret_key.encode() if secret_key else b'', digestmod=hashlib.sha256)
+
+    def sign(self, query_string: str) -> str:
+        """
+        Sign a query string.
+
+        :param query_string: The query string to be signed.
+        :return: The hex signature.
+        """
+        mac = self._hmac.copy()
+        mac.update(query_string.encode())
+        return mac.hexdigest()
+
+    def signed_url(self, endpoint: str, params: dict) -> str:
+        """
+        Build a signed request URL.
+
+        :param endpoint: The URL endpoint.
+        :param params: The request parameters, in the order they are sent.
+        :return: The URL with the query string and its signature.
+        """
+        query_string = build_query_string(params)
+        return f"{endpoint}?{query_string}&signature={self.sign(query_string)}"
+
+
+def build_query_string(params: dict) -> str:
+    """
+    Generate a query string from a dictionary of parameters.
+
+    :param params: A dictionary of parameters to be included in the query string.
+    :return: A query string with the formatted parameters.
+    """
+    return '&'.join([f"{key}={value}" for key, value in params.items()])
+
+
+usdm_clock = BinanceClock("https://fapi.binance.com/fapi/v1/time")
+spot_clock = BinanceClock("https://api4.binance.com/api/v3/time")
@@ -0,0 +1,39 @@
+import json
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Fastest installed JSON backend, in order of preference.
+JSON_BACKENDS = [backend for backend, module in (('msgspec', msgspec), ('orjson', orjson)) if module is not None] + ['json']
+DEFAULT_JSON_BACKEND = JSON_BACKENDS[0]
+
+
+def get_decoder(schema: type = None, backend: str = None):
+    """
+    Get a function that decodes a websocket message (str or bytes) into Python objects.
+
+    With the msgspec backend and a TypedDict schema, messages are validated against the schema:
+    unknown fields are skipped and numeric strings are decoded straight into numbers.
+    The other backends ignore the schema and return the message as-is, so consumers must accept both.
+
+    :param schema: Optional TypedDict describing the message.
+    :param backend: 'msgspec', 'orjson' or 'json'. Defaults to the fastest installed backend.
+    :return: A decode function.
+    """
+    backend = backend or DEFAULT_JSON_BACKEND
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"JSON backend {backend} is not available. Installed: {JSON_BACKENDS}")
+    if backend == 'msgspec':
+        if schema is None:
+            return msgspec.json.Decoder().decode
+        return msgspec.json.Decoder(schema, strict=False).decode
+    if backend == 'orjson':
+        return orjson.loads
+    return json.loads
@@ -0,0 +1,238 @@
+import os
+import json
+import time
+import asyncio
+
+from utils.http_pool import http_pool
+from utils.logger import market_logger
+
+# Define the directory where exchange metadata is cached between runs.
+cache_dir = './cache'
+
+
+class ExchangeInfoRegistry:
+    """
+    Lazily loaded, shared exchange metadata (symbol lists, tick sizes, ...).
+
+    Nothing is fetched at import time. An entry is loaded on first access from memory, then from the
+    on-disk cache, and only then from the exchange. Entries older than their TTL are refreshed in the
+    background while the cached value keeps being served, so a process can start offline from the cache.
+    """
+
+    def __init__(self, directory: str = cache_dir):
+        """
+        Initialize an empty registry.
+
+        :param directory: Directory of the on-disk cache.
+        """
+        self.directory = directory
+        self._sources = {}
+        self._data = {}
+        self._expires_at = {}
+        self._listeners = {}
+        self._refreshing = set()
+
+    def register(self, name: str, url: str, process, ttl: float = 3600):
+        """
+        Register a metadata source.
+
+        :param name: Name of the entry (also the cache file name).
+        :param url: Public REST endpoint returning the raw metadata as JSON.
+        :param process: Function turning the raw JSON into the cached value. The value must be JSON-serializable.
+        :param ttl: Seconds before the entry is refreshed.
+        """
+        self._sources[name] = (url, process, ttl)
+
+    def subscribe(self, name: str, callback):
+        """
+        Register a callback called with the new value whenever an entry is loaded or refreshed.
+
+        :param name: Name of the entry.
+        :param callback: Function called as callback(value).
+        """
+        self._listeners.setdefault(name, []).append(callback)
+        if name in self._data:
+            callback(self._data[name])
+
+    def get(self, name: str):
+        """
+        Get an entry, loading it synchronously if it is not in memory yet.
+        Prefer awaiting aload() at startup so the event loop never blocks here.
+
+        :param name: Name of the entry.
+        :return: The cached value.
+        """
+        value = self._data.get(name)
+        if value is None:
+            value = self._load_from_disk(name)
+            if value is None:
+                value = self._fetch(name)
+        elif time.time() > self._expires_at[name]:
+            self._schedule_refresh(name)
+        return value
+
+    async def aget(self, name: str):
+        """
+        Get an entry, loading it asynchronously if it is not in memory yet.
+
+        :param name: Name of the entry.
+        :return: The cached value.
+        """
+        value = self._data.get(name)
+        if value is None:
+            value = self._load_from_disk(name)
+            if value is None:
+                value = await self.arefresh(name)
+        elif time.time() > self._expires_at[name]:
+            self._schedule_refresh(name)
+        return value
+
+    async def aload(self, names: list[str] = None):
+        """
+        Load entries concurrently, e.g. at startup.
+
+        :param names: Names of the entries. Defaults to every registered entry.
+        """
+        await asyncio.gather(*[self.aget(name) for name in (names or list(self._sources))])
+
+    async def arefresh(self, name: str):
+        """
+        Fetch an entry from the exchange and update memory and disk.
+
+        :param name: Name of the entry.
+        :return: The new value.
+        """
+        url, process, _ = self._sources[name]
+        raw = await http_pool.arequest("GET", url, timeout=10)
+        return self._set(name, process(raw), time.time())
+
+    async def arefresh_periodically(self, interval: float = 60):
+        """
+        Keep every loaded entry fresh in the background.
+
+        :param interval: Seconds between expiry checks.
+        """
+        while True:
+            for name in list(self._data):
+                if time.time() > self._expires_at[name]:
+                    try:
+                        await self.arefresh(name)
+                    except Exception as e:
+                        message = f"Failed to refresh {name} exchange info: {e}"
+                        market_logger.error(message)
+            await asyncio.sleep(interval)
+
+    def _schedule_refresh(self, name: str):
+        """
+        Refresh an expired entry in the background if an event loop is running.
+
+        :param name: Name of the entry.
+        """
+        if name in self._refreshing:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._refreshing.add(name)
+        loop.create_task(self._arefresh_once(name))
+
+    async def _arefresh_once(self, name: str):
+        """
+        Refresh an entry and log failures, keeping the stale value.
+
+        :param name: Name of the entry.
+        """
+        try:
+            await self.arefresh(name)
+        except Exception as e:
+            message = f"Failed to refresh {name} exchange info: {e}"
+            market_logger.error(message)
+        finally:
+            self._refreshing.discard(name)
+
+    def _fetch(self, name: str, max_retries: int = 3):
+        """
+        Fetch an entry synchronously with a bounded number of retries.
+
+        :param name: Name of the entry.
+        :param max_retries: Number of attempts before giving up.
+        :return: The new value.
+        """
+        import requests
+        url, process, _ = self._sources[name]
+        for attempt in range(1, max_retries + 1):
+            try:
+                response = requests.get(url, timeout=10)
+                return self._set(name, process(response.json()), time.time())
+            except Exception as e:
+                message = f"Failed to fetch {name} exchange info (attempt {attempt}/{max_retries}): {e}"
+                market_logger.error(message)
+                if attempt == max_retries:
+                    raise
+                time.sleep(0.5)
+
+    def _set(self, name: str, value, fetched_at: float, persist: bool = True):
+        """
+        Store an entry in memory (and on disk) and notify subscribers.
+
+        :param name: Name of the entry.
+        :param value: The processed value.
+        :param fetched_at: When the value was fetched from the exchange.
+        :param persist: Write the value to the disk cache.
+        :return: The value.
+        """
+        self._data[name] = value
+        self._expires_at[name] = fetched_at + self._sources[name][2]
+        if persist:
+            self._save_to_disk(name, value, fetched_at)
+        for callback in self._listeners.get(name, []):
+            callback(value)
+        return value
+
+    def _cache_path(self, name: str) -> str:
+        """
+        Get the disk cache path of an entry.
+
+        :param name: Name of the entry.
+        :return: The file path.
+        """
+        return os.path.join(self.directory, f"{name}.json")
+
+    def _load_from_disk(self, name: str):
+        """
+        Load an entry from the disk cache. Expired entries are still served and refreshed in the background.
+
+        :param name: Name of the entry.
+        :return: The cached value, or None if there is no usable cache.
+        """
+        try:
+            with open(self._cache_path(name)) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        value = self._set(name, cached['data'], cached['fetched_at'], persist=False)
+        if time.time() > self._expires_at[name]:
+            self._schedule_refresh(name)
+        return value
+
+    def _save_to_disk(self, name: str, value, fetched_at: float):
+        """
+        Atomically write an entry to the disk cache.
+
+        :param name: Name of the entry.
+        :param value: The processed value.
+        :param fetched_at: When the value was fetched from the exchange.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = self._cache_path(name)
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump({'fetched_at': fetched_at, 'data': value}, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            message = f"Failed to cache {name} exchange info: {e}"
+            market_logger.error(message)
+
+
+exchange_info = ExchangeInfoRegistry()
@@ -0,0 +1,108 @@
+import asyncio
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+
+from utils.logger import market_logger
+
+
+class HttpSessionPool:
+    """
+    Long-lived keep-alive HTTP connection pool shared by every exchange client.
+
+    A single ClientSession (and its TCPConnector) is created lazily on the running event loop
+    and reused for every REST call, so orders skip the TCP+TLS handshake after the first request.
+    """
+
+    def __init__(self, limit: int = 100, limit_per_host: int = 20, dns_cache_ttl: int = 300,
+                 keepalive_timeout: float = 60):
+        """
+        Initialize the pool settings. The session itself is only created on first use.
+
+        :param limit: Total number of simultaneous connections.
+        :param limit_per_host: Number of simultaneous connections to the same host.
+        :param dns_cache_ttl: Seconds to cache resolved DNS entries.
+        :param keepalive_timeout: Seconds an idle connection is kept open.
+        """
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session = None
+
+    def configure(self, **settings):
+        """
+        Update pool settings. Takes effect the next time the session is created.
+
+        :param settings: Any of limit, limit_per_host, dns_cache_ttl and keepalive_timeout.
+        """
+        for key, value in settings.items():
+            if not hasattr(self, key) or key.startswith('_'):
+                raise ValueError(f"Unknown http pool setting: {key}")
+            setattr(self, key, value)
+
+    def get_session(self) -> ClientSession:
+        """
+        Get the shared session, creating it on the running event loop if needed.
+
+        :return: The shared ClientSession.
+        """
+        if self._session is None or self._session.closed:
+            connector = TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                use_dns_cache=True,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = ClientSession(connector=connector)
+        return self._session
+
+    async def arequest(self, method: str, url: str, headers: dict = None, data=None, timeout: float = 1):
+        """
+        Make a request through the shared session and return the decoded JSON body.
+
+        :param method: The HTTP method (GET, POST, DELETE, etc.).
+        :param url: The full request URL including the query string.
+        :param headers: HTTP headers for the request.
+        :param data: Request body.
+        :param timeout: Total timeout for the request in seconds.
+        :return: The JSON response.
+        """
+        session = self.get_session()
+        async with session.request(method, url, headers=headers, data=data, timeout=ClientTimeout(total=timeout)) as res:
+            return await res.json()
+
+    async def awarm_up(self, urls: list[str], connections_per_host: int = 1, timeout: float = 3):
+        """
+        Pre-open keep-alive connections so the first orders do not pay for DNS, TCP and TLS setup.
+
+        :param urls: Cheap endpoints to hit on each host (e.g. ping endpoints).
+        :param connections_per_host: Number of parallel connections to open per url.
+        :param timeout: Timeout for each warm-up request in seconds.
+        """
+        async def _awarm(url):
+            try:
+                session = self.get_session()
+                async with session.get(url, timeout=ClientTimeout(total=timeout)) as res:
+                    await res.read()
+            except Exception as e:
+                message = f"Failed to warm up connection to {url}: {e}"
+                market_logger.error(message)
+
+        await asyncio.gather(*[_awarm(url) for url in urls for _ in range(connections_per_host)])
+
+    async def aclose(self):
+        """
+        Close the shared session and every pooled connection.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+WARM_UP_URLS = [
+    "https://fapi.binance.com/fapi/v1/ping",
+    "https://api4.binance.com/api/v3/ping",
+    "https://api.upbit.com/v1/market/all",
+]
+
+http_pool = HttpSessionPool()
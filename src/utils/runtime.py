@@ -0,0 +1,204 @@
+import time
+import signal
+import asyncio
+import multiprocessing
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+from utils import benchmark
+from utils.benchmark import LatencyHistogram
+from utils.http_pool import http_pool, WARM_UP_URLS
+from utils.logger import benchmark_logger
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Create an event loop: uvloop when it is installed, the default asyncio loop otherwise.
+
+    :return: The event loop.
+    """
+    if uvloop is not None:
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()
+
+
+class LoopLagMonitor:
+    """
+    Measures event loop lag: how late a task that asked to sleep interval seconds is woken up.
+    Lag is time the loop spent running other callbacks (or blocked), so it bounds how long any
+    websocket message or order response can wait before it is handled.
+
+    Samples go into a fixed-size LatencyHistogram, and the percentiles of the samples taken since the
+    previous report are logged to benchmark_logger every report_interval seconds.
+    """
+
+    def __init__(self, interval: float = 0.05, report_interval: float = 60):
+        """
+        Initialize a monitor. It samples once arun() is running on the loop.
+
+        :param interval: Seconds between samples.
+        :param report_interval: Seconds between reports.
+        """
+        self.interval = interval
+        self.report_interval = report_interval
+        self.histogram = LatencyHistogram('event_loop_lag')
+
+    def record(self, lag: float):
+        """
+        Record one lag sample.
+
+        :param lag: Lag in seconds.
+        """
+        self.histogram.record(int(lag * 1e9))
+
+    def percentiles(self) -> dict:
+        """
+        Get the lag percentiles of the samples since the last reset.
+
+        :return: Dictionary with samples and p50, p90, p99 and max in milliseconds.
+        """
+        p50, p90, p99 = self.histogram.percentiles([50, 90, 99])
+        return {'samples': self.histogram.count, 'p50': p50 / 1e6, 'p90': p90 / 1e6, 'p99': p99 / 1e6, 'max': self.histogram.max / 1e6}
+
+    def reset(self):
+        """
+        Drop the samples.
+        """
+        self.histogram.reset()
+
+    def report(self):
+        """
+        Log the lag percentiles and start a new report period.
+        """
+        stats = self.percentiles()
+        benchmark_logger.info(f"[{multiprocessing.current_process().name}] Event loop lag over {stats['samples']} samples: "
+                              f"p50 {stats['p50']:.2f}ms, p90 {stats['p90']:.2f}ms, p99 {stats['p99']:.2f}ms, max {stats['max']:.2f}ms")
+        self.reset()
+
+    async def arun(self):
+        """
+        Sample the loop lag and report it periodically until cancelled.
+        """
+        interval = self.interval
+        report_at = time.perf_counter() + self.report_interval
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            self.record(max(now - start - interval, 0.0))
+            if now >= report_at:
+                self.report()
+                report_at = now + self.report_interval
+
+
+def run(main, lag_monitor: LoopLagMonitor = None, monitor_lag: bool = True, shutdown_timeout: float = 5, export_interval: float = 60,
+        warm_up: bool = True):
+    """
+    Run the bot's main coroutine, the shared entry point of every long-running script.
+
+    Runs on uvloop when it is installed, with the loop lag monitor and the periodic export of the
+    utils.benchmark latency histograms alongside the main coroutine. The shared HTTP pool is warmed up
+    at startup, so the first order does not pay for the TCP and TLS handshake. SIGINT and SIGTERM cancel
+    the main coroutine instead of killing the process. On the way out the remaining tasks are cancelled and given
+    shutdown_timeout seconds to finish, the histograms are exported a last time and the shared HTTP pool is closed.
+
+    :param main: The main coroutine.
+    :param lag_monitor: Loop lag monitor to run. Defaults to LoopLagMonitor().
+    :param monitor_lag: Run the loop lag monitor.
+    :param shutdown_timeout: Seconds the remaining tasks get to finish after being cancelled.
+    :param export_interval: Seconds between latency histogram exports.
+    :param warm_up: Warm up the shared HTTP pool with WARM_UP_URLS.
+    :return: The result of the main coroutine, or None if it was stopped by a signal.
+    """
+    loop = new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(_arun(main, (lag_monitor or LoopLagMonitor()) if monitor_lag else None, shutdown_timeout, export_interval,
+                                             warm_up))
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+async def _arun(main, lag_monitor: LoopLagMonitor, shutdown_timeout: float, export_interval: float, warm_up: bool):
+    """
+    Run the main coroutine under signal handling and shut down gracefully.
+
+    :param main: The main coroutine.
+    :param lag_monitor: Loop lag monitor to run, or None.
+    :param shutdown_timeout: Seconds the remaining tasks get to finish after being cancelled.
+    :param export_interval: Seconds between latency histogram exports.
+    :param warm_up: Warm up the shared HTTP pool in the background.
+    :return: The result of the main coroutine, or None if it was stopped by a signal.
+    """
+    loop = asyncio.get_running_loop()
+    # Kept referenced until shutdown, when _acancel_tasks cancels it if it is still running.
+    warm_up_task = None
+    if warm_up:
+        warm_up_task = loop.create_task(http_pool.awarm_up(WARM_UP_URLS))
+    main_task = loop.create_task(main)
+    monitor_task = loop.create_task(lag_monitor.arun()) if lag_monitor is not None else None
+    export_task = loop.create_task(benchmark.aexport_periodically(export_interval))
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, _cancel_on_signal, main_task, signum)
+        except (NotImplementedError, RuntimeError):
+            # Not supported on Windows, or not running in the main thread.
+            pass
+    try:
+        return await main_task
+    except asyncio.CancelledError:
+        if not main_task.cancelled():
+            raise
+        return None
+    finally:
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.remove_signal_handler(signum)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if lag_monitor is not None:
+            monitor_task.cancel()
+            lag_monitor.report()
+        export_task.cancel()
+        await _acancel_tasks(shutdown_timeout)
+        benchmark.export()
+        await http_pool.aclose()
+
+
+def _cancel_on_signal(main_task: asyncio.Task, signum: int):
+    """
+    Signal handler: cancel the main task.
+
+    :param main_task: The main task.
+    :param signum: The received signal.
+    """
+    benchmark_logger.info(f"Received {signal.Signals(signum).name}, shutting down")
+    main_task.cancel()
+
+
+async def _acancel_tasks(timeout: float):
+    """
+    Cancel every task but the current one and wait for them to finish.
+
+    :param timeout: Seconds to wait.
+    """
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    if not tasks:
+        return
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            message = f"Task {task.get_name()} failed during shutdown: {task.exception()!r}"
+            benchmark_logger.error(message)
+    if pending:
+        message = f"{len(pending)} tasks did not finish within {timeout}s of shutdown: {[task.get_name() for task in pending]}"
+        benchmark_logger.error(message)
@@ -0,0 +1,45 @@
+from multiprocessing.shared_memory import SharedMemory
+
+
+def create_segment(size: int) -> SharedMemory:
+    """
+    Create a shared memory segment. The creator owns it and must unlink it.
+
+    :param size: Size in bytes.
+    :return: The segment.
+    """
+    return SharedMemory(create=True, size=size)
+
+
+def attach_segment(name: str) -> SharedMemory:
+    """
+    Attach to a segment created by another process without taking ownership of it.
+
+    :param name: Name of the segment.
+    :return: The segment.
+    """
+    try:
+        return SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers attached segments with the resource tracker. Spawned workers share
+        # their parent's tracker, where registering the owner's segment again is a no-op.
+        return SharedMemory(name=name)
+
+
+def release_segment(segment: SharedMemory, unlink: bool = False):
+    """
+    Close a segment and optionally unlink it. Closing fails while numpy views of the segment are
+    still alive; the mapping is then released when the process exits.
+
+    :param segment: The segment.
+    :param unlink: Remove the segment's name, as its owner.
+    """
+    try:
+        segment.close()
+    except BufferError:
+        pass
+    if unlink:
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from utils.exchange_info import exchange_info
+
+
+class SymbolRules:
+    """
+    Compiled order formatting rules of one symbol.
+
+    Prices and quantities are snapped to an integer number of ticks (steps) and rendered
+    by multiplying that integer with the exact Decimal tick, so no string parsing or
+    float formatting happens when an order is built.
+    """
+    __slots__ = ('symbol', 'tick_size', 'step_size', '_tick', '_step', 'templates')
+
+    def __init__(self, symbol: str, tick_size: float, step_size: float):
+        """
+        Compile the rules of a symbol.
+
+        :param symbol: The exchange symbol (e.g. 'BTCUSDT').
+        :param tick_size: Price tick, or None if the exchange has no price filter.
+        :param step_size: Quantity step, or None if the exchange has no lot filter.
+        """
+        self.symbol = symbol
+        self.tick_size = tick_size
+        self.step_size = step_size
+        self._tick = Decimal(repr(tick_size)) if tick_size else None
+        self._step = Decimal(repr(step_size)) if step_size else None
+        self.templates = {}
+
+    def format_price(self, price: float) -> str:
+        """
+        Round a price to the nearest tick.
+
+        :param price: The price.
+        :return: The price as a decimal string.
+        """
+        if self._tick is None:
+            return repr(float(price))
+        return format(self._tick * round(price / self.tick_size), 'f')
+
+    def format_qty(self, qty: float) -> str:
+        """
+        Round a quantity to the nearest step.
+
+        :param qty: The quantity.
+        :return: The quantity as a decimal string.
+        """
+        if self._step is None:
+            return repr(float(qty))
+        return format(self._step * round(qty / self.step_size), 'f')
+
+    def template(self, key, build) -> dict:
+        """
+        Get a prebuilt parameter template, building it on first use.
+
+        :param key: Template key (e.g. (side, order_type)).
+        :param build: Function (symbol, key) -> dict of the constant order parameters.
+        :return: The template. Copy it before filling in per-order values.
+        """
+        template = self.templates.get(key)
+        if template is None:
+            template = self.templates[key] = build(self.symbol, key)
+        return template
+
+
+class SymbolRulesTable:
+    """
+    Per-symbol SymbolRules compiled from a Binance style exchange info entry
+    ([symbols, {symbol: {'tick_size', 'min_qty'}}]) and recompiled whenever the entry is refreshed.
+    """
+
+    def __init__(self, source: str, quote: str):
+        """
+        Initialize a rules table bound to an exchange info entry.
+
+        :param source: Name of the entry in utils.exchange_info.
+        :param quote: Quote asset appended to base symbols (e.g. 'USDT').
+        """
+        self.source = source
+        self.quote = quote
+        self._rules = None
+        exchange_info.subscribe(source, self._compile)
+
+    def __getitem__(self, symbol: str) -> SymbolRules:
+        """
+        Get the rules of a base symbol, loading the exchange info on first use.
+
+        :param symbol: The base symbol (e.g. 'BTC').
+        :return: The compiled rules.
+        """
+        if self._rules is None:
+            self._compile(exchange_info.get(self.source))
+        return self._rules[symbol]
+
+    def _compile(self, value):
+        """
+        Compile the rules of every symbol of an exchange info entry.
+
+        :param value: The exchange info entry.
+        """
+        tick_info = value[1]
+        self._rules = {
+            symbol: SymbolRules(symbol + self.quote, info['tick_size'], info['min_qty'])
+            for symbol, info in tick_info.items()
+        }
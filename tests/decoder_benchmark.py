@@ -0,0 +1,73 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import json
+import time
+import random
+from utils.decoder import get_decoder, JSON_BACKENDS
+from binance_usdm.schema import BinanceCombinedDepthMessage
+from upbit.schema import UpbitOrderbookMessage
+from backtest.replay import read_frames
+
+# Messages per second for each JSON backend over Binance combined depth5 frames and
+# Upbit SIMPLE orderbook frames. Pass frame files recorded with backtest.replay.FrameRecorder to use real data:
+#   python tests/decoder_benchmark.py binance.frames upbit.frames
+ROUNDS = 20000
+
+
+def sample_binance_frames(count: int = 1000) -> list:
+    frames = []
+    for _ in range(count):
+        mid = random.uniform(10, 60000)
+        data = {
+            "e": "depthUpdate", "E": int(time.time() * 1000), "T": int(time.time() * 1000), "s": "BTCUSDT",
+            "U": 1, "u": 2, "pu": 0,
+            "b": [[f"{mid - i * 0.1:.2f}", f"{random.uniform(0, 10):.3f}"] for i in range(1, 6)],
+            "a": [[f"{mid + i * 0.1:.2f}", f"{random.uniform(0, 10):.3f}"] for i in range(1, 6)],
+        }
+        frames.append(json.dumps({"stream": "btcusdt@depth5@100ms", "data": data}).encode())
+    return frames
+
+
+def sample_upbit_frames(count: int = 1000) -> list:
+    frames = []
+    for _ in range(count):
+        mid = random.uniform(100, 50000000)
+        obu = [{"ap": mid + i, "bp": mid - i, "as": random.uniform(0, 10), "bs": random.uniform(0, 10)} for i in range(1, 16)]
+        frames.append(json.dumps({
+            "ty": "orderbook", "cd": "KRW-BTC", "tms": int(time.time() * 1000), "tas": 10.5, "tbs": 12.1,
+            "obu": obu, "st": "REALTIME", "lv": 0,
+        }).encode())
+    return frames
+
+
+def load_frames(path: str) -> list:
+    return [message for _, message in read_frames(path)]
+
+
+def measure(decode, frames: list) -> float:
+    count = 0
+    start = time.perf_counter()
+    while count < ROUNDS:
+        for frame in frames:
+            decode(frame)
+        count += len(frames)
+    return count / (time.perf_counter() - start)
+
+
+def report(name: str, frames: list, schema: type):
+    print(name)
+    for backend in JSON_BACKENDS:
+        print(f"  {backend:<16} {measure(get_decoder(backend=backend), frames):>12,.0f} msg/s")
+        if backend == 'msgspec':
+            print(f"  {'msgspec (typed)':<16} {measure(get_decoder(schema, backend), frames):>12,.0f} msg/s")
+
+
+if __name__ == '__main__':
+    binance_frames = load_frames(sys.argv[1]) if len(sys.argv) > 1 else sample_binance_frames()
+    upbit_frames = load_frames(sys.argv[2]) if len(sys.argv) > 2 else sample_upbit_frames()
+    report("Binance USDM depth5 (combined stream)", binance_frames, BinanceCombinedDepthMessage)
+    report("Upbit KRW orderbook (SIMPLE)", upbit_frames, UpbitOrderbookMessage)
@@ -0,0 +1,53 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import time
+import asyncio
+import statistics
+from aiohttp import ClientSession, ClientTimeout
+from utils.http_pool import http_pool, WARM_UP_URLS
+
+# Round-trip latency of a REST call with a new ClientSession per call (old behaviour)
+# versus the shared keep-alive pool, measured against the unauthenticated ping endpoint.
+ENDPOINT = "https://fapi.binance.com/fapi/v1/ping"
+ROUNDS = 50
+
+
+async def fresh_session_call():
+    async with ClientSession(timeout=ClientTimeout(total=3)) as session:
+        async with session.request("GET", ENDPOINT) as res:
+            return await res.json()
+
+
+async def pooled_call():
+    return await http_pool.arequest("GET", ENDPOINT, timeout=3)
+
+
+async def measure(call) -> list:
+    latencies = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        await call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list):
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(f"{name:<16} mean: {statistics.mean(latencies):7.2f} ms  p50: {p50:7.2f} ms  p99: {p99:7.2f} ms")
+
+
+async def main():
+    report("fresh session", await measure(fresh_session_call))
+    await http_pool.awarm_up(WARM_UP_URLS)
+    report("pooled session", await measure(pooled_call))
+    await http_pool.aclose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
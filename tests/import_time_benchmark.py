@@ -0,0 +1,30 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import time
+import subprocess
+
+# Cold import time of each exchange module, measured in a fresh interpreter.
+# Importing must not touch the network: exchange metadata is loaded lazily through utils.exchange_info.
+MODULES = [
+    'upbit.market',
+    'upbit.broker',
+    'binance_usdm.market',
+    'binance_usdm.broker',
+    'binance_spot.broker',
+]
+
+
+def measure(module: str) -> float:
+    code = (f"import sys, time; sys.path.append({project_root_path!r}); "
+            f"start = time.perf_counter(); import {module}; print(time.perf_counter() - start)")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    for module in MODULES:
+        print(f"{module:<24} {measure(module) * 1000:>8.1f} ms")
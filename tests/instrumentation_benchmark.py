@@ -0,0 +1,76 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import time
+import asyncio
+from utils.benchmark import timed, span, get_histogram
+
+# Overhead of utils.benchmark spans: nanoseconds added per call by @timed on a function and on a
+# coroutine function, and by a reused span context manager, over the same call left uninstrumented.
+# Each measurement keeps the fastest of REPEATS runs, and every overhead must stay under BUDGET_NS.
+ROUNDS = 200000
+REPEATS = 5
+BUDGET_NS = 1000
+
+SPAN = span('benchmark.span')
+
+
+def work(x):
+    return x + 1
+
+
+@timed('benchmark.sync')
+def timed_work(x):
+    return x + 1
+
+
+async def awork(x):
+    return x + 1
+
+
+@timed('benchmark.async')
+async def timed_awork(x):
+    return x + 1
+
+
+def measure(function) -> float:
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for i in range(ROUNDS):
+            function(i)
+        elapsed = (time.perf_counter_ns() - start) / ROUNDS
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def spanned_work(x):
+    with SPAN:
+        return x + 1
+
+
+async def ameasure(function) -> float:
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for i in range(ROUNDS):
+            await function(i)
+        elapsed = (time.perf_counter_ns() - start) / ROUNDS
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    bare = measure(work)
+    overheads = {'@timed function': measure(timed_work) - bare,
+                 'span context manager': measure(spanned_work) - bare}
+    bare = asyncio.run(ameasure(awork))
+    overheads['@timed coroutine'] = asyncio.run(ameasure(timed_awork)) - bare
+    for name, overhead in overheads.items():
+        print(f"{name + ':':<22}{overhead:>6.0f} ns/span")
+    for name in ('benchmark.sync', 'benchmark.span', 'benchmark.async'):
+        print(get_histogram(name).summary())
+    assert max(overheads.values()) < BUDGET_NS, f"span overhead over the {BUDGET_NS}ns budget"
@@ -0,0 +1,144 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import json
+import time
+import random
+import asyncio
+import tempfile
+import binance_usdm.market
+from backtest.replay import FrameRecorder, MarketReplayer
+from binance_usdm.local_book import LocalBook
+from binance_usdm.market import BinanceUsdmMarket
+
+# Diff depth local book throughput (events per second through BinanceUsdmMarket._on_message)
+# on a synthetic stream, plus a check that the local book matches the simulated exchange book
+# and recovers from a dropped event, and that a recorded stream replays offline into the same book.
+# No network access is needed: REST snapshots are served by the simulated exchange.
+EVENTS = 200000
+SNAPSHOT_LEVELS = 1000
+CHANGES_PER_EVENT = 8
+
+
+class SimulatedBook:
+    """
+    Exchange-side book that emits diff depth events with consecutive update ids.
+    Changes are concentrated near the touch, like the stream of a liquid perpetual.
+    """
+
+    def __init__(self, mid: float = 60000, tick: float = 0.1):
+        self.tick = tick
+        self.mid = mid
+        self.asks = {round(mid + tick * i, 1): round(random.uniform(0.01, 5), 3) for i in range(1, SNAPSHOT_LEVELS + 1)}
+        self.bids = {round(mid - tick * i, 1): round(random.uniform(0.01, 5), 3) for i in range(1, SNAPSHOT_LEVELS + 1)}
+        self.update_id = 1000
+
+    def snapshot(self) -> dict:
+        return {'lastUpdateId': self.update_id, 'E': int(time.time() * 1000),
+                'asks': [[str(price), str(qty)] for price, qty in sorted(self.asks.items())],
+                'bids': [[str(price), str(qty)] for price, qty in sorted(self.bids.items(), reverse=True)]}
+
+    def event(self) -> dict:
+        asks, bids = {}, {}
+        for _ in range(CHANGES_PER_EVENT):
+            side, levels, sign = random.choice([(asks, self.asks, 1), (bids, self.bids, -1)])
+            price = round(self.mid + sign * self.tick * int(random.expovariate(0.1) + 1), 1)
+            qty = 0.0 if random.random() < 0.3 else round(random.uniform(0.01, 5), 3)
+            side[price] = qty
+            if qty:
+                levels[price] = qty
+            else:
+                levels.pop(price, None)
+        previous = self.update_id
+        self.update_id += random.randint(1, 5)
+        return {'e': 'depthUpdate', 'E': int(time.time() * 1000), 'T': int(time.time() * 1000), 's': 'BTCUSDT',
+                'U': previous + 1, 'u': self.update_id, 'pu': previous,
+                'b': [[str(price), str(qty)] for price, qty in bids.items()],
+                'a': [[str(price), str(qty)] for price, qty in asks.items()]}
+
+    def top(self, depth: int) -> tuple[list, list]:
+        return ([[price, self.asks[price]] for price in sorted(self.asks)[:depth]],
+                [[price, self.bids[price]] for price in sorted(self.bids, reverse=True)[:depth]])
+
+
+def check_sequencing():
+    exchange = SimulatedBook()
+    book = LocalBook(5)
+    early = [exchange.event() for _ in range(3)]
+    snapshot = exchange.snapshot()
+    late = [exchange.event() for _ in range(3)]
+    for event in early + late:
+        assert book.apply(event['U'], event['u'], event['pu'], event['a'], event['b']) is None
+    assert book.load_snapshot(snapshot['lastUpdateId'], snapshot['asks'], snapshot['bids'])
+    for _ in range(1000):
+        event = exchange.event()
+        assert book.apply(event['U'], event['u'], event['pu'], event['a'], event['b']) is not None
+    assert book.top(50) == exchange.top(50), "local book diverged"
+    exchange.event()
+    event = exchange.event()
+    assert book.apply(event['U'], event['u'], event['pu'], event['a'], event['b']) is None and not book.synced, "gap not detected"
+    snapshot = exchange.snapshot()
+    assert book.load_snapshot(snapshot['lastUpdateId'], snapshot['asks'], snapshot['bids'])
+    event = exchange.event()
+    book.apply(event['U'], event['u'], event['pu'], event['a'], event['b'])
+    assert book.top(50) == exchange.top(50), "local book diverged after gap recovery"
+    print(f"Sequencing OK ({book.gaps} gap detected and recovered)")
+
+
+async def arecord(exchange: SimulatedBook, path: str):
+    """
+    Stream events into a diff depth market while recording its frames, snapshots included.
+    """
+    async def arequest(method, url, headers=None, data=None, timeout=1):
+        return exchange.snapshot()
+
+    binance_usdm.market.http_pool.arequest = arequest
+    market = BinanceUsdmMarket(['BTC'], 5, diff_depth=True)
+    recorder = FrameRecorder(market, path)
+    recorder.start()
+    for n in range(2000):
+        market._on_message(json.dumps({'stream': 'btcusdt@depth@100ms', 'data': exchange.event()}))
+        if n % 100 == 0:
+            await asyncio.sleep(0)
+    await asyncio.gather(*(market._tasks or ()))
+    recorder.close()
+    assert market.get_depth('BTC', 50) == exchange.top(50), "recorded market diverged"
+
+
+def check_replay():
+    exchange = SimulatedBook()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'btc.frames')
+        asyncio.run(arecord(exchange, path))
+        market = BinanceUsdmMarket(['BTC'], 5, diff_depth=True)
+        stats = MarketReplayer([(market, path)]).replay()
+        assert market.get_depth('BTC', 50) == exchange.top(50), "replayed market diverged"
+        market = BinanceUsdmMarket(['BTC'], 5, diff_depth=True)
+        asyncio.run(MarketReplayer([(market, path)]).areplay())
+        assert market.get_depth('BTC', 50) == exchange.top(50), "async replayed market diverged"
+    print(f"Replay OK ({stats.messages} frames, {stats.updates} book updates)")
+
+
+def measure_market():
+    exchange = SimulatedBook()
+    market = BinanceUsdmMarket(['BTC'], 5, diff_depth=True)
+    snapshot = exchange.snapshot()
+    market.local_books[0].load_snapshot(snapshot['lastUpdateId'], snapshot['asks'], snapshot['bids'])
+    messages = [json.dumps({'stream': 'btcusdt@depth@100ms', 'data': exchange.event()}).encode() for _ in range(EVENTS)]
+    start = time.perf_counter()
+    for message in messages:
+        market._on_message(message)
+    elapsed = time.perf_counter() - start
+    assert market.get_depth('BTC', 50) == exchange.top(50), "market book diverged"
+    print(f"{EVENTS / elapsed:>12,.0f} events/s {1e6 * elapsed / EVENTS:>8.2f} us/event "
+          f"({CHANGES_PER_EVENT} level changes per event, {len(market.local_books[0].asks) + len(market.local_books[0].bids)} levels)")
+
+
+if __name__ == '__main__':
+    random.seed(7)
+    check_sequencing()
+    check_replay()
+    measure_market()
@@ -0,0 +1,94 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import time
+import asyncio
+import numpy as np
+from base.Market import Market
+from base.MarketProcess import MarketProcess
+from base.Freshness import FreshnessIndex
+from base.OrderBook import OrderBook
+
+# Runs a synthetic market in a worker process and checks, from this process, that
+# - listeners are published for the worker's updates,
+# - OrderBook.read() never returns a torn row while the worker rewrites it at full speed
+#   (every update fills a whole row with one value, so a consistent copy is uniform),
+# - the lock-free views do see torn rows, i.e. the check is meaningful,
+# - a row left mid-write by a killed worker reads as empty instead of blocking, and is readable again
+#   once the restarted worker writes it.
+SYMBOLS = [f"S{i}" for i in range(200)]
+DEPTH = 15
+DURATION = 3
+
+
+class SyntheticMarket(Market):
+    exchange = 'Synthetic'
+
+    def __init__(self, symbols: list, order_book_depth: int, order_book: OrderBook = None, freshness: FreshnessIndex = None):
+        self.symbols = symbols
+        self.order_book_depth = order_book_depth
+        self.order_book = order_book if order_book is not None else OrderBook(symbols, order_book_depth)
+        self.freshness = freshness if freshness is not None else FreshnessIndex(symbols)
+
+    async def aconnect(self):
+        value = 0
+        levels = [[0.0, 0.0]] * self.order_book_depth
+        while True:
+            for row in range(len(self.symbols)):
+                value += 1
+                levels = [[float(value), float(value)]] * self.order_book_depth
+                self._apply((row, value, levels))
+            await asyncio.sleep(0)
+
+    def _process_data(self, raw_data) -> str:
+        row, value, levels = raw_data
+        self.order_book.update(row, value, levels, levels)
+        return self.symbols[row]
+
+
+async def amain():
+    market = MarketProcess(SyntheticMarket, SYMBOLS, DEPTH)
+    published = []
+    market.add_listener(lambda market, symbol: published.append(symbol))
+    task = asyncio.create_task(market.aconnect())
+    await asyncio.sleep(2)
+    reads = torn_reads = torn_views = 0
+    end = time.time() + DURATION
+    while time.time() < end:
+        for row in range(0, len(SYMBOLS), 7):
+            update_time, levels = market.order_book.read(row)
+            reads += 1
+            if update_time and not (levels == update_time).all():
+                torn_reads += 1
+            view = market.order_book.levels[row]
+            if np.isfinite(view).all() and view.min() != view.max():
+                torn_views += 1
+        await asyncio.sleep(0)
+    fresh = len(market.fresh_symbols())
+    # Kill the worker and leave row 0 mid-write, as if it died inside update().
+    market.process.kill()
+    market.process.join()
+    market.order_book.begin_write(0)
+    start = time.perf_counter()
+    update_time, _ = market.order_book.read(0)
+    blocked = time.perf_counter() - start
+    assert update_time == 0, "read() of a row left mid-write did not give up"
+    restarted_at = time.time() + 10
+    while time.time() < restarted_at and not market.order_book.read(0)[0]:
+        await asyncio.sleep(0.1)
+    update_time, levels = market.order_book.read(0)
+    assert update_time and (levels == update_time).all(), "row left mid-write was not recovered"
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await market.aclose()
+    print(f"published updates: {len(published)} ({len(set(published))} symbols), fresh symbols: {fresh}/{len(SYMBOLS)}")
+    print(f"seqlock reads: {reads}, torn: {torn_reads}; lock-free view reads torn: {torn_views}")
+    print(f"row left mid-write by a killed worker: read gave up after {blocked * 1000:.1f}ms, recovered after restart")
+    assert published and torn_reads == 0
+
+
+if __name__ == '__main__':
+    asyncio.run(amain())
@@ -0,0 +1,28 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+from backtest.replay import MarketReplayer, read_frame_meta
+from binance_usdm.market import BinanceUsdmMarket
+from upbit.market import UpbitKrwMarket
+
+# Replays recorded frame files through the markets' live message path and prints
+# throughput and tick-to-signal latency. Record frames with backtest.replay.FrameRecorder.
+#   python tests/market_replay.py upbit.frames binance.frames
+
+
+def build_market(meta: dict):
+    if meta['exchange'] == UpbitKrwMarket.exchange:
+        return UpbitKrwMarket(meta['symbols'], meta['order_book_depth'])
+    if meta['exchange'] == BinanceUsdmMarket.exchange:
+        return BinanceUsdmMarket(meta['symbols'], meta['order_book_depth'], combined_stream=meta['combined_stream'],
+                                 diff_depth=meta.get('diff_depth', False))
+    raise ValueError(f"Unknown exchange: {meta['exchange']}")
+
+
+if __name__ == '__main__':
+    sources = [(build_market(read_frame_meta(path)), path) for path in sys.argv[1:]]
+    stats = MarketReplayer(sources).replay()
+    print(stats)
@@ -0,0 +1,58 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import time
+import random
+from base.OrderSheet import OrderSheet
+from binance_usdm.broker import BinanceUsdmBroker
+from binance_spot.broker import BinanceSpotBroker
+from upbit.broker import UpbitKrwBroker
+from utils.exchange_info import exchange_info
+
+# Order parameter construction throughput (orders per second and microseconds per order)
+# with synthetic exchange info, so no network access is needed.
+ROUNDS = 200000
+
+TICK_INFO = {
+    'BTC': {'tick_size': 0.1, 'min_qty': 0.001},
+    'ETH': {'tick_size': 0.01, 'min_qty': 0.001},
+    'XRP': {'tick_size': 0.0001, 'min_qty': 0.1},
+    'DOGE': {'tick_size': 1e-05, 'min_qty': 1.0},
+}
+
+
+def sample_order_sheets(count: int = 1000) -> list:
+    order_sheets = []
+    for _ in range(count):
+        symbol = random.choice(list(TICK_INFO))
+        order_sheets.append(OrderSheet(exchange='benchmark',
+                                       symbol=symbol,
+                                       side=random.choice(['buy', 'sell']),
+                                       order_type=random.choice(['limit', 'market']),
+                                       price=random.uniform(0.05, 60000),
+                                       qty=random.uniform(0.001, 100)))
+    return order_sheets
+
+
+def measure(set_order_params, order_sheets: list) -> float:
+    count = 0
+    start = time.perf_counter()
+    while count < ROUNDS:
+        for order_sheet in order_sheets:
+            set_order_params(order_sheet)
+        count += len(order_sheets)
+    return count / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    exchange_info._set('binance_usdm_symbols', [list(TICK_INFO), TICK_INFO], time.time(), persist=False)
+    exchange_info._set('binance_spot_symbols', [list(TICK_INFO), TICK_INFO], time.time(), persist=False)
+    order_sheets = sample_order_sheets()
+    for name, broker in [('Binance USDM', BinanceUsdmBroker('key', 'secret')),
+                         ('Binance Spot', BinanceSpotBroker('key', 'secret')),
+                         ('Upbit KRW', UpbitKrwBroker('key', 'secret'))]:
+        rate = measure(broker._set_order_params, order_sheets)
+        print(f"{name:<14} {rate:>12,.0f} orders/s {1e6 / rate:>8.2f} us/order")
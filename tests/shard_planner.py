@@ -0,0 +1,56 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import random
+from upbit.shard_planner import ShardPlanner
+
+# Checks that ShardPlanner.replan() only touches the shards whose symbols changed:
+# a symbol turning hot, then cooling down, then a shared shard overloading reconnect at most
+# a couple of connections, while every symbol keeps exactly one shard.
+SYMBOLS = [f"S{i}" for i in range(200)]
+
+
+def changed(before: list[list[str]], after: list[list[str]]) -> int:
+    before = {frozenset(shard) for shard in before}
+    return sum(1 for shard in after if frozenset(shard) not in before)
+
+
+def check(shards: list[list[str]]):
+    symbols = [symbol for shard in shards for symbol in shard]
+    assert sorted(symbols) == sorted(SYMBOLS), "a symbol was lost or duplicated"
+
+
+if __name__ == '__main__':
+    random.seed(7)
+    planner = ShardPlanner()
+    rates = {symbol: random.uniform(0.1, 5) for symbol in SYMBOLS}
+    shards = planner.plan(SYMBOLS, rates)
+    print(f"initial: {len(shards)} shards of {[len(shard) for shard in shards]} symbols")
+
+    rates['S17'] = planner.hot_rate * 1.5
+    assert planner.needs_rebalance(shards, rates)
+    hot = planner.replan(shards, rates)
+    check(hot)
+    print(f"S17 turned hot: {changed(shards, hot)} of {len(hot)} shards changed")
+    assert ['S17'] in hot and changed(shards, hot) == 2
+
+    rates['S17'] = 1
+    assert planner.needs_rebalance(hot, rates)
+    cooled = planner.replan(hot, rates)
+    check(cooled)
+    print(f"S17 cooled down: {changed(hot, cooled)} of {len(cooled)} shards changed")
+    assert ['S17'] not in cooled and changed(hot, cooled) == 1
+
+    busy = cooled[0]
+    for symbol in busy[:8]:
+        rates[symbol] = planner.hot_rate * 0.4
+    assert planner.needs_rebalance(cooled, rates)
+    rebalanced = planner.replan(cooled, rates)
+    check(rebalanced)
+    print(f"shard overloaded: {changed(cooled, rebalanced)} of {len(rebalanced)} shards changed, "
+          f"loads {[round(sum(rates[symbol] for symbol in shard)) for shard in rebalanced]}")
+    assert all(sum(rates[symbol] for symbol in shard) <= planner.target_rate for shard in rebalanced)
+    assert len(rebalanced) <= planner.max_connections
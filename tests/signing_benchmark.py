@@ -0,0 +1,66 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import hmac
+import time
+import uuid
+import hashlib
+import jwt
+from utils.binance_auth import BinanceSigner
+from upbit.auth import UpbitSigner
+
+# Request signing throughput: building the query string and its signature for a typical Binance order,
+# and the JWT of a typical Upbit request.
+ROUNDS = 200000
+SECRET_KEY = 'x' * 64
+
+PARAMS = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'recvWindow': 5000, 'reduceOnly': False,
+          'timeInForce': 'GTC', 'quantity': '0.012', 'timestamp': 1700000000000, 'price': '27123.4'}
+
+
+def legacy_signed_url(endpoint: str, params: dict) -> str:
+    query_string = '&'.join(["{}={}".format(key, params[key]) for key in params.keys()])
+    signature = hmac.new(SECRET_KEY.encode(), query_string.encode(), hashlib.sha256).hexdigest()
+    return f"{endpoint}?{query_string}&signature={signature}"
+
+
+UPBIT_QUERY = 'market=KRW-BTC&state=wait'
+
+
+def legacy_upbit_headers(query_string: str) -> dict:
+    payload = {'access_key': 'key', 'nonce': str(uuid.uuid4())}
+    if query_string:
+        payload['query_hash'] = hashlib.sha512(query_string.encode()).hexdigest()
+        payload['query_hash_alg'] = 'SHA512'
+    return {'Authorization': 'Bearer {}'.format(jwt.encode(payload, SECRET_KEY))}
+
+
+def measure(sign, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        sign(*args)
+    return ROUNDS / (time.perf_counter() - start)
+
+
+def report(name: str, sign, *args):
+    rate = measure(sign, *args)
+    print(f"  {name:<24} {rate:>12,.0f} req/s {1e6 / rate:>8.2f} us/req")
+
+
+if __name__ == '__main__':
+    signer = BinanceSigner('key', SECRET_KEY)
+    assert signer.signed_url("u", PARAMS) == legacy_signed_url("u", PARAMS)
+    print("Binance HMAC-SHA256")
+    report('per-request hmac.new', legacy_signed_url, "https://fapi.binance.com/fapi/v1/order", PARAMS)
+    report('BinanceSigner', signer.signed_url, "https://fapi.binance.com/fapi/v1/order", PARAMS)
+
+    upbit_signer = UpbitSigner('key', SECRET_KEY)
+    claims = jwt.decode(upbit_signer.token(UPBIT_QUERY), SECRET_KEY, algorithms=['HS256'])
+    assert claims['query_hash'] == hashlib.sha512(UPBIT_QUERY.encode()).hexdigest()
+    print("Upbit HS256 JWT")
+    report('PyJWT', legacy_upbit_headers, UPBIT_QUERY)
+    report('UpbitSigner', upbit_signer.headers, UPBIT_QUERY)
+    report('UpbitSigner (no query)', upbit_signer.headers, None)
@@ -8,8 +8,8 @@ project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..'
 sys.path.append(project_root_path)
 from binance_usdm.market import BinanceUsdmMarket
 from upbit.market import UpbitKrwMarket
-import asyncio
+from utils import runtime
 
 
 upbit_market = UpbitKrwMarket(symbols=['BTC', 'ETH'], order_book_depth=2)    
-asyncio.run(upbit_market.stream())
+runtime.run(upbit_market.stream())
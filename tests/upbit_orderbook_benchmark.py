@@ -0,0 +1,72 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import json
+import time
+import random
+from backtest.replay import read_frame_meta, read_frames
+from upbit.market import UpbitKrwMarket
+
+# Upbit order book processing throughput over an all-KRW-markets stream.
+# Pass a frame file recorded with backtest.replay.FrameRecorder from a live UpbitKrwMarket,
+# or run without arguments to use a synthetic stream of SYMBOLS markets.
+#   python tests/upbit_orderbook_benchmark.py [upbit.frames]
+SYMBOLS = 230
+DEPTH = 15
+MESSAGES = 200000
+
+
+def synthetic_stream() -> tuple[list, list]:
+    """
+    Messages of SYMBOLS markets in SIMPLE format. Most messages change a few levels near the touch,
+    some change the book only below the subscribed depth, and a few are malformed.
+    """
+    symbols = [f"S{i}" for i in range(SYMBOLS)]
+    books = {symbol: [{'ap': 1000.0 + i, 'as': random.uniform(1, 100), 'bp': 999.0 - i, 'bs': random.uniform(1, 100)}
+                      for i in range(DEPTH)] for symbol in symbols}
+    messages = []
+    for _ in range(MESSAGES):
+        symbol = random.choice(symbols)
+        units = books[symbol]
+        if random.random() < 0.8:
+            for _ in range(random.randint(1, 3)):
+                level = min(int(random.expovariate(0.5)), DEPTH - 1)
+                units[level] = dict(units[level], **{random.choice(['as', 'bs']): random.uniform(1, 100)})
+        message = {'ty': 'orderbook', 'cd': f"KRW-{symbol}", 'tms': int(time.time() * 1000),
+                   'tas': 1000.0, 'tbs': 1000.0, 'obu': units, 'st': 'REALTIME'}
+        if random.random() < 0.0001:
+            message['obu'] = units[:3] + [{'ap': 'bad'}]
+        messages.append(json.dumps(message).encode())
+    return symbols, messages
+
+
+if __name__ == '__main__':
+    random.seed(7)
+    if len(sys.argv) > 1:
+        meta = read_frame_meta(sys.argv[1])
+        symbols, depth = meta['symbols'], meta['order_book_depth']
+        messages = [bytes(message) for _, message in read_frames(sys.argv[1])]
+    else:
+        symbols, messages = synthetic_stream()
+        depth = DEPTH
+    market = UpbitKrwMarket(symbols, depth)
+    market._on_message(messages[0])
+    decode = market._decode
+    start = time.perf_counter()
+    for message in messages:
+        decode(message)
+    decode_elapsed = time.perf_counter() - start
+    updates = 0
+    start = time.perf_counter()
+    for message in messages:
+        if market._on_message(message) is not None:
+            updates += 1
+    elapsed = time.perf_counter() - start
+    print(f"{len(symbols)} symbols, depth {depth}, {len(messages)} messages")
+    print(f"throughput: {len(messages) / elapsed:,.0f} msg/s ({1e6 * elapsed / len(messages):.2f} us/msg, "
+          f"of which decoding {1e6 * decode_elapsed / len(messages):.2f} us)")
+    print(f"book updates: {updates}, unchanged: {len(messages) - updates - sum(market.parse_errors.values())}, "
+          f"parse errors: {sum(market.parse_errors.values())}")
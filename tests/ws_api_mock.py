@@ -0,0 +1,68 @@
+import sys
+import os
+current_script_path = os.path.abspath(__file__)
+project_root_path = os.path.abspath(os.path.join(current_script_path, '..', '..', 'src'))
+sys.path.append(project_root_path)
+
+import json
+import time
+import random
+import asyncio
+import itertools
+import websockets
+import numpy as np
+from base.OrderSheet import OrderSheet
+from binance_usdm.broker import BinanceUsdmBroker
+from utils.binance_auth import BinanceSigner, build_query_string
+from utils.exchange_info import exchange_info
+from utils import runtime
+
+# Order entry over the Binance USDM WebSocket API against a local mock server.
+# The mock checks each request's signature, answers after a random delay (out of order),
+# and the broker keeps every order in flight at once.
+#   python tests/ws_api_mock.py [orders]
+HOST, PORT = 'localhost', 8765
+API_KEY, SECRET_KEY = 'mock-key', 'mock-secret'
+TICK_INFO = {'BTC': {'tick_size': 0.1, 'min_qty': 0.001}}
+
+
+async def mock_server(websocket):
+    signer = BinanceSigner(API_KEY, SECRET_KEY)
+    order_ids = itertools.count(1)
+
+    async def respond(request):
+        await asyncio.sleep(random.uniform(0, 0.005))
+        params = dict(request['params'])
+        signature = params.pop('signature')
+        if signature != signer.sign(build_query_string(dict(sorted(params.items())))):
+            response = {'id': request['id'], 'status': 401, 'error': {'code': -1022, 'msg': 'Signature for this request is not valid.'}}
+        else:
+            response = {'id': request['id'], 'status': 200, 'result': {'orderId': next(order_ids), 'symbol': params['symbol'], 'status': 'NEW'}}
+        await websocket.send(json.dumps(response))
+
+    async for message in websocket:
+        asyncio.create_task(respond(json.loads(message)))
+
+
+async def main(orders: int):
+    exchange_info._set('binance_usdm_symbols', [list(TICK_INFO), TICK_INFO], time.time(), persist=False)
+    async with websockets.serve(mock_server, HOST, PORT):
+        broker = BinanceUsdmBroker(API_KEY, SECRET_KEY, ws_api_endpoint=f"ws://{HOST}:{PORT}")
+        connect_task = asyncio.create_task(broker.aconnect())
+        while not broker.ws_api.is_connected:
+            await asyncio.sleep(0.01)
+        order_sheets = [OrderSheet(exchange='BinanceUsdm', symbol='BTC', side='buy', price=random.uniform(20000, 30000), qty=0.01)
+                        for _ in range(orders)]
+        start = time.perf_counter()
+        results = await broker.aplace_orders(order_sheets)
+        elapsed = time.perf_counter() - start
+        latencies = np.array([order_sheet.time_took for order_sheet in results if order_sheet and order_sheet.is_successful]) * 1000
+        print(f"orders: {orders}, placed: {len(latencies)}")
+        print(f"throughput: {orders / elapsed:,.0f} orders/s")
+        print(f"latency p50: {np.percentile(latencies, 50):.2f}ms p99: {np.percentile(latencies, 99):.2f}ms")
+        connect_task.cancel()
+        await broker.ws_api.aclose()
+
+
+if __name__ == '__main__':
+    runtime.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000), warm_up=False)